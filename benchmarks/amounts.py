@@ -0,0 +1,92 @@
+# Copyright 2016 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+"""Compares bulk sums of an AmountArray with plain Amount arithmetic.
+
+Run from the root of the project::
+
+    python -m benchmarks.amounts [--amounts 200000] [--repeat 5]
+
+The baseline is what our bulk paths did before :class:`.AmountArray`: ``sum()`` for totals and a
+``total += amount`` loop for running totals. Timings include building the array. Gains are only
+there with the amount.c extension built: with the reference implementation, ``AmountArray`` falls
+back to plain arithmetic.
+"""
+
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from core.model.amount import Amount, AmountArray, convert_amount
+from core.model.currency import Currency, RatesDB, CAD, USD
+
+def generate_amounts(count, seed=0):
+    rnd = random.Random(seed)
+    return [Amount(rnd.randint(-100000, 100000) / 100, USD) for _ in range(count)]
+
+def plain_sum(amounts, dates):
+    return sum(amounts)
+
+def array_sum(amounts, dates):
+    return AmountArray(amounts).sum()
+
+def plain_running_totals(amounts, dates):
+    total = 0
+    result = []
+    for amount in amounts:
+        total += amount
+        result.append(total)
+    return result
+
+def array_running_totals(amounts, dates):
+    return AmountArray(amounts).cumsum()
+
+def plain_converted_running_totals(amounts, dates):
+    total = 0
+    result = []
+    for amount, amount_date in zip(amounts, dates):
+        total += convert_amount(amount, CAD, amount_date)
+        result.append(total)
+    return result
+
+def array_converted_running_totals(amounts, dates):
+    return AmountArray(amounts).convert(CAD, dates).cumsum()
+
+# (name, baseline, AmountArray)
+OPERATIONS = [
+    ('sum', plain_sum, array_sum),
+    ('running totals', plain_running_totals, array_running_totals),
+    ('converted running totals', plain_converted_running_totals, array_converted_running_totals),
+]
+
+def best_time(func, amounts, dates, repeat):
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func(amounts, dates)
+        times.append(time.perf_counter() - start_time)
+    return min(times)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--amounts', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    Currency.set_rates_db(RatesDB(':memory:', False))
+    start = date(2000, 1, 1)
+    dates = [start + timedelta(days=i * 3650 // args.amounts) for i in range(args.amounts)]
+    for i in range(0, 3650, 30):
+        USD.set_CAD_value(1.2 + (i % 365) / 1000, start + timedelta(days=i))
+    amounts = generate_amounts(args.amounts)
+    print("%-26s %12s %12s %8s" % ("operation", "plain (s)", "array (s)", "gain"))
+    for name, baseline, operation in OPERATIONS:
+        plain_time = best_time(baseline, amounts, dates, args.repeat)
+        array_time = best_time(operation, amounts, dates, args.repeat)
+        print("%-26s %12.4f %12.4f %7.1fx" % (name, plain_time, array_time, plain_time / array_time))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+# Copyright 2016 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+"""Generates realistic moneyGuru documents of any size for benchmarks.
+
+The same arguments (``seed`` and ``end_date`` included) always generate the same document.
+Documents are built with model objects and written with the native saver, so they're exactly
+what moneyGuru would save.
+"""
+
+import random
+from collections import namedtuple
+from datetime import date, timedelta
+
+from core.model.account import Account, AccountType
+from core.model.amount import Amount
+from core.model.budget import Budget
+from core.model.currency import Currency, USD
+from core.model.recurrence import Recurrence, RepeatType
+from core.model.transaction import Transaction, Split
+from core.saver.native import save
+
+CURRENCY_CODES = ['USD', 'EUR', 'CAD', 'GBP', 'JPY', 'CHF', 'AUD', 'SEK']
+ASSET_NAMES = ['Checking', 'Savings', 'Cash', 'Brokerage', 'Retirement']
+LIABILITY_NAMES = ['Credit Card', 'Mortgage', 'Car Loan']
+INCOME_NAMES = ['Salary', 'Interest', 'Dividends', 'Freelance', 'Gifts']
+EXPENSE_NAMES = [
+    'Groceries', 'Restaurants', 'Rent', 'Utilities', 'Internet', 'Phone', 'Fuel', 'Transit',
+    'Clothing', 'Health', 'Insurance', 'Entertainment', 'Books', 'Travel', 'Hobbies', 'Gifts Given',
+]
+PAYEES = [
+    'Corner Store', 'Supermarket', 'Gas Station', 'Pharmacy', 'Book Shop', 'Cinema', 'Airline',
+    'Hardware Store', 'Bakery', 'Coffee Shop', 'Landlord', 'Power Company', 'Phone Company',
+    'Insurance Co', 'Employer', 'Bank', 'Online Shop', 'Restaurant', 'Pizzeria', 'Dentist',
+]
+WORDS = [
+    'weekly', 'monthly', 'refill', 'dinner', 'lunch', 'breakfast', 'supplies', 'repair', 'fee',
+    'bill', 'payment', 'purchase', 'refund', 'deposit', 'transfer', 'gift', 'subscription',
+    'tickets', 'groceries', 'snacks', 'parts', 'service', 'rental', 'order', 'bonus',
+]
+
+#: Parameters of a generated document. See :func:`generate_document`.
+DocumentSpec = namedtuple('DocumentSpec', [
+    'accounts', 'years', 'transactions_per_day', 'currencies', 'schedules', 'budgets', 'seed',
+    'end_date',
+])
+
+def account_names(names, count):
+    # Our realistic names, then numbered ones if we need more.
+    result = names[:count]
+    index = 2
+    while len(result) < count:
+        result += ['%s %d' % (name, index) for name in names][:count - len(result)]
+        index += 1
+    return result
+
+def create_accounts(spec, rnd):
+    currencies = [Currency(code) for code in CURRENCY_CODES[:max(spec.currencies, 1)]]
+    # A quarter of our accounts are assets and liabilities, the rest are income and expenses.
+    balance_count = max(spec.accounts // 4, 1)
+    liability_count = balance_count // 3
+    asset_count = balance_count - liability_count
+    pl_count = max(spec.accounts - balance_count, 2)
+    income_count = max(pl_count // 5, 1)
+    expense_count = pl_count - income_count
+    result = []
+    for i, name in enumerate(account_names(ASSET_NAMES, asset_count)):
+        # Our main account is always in the default currency.
+        currency = currencies[0] if i == 0 else rnd.choice(currencies)
+        result.append(Account(name, currency, AccountType.Asset))
+    for name in account_names(LIABILITY_NAMES, liability_count):
+        result.append(Account(name, rnd.choice(currencies), AccountType.Liability))
+    for name in account_names(INCOME_NAMES, income_count):
+        result.append(Account(name, USD, AccountType.Income))
+    for name in account_names(EXPENSE_NAMES, expense_count):
+        result.append(Account(name, USD, AccountType.Expense))
+    return result
+
+def random_description(rnd, account):
+    return '%s %s' % (account.name, rnd.choice(WORDS))
+
+def random_amount(rnd, currency, low, high):
+    # Amounts follow a log-normal-ish distribution: mostly small, sometimes big.
+    value = min(max(rnd.lognormvariate(0, 1) * (low + high) / 20, low), high)
+    return Amount(round(value, currency.exponent), currency)
+
+def create_transaction(rnd, txn_date, assets, incomes, expenses):
+    kind = rnd.random()
+    if kind < 0.75:
+        source, dest = rnd.choice(assets), rnd.choice(expenses)
+        amount = random_amount(rnd, source.currency, 1, 2000)
+        description = random_description(rnd, dest)
+    elif kind < 0.9:
+        source, dest = rnd.choice(incomes), rnd.choice(assets)
+        amount = random_amount(rnd, dest.currency, 50, 10000)
+        description = random_description(rnd, source)
+    else:
+        source, dest = rnd.sample(assets, 2) if len(assets) > 1 else (assets[0], rnd.choice(expenses))
+        amount = random_amount(rnd, source.currency, 10, 5000)
+        description = 'Transfer to %s' % dest.name
+    checkno = str(rnd.randint(100, 9999)) if rnd.random() < 0.05 else None
+    txn = Transaction(txn_date, description, rnd.choice(PAYEES), checkno, account=source, amount=-amount)
+    txn.splits[1].account = dest
+    if rnd.random() < 0.1:
+        # Some transactions have their destination split in two.
+        second = Amount(round(amount.value * rnd.uniform(0.1, 0.5), amount.currency.exponent), amount.currency)
+        txn.splits[1].amount = amount - second
+        txn.splits.append(Split(txn, rnd.choice(expenses), second))
+    if rnd.random() < 0.2:
+        txn.splits[0].memo = rnd.choice(WORDS)
+    return txn
+
+def create_document(spec):
+    """Returns ``(accounts, transactions, schedules, budgets)`` for ``spec``.
+
+    :param spec: :class:`DocumentSpec` of the document.
+    """
+    rnd = random.Random(spec.seed)
+    accounts = create_accounts(spec, rnd)
+    assets = [a for a in accounts if a.is_balance_sheet_account()]
+    incomes = [a for a in accounts if a.type == AccountType.Income]
+    expenses = [a for a in accounts if a.type == AccountType.Expense]
+    start_date = spec.end_date - timedelta(days=round(spec.years * 365))
+    # Transactions older than that are reconciled.
+    reconciled_until = spec.end_date - timedelta(days=60)
+    transactions = []
+    current_date = start_date
+    while current_date <= spec.end_date:
+        count = int(spec.transactions_per_day * 2 * rnd.random() + 0.5)
+        for i in range(count):
+            txn = create_transaction(rnd, current_date, assets, incomes, expenses)
+            txn.position = i
+            txn.mtime = 1400000000 + len(transactions)
+            if current_date < reconciled_until:
+                for split in txn.splits:
+                    if split.account.is_balance_sheet_account():
+                        split.reconciliation_date = current_date
+            transactions.append(txn)
+        current_date += timedelta(days=1)
+    schedules = []
+    for _ in range(spec.schedules):
+        ref_date = start_date + timedelta(days=rnd.randint(0, (spec.end_date - start_date).days))
+        ref = create_transaction(rnd, ref_date, assets, incomes, expenses)
+        repeat_type = rnd.choice([RepeatType.Weekly, RepeatType.Monthly, RepeatType.Monthly, RepeatType.Yearly])
+        schedules.append(Recurrence(ref, repeat_type, 1))
+    budgets = []
+    budgeted = rnd.sample(expenses, min(spec.budgets, len(expenses)))
+    for account in budgeted:
+        amount = random_amount(rnd, USD, 50, 2000)
+        budget_start = date(spec.end_date.year, spec.end_date.month, 1)
+        budgets.append(Budget(account, assets[0], amount, budget_start))
+    return accounts, transactions, schedules, budgets
+
+def generate_document(path, spec):
+    """Generates a document for ``spec`` and saves it to ``path``.
+
+    :param path: ``str``, where to save the document.
+    :param spec: :class:`DocumentSpec` of the document.
+    :returns: The number of transactions in the document.
+    """
+    accounts, transactions, schedules, budgets = create_document(spec)
+    properties = {'default_currency': USD}
+    save(path, 'benchmark', properties, accounts, [], transactions, schedules, budgets)
+    return len(transactions)
@@ -0,0 +1,100 @@
+# Copyright 2016 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+"""Compares the memory used by transactions, splits and entries with and without slots.
+
+Run from the root of the project::
+
+    python -m benchmarks.model_memory [--transactions 100000]
+
+Each layout is measured in its own process. The "dict" layout uses copies of the model classes
+without ``__slots__``, which is how they were before they were slotted.
+"""
+
+import argparse
+import random
+import resource
+import subprocess
+import sys
+import tracemalloc
+from datetime import date, timedelta
+
+from core.model import oven, transaction
+from core.model.account import Account, AccountList, AccountType
+from core.model.amount import Amount
+from core.model.budget import BudgetList
+from core.model.currency import Currency, RatesDB, USD
+from core.model.entry import Entry
+from core.model.transaction import Transaction, Split
+from core.model.transaction_list import TransactionList
+
+def without_slots(cls):
+    # Subclassing wouldn't do: attributes would still be stored in our base's slots.
+    namespace = {
+        name: value for name, value in vars(cls).items()
+        if name not in cls.__slots__ and name not in {'__slots__', '__dict__', '__weakref__'}
+    }
+    return type(cls.__name__, cls.__bases__, namespace)
+
+def use_dict_layout():
+    # Transaction creates its splits through the module global, and the oven its entries.
+    transaction.Split = without_slots(Split)
+    oven.Entry = without_slots(Entry)
+    return without_slots(Transaction)
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on OS X, but in kilobytes on Linux.
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def run_layout(layout, transaction_count, account_count=50, seed=0):
+    Currency.set_rates_db(RatesDB(':memory:', async=False))
+    txn_class = use_dict_layout() if layout == 'dict' else Transaction
+    rnd = random.Random(seed)
+    accounts = AccountList(USD)
+    for i in range(account_count):
+        account_type = AccountType.Asset if i % 2 else AccountType.Expense
+        accounts.add(Account('Account %d' % i, USD, account_type))
+    start = date(2000, 1, 1)
+    tracemalloc.start()
+    transactions = TransactionList()
+    for i in range(transaction_count):
+        txn_date = start + timedelta(days=i * 3650 // transaction_count)
+        source, dest = rnd.sample(accounts, 2)
+        amount = Amount(rnd.randint(1, 100000) / 100, USD)
+        txn = txn_class(txn_date, 'Transaction %d' % i, 'Payee %d' % rnd.randint(0, 500))
+        txn.splits = [transaction.Split(txn, source, amount), transaction.Split(txn, dest, -amount)]
+        transactions.add(txn)
+    model_size = tracemalloc.get_traced_memory()[0]
+    cooker = oven.Oven(accounts, transactions, [], BudgetList())
+    cooker.cook()
+    cooked_size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print('%s %d %d %.1f' % (
+        layout, model_size // transaction_count, cooked_size // transaction_count, peak_rss_mb()
+    ))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--transactions', type=int, default=100000)
+    parser.add_argument('--child', metavar='LAYOUT', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_layout(args.child, args.transactions)
+        return
+    print("Document: %d transactions, 2 splits each" % args.transactions)
+    print("%-8s %14s %16s %14s" % ("layout", "model (B/txn)", "cooked (B/txn)", "peak RSS (MB)"))
+    for layout in ['dict', 'slots']:
+        cmd = [
+            sys.executable, '-m', 'benchmarks.model_memory', '--child', layout,
+            '--transactions', str(args.transactions),
+        ]
+        output = subprocess.check_output(cmd, universal_newlines=True).split()
+        name, model_size, cooked_size, peak = output[-4:]
+        print("%-8s %14s %16s %14s" % (name, model_size, cooked_size, peak))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# Copyright 2016 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+"""Compares the load time and peak memory usage of the native loader with a whole-tree load.
+
+Run from the root of the project::
+
+    python -m benchmarks.native_load [--transactions 200000]
+
+A synthetic document is generated in a temporary folder and each loading method is run in its
+own process so that we can measure its peak RSS.
+"""
+
+import argparse
+import os
+import os.path as op
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import xml.etree.cElementTree as ET
+from datetime import date, timedelta
+from xml.sax.saxutils import quoteattr
+
+from core.exception import FileFormatError
+from core.loader import native
+from core.model.currency import Currency, RatesDB, USD
+
+class TreeLoader(native.Loader):
+    """The loader as it was before it read documents as a stream: the whole tree is parsed first."""
+    def _parse(self, infile):
+        try:
+            root = ET.parse(infile).getroot()
+        except SyntaxError:
+            raise FileFormatError()
+        if root.tag != 'moneyguru-file':
+            raise FileFormatError()
+        self.root = root
+
+    def _load(self):
+        self.document_id = self.root.attrib.get('document_id')
+        for element in self.root:
+            self._read_root_child(element)
+        native.Loader._load(self)
+
+LOADERS = {
+    'stream': native.Loader,
+    'tree': TreeLoader,
+}
+
+def generate_document(path, transaction_count, account_count=50, seed=0):
+    rnd = random.Random(seed)
+    accounts = ['Account %d' % i for i in range(account_count)]
+    start = date(2000, 1, 1)
+    with open(path, 'wt', encoding='utf-8') as fp:
+        fp.write('<moneyguru-file document_id="benchmark">\n')
+        fp.write('<properties default_currency="USD" />\n')
+        for i, name in enumerate(accounts):
+            account_type = 'asset' if i % 2 else 'expense'
+            fp.write('<account name=%s currency="USD" type="%s" />\n' % (quoteattr(name), account_type))
+        for i in range(transaction_count):
+            txn_date = start + timedelta(days=i * 3650 // transaction_count)
+            amount = rnd.randint(1, 100000) / 100
+            source, dest = rnd.sample(accounts, 2)
+            fp.write(
+                '<transaction date="%s" description=%s payee=%s mtime="%d">'
+                '<split account=%s amount="%.2f USD" /><split account=%s amount="%.2f USD" />'
+                '</transaction>\n' % (
+                    txn_date.strftime('%Y-%m-%d'), quoteattr('Transaction %d' % i),
+                    quoteattr('Payee %d' % rnd.randint(0, 500)), 1400000000 + i,
+                    quoteattr(source), amount, quoteattr(dest), -amount,
+                )
+            )
+        fp.write('</moneyguru-file>\n')
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on OS X, but in kilobytes on Linux.
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def run_loader(loader_name, path):
+    Currency.set_rates_db(RatesDB(':memory:', async=False))
+    loader = LOADERS[loader_name](USD)
+    start_time = time.time()
+    loader.parse(path)
+    loader.load()
+    elapsed = time.time() - start_time
+    print('%s %.2f %.1f %d' % (loader_name, elapsed, peak_rss_mb(), len(loader.transactions)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--transactions', type=int, default=200000)
+    parser.add_argument('--child', nargs=2, metavar=('LOADER', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_loader(*args.child)
+        return
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = op.join(tmpdir, 'benchmark.moneyguru')
+        generate_document(path, args.transactions)
+        size_mb = os.stat(path).st_size / (1024 * 1024)
+        print("Document: %d transactions, %.1f MB" % (args.transactions, size_mb))
+        print("%-8s %10s %14s" % ("loader", "time (s)", "peak RSS (MB)"))
+        for loader_name in sorted(LOADERS):
+            cmd = [sys.executable, '-m', 'benchmarks.native_load', '--child', loader_name, path]
+            output = subprocess.check_output(cmd, universal_newlines=True).split()
+            name, elapsed, peak, _ = output[-4:]
+            print("%-8s %10s %14s" % (name, elapsed, peak))
+
+if __name__ == '__main__':
+    main()
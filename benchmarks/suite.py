@@ -0,0 +1,196 @@
+# Copyright 2016 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+"""Times common operations on a generated document and reports the results as JSON.
+
+Run from the root of the project::
+
+    python -m benchmarks.suite [--years 5] [--transactions-per-day 5] [--output results.json]
+
+A document is generated (see :mod:`benchmarks.generator`) in a temporary folder, then each scenario
+is run ``--repeat`` times on its own freshly loaded document. Only the operation itself is timed.
+The GUI layer is driven through the ``TestApp`` of our tests, so ``pytest`` has to be installed.
+
+Because the generated document depends on ``--end-date``, pass the same one (it defaults to today)
+when comparing results over time.
+"""
+
+import argparse
+import json
+import os
+import os.path as op
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+from core.model.currency import Currency, RatesDB
+from core.tests.base import TestApp
+
+from .generator import DocumentSpec, generate_document
+
+def new_app():
+    app = TestApp()
+    # We don't want to hit the currency server: our rates DB has no provider.
+    Currency.set_rates_db(RatesDB(':memory:', False))
+    return app
+
+def loaded_app(path):
+    app = new_app()
+    app.doc.load_from_xml(path)
+    return app
+
+# --- Scenarios
+# Each scenario is a (setup, run) pair. setup(path, spec) returns a context which is passed to
+# run(context), the timed part.
+
+def setup_load(path, spec):
+    return new_app(), path
+
+def run_load(context):
+    app, path = context
+    app.doc.load_from_xml(path)
+
+def setup_save(path, spec):
+    return loaded_app(path), op.join(op.dirname(path), 'saved.moneyguru')
+
+def run_save(context):
+    app, path = context
+    app.doc.save_to_xml(path)
+
+def setup_cook(path, spec):
+    return loaded_app(path)
+
+def run_cook(app):
+    app.doc.oven.cook(until_date=app.doc.date_range.end)
+
+def setup_filter_typing(path, spec):
+    app = loaded_app(path)
+    app.show_tview()
+    app.doc.select_all_transactions_range()
+    return app
+
+def run_filter_typing(app):
+    # The filter is applied as the user types.
+    query = 'groceries'
+    for i in range(1, len(query) + 1):
+        app.sfield.text = query[:i]
+    app.sfield.text = ''
+
+def setup_date_range_navigation(path, spec):
+    app = loaded_app(path)
+    app.show_tview()
+    app.doc.select_month_range(spec.end_date)
+    return app
+
+def run_date_range_navigation(app):
+    for _ in range(12):
+        app.drsel.select_prev_date_range()
+    for _ in range(12):
+        app.drsel.select_next_date_range()
+
+def select_each_year(app, spec):
+    first_year = spec.end_date.year - int(spec.years)
+    for year in range(first_year, spec.end_date.year + 1):
+        app.doc.select_year_range(date(year, 1, 1))
+
+def setup_balance_sheet(path, spec):
+    app = loaded_app(path)
+    app.show_nwview()
+    return app, spec
+
+def setup_income_statement(path, spec):
+    app = loaded_app(path)
+    app.show_pview()
+    return app, spec
+
+def run_sheet_refresh(context):
+    # Selecting a date range refreshes the sheet (and its graph) of the current view.
+    select_each_year(*context)
+
+SCENARIOS = [
+    ('load_from_xml', setup_load, run_load),
+    ('save_to_xml', setup_save, run_save),
+    ('oven_cook', setup_cook, run_cook),
+    ('filter_typing', setup_filter_typing, run_filter_typing),
+    ('date_range_navigation', setup_date_range_navigation, run_date_range_navigation),
+    ('balance_sheet_refresh', setup_balance_sheet, run_sheet_refresh),
+    ('income_statement_refresh', setup_income_statement, run_sheet_refresh),
+]
+
+def run_scenario(setup, run, path, spec, repeat):
+    times = []
+    for _ in range(repeat):
+        context = setup(path, spec)
+        start_time = time.perf_counter()
+        run(context)
+        times.append(time.perf_counter() - start_time)
+    return {
+        'times': times,
+        'min': min(times),
+        'median': statistics.median(times),
+    }
+
+def run_suite(spec, repeat=3, scenario_names=None):
+    """Generates a document for ``spec``, runs our scenarios on it and returns the results.
+
+    :param spec: :class:`.DocumentSpec` of the document to generate.
+    :param repeat: number of times each scenario is run.
+    :param scenario_names: names of the scenarios to run. All of them if ``None``.
+    :returns: a JSON-serializable dict.
+    """
+    scenarios = [s for s in SCENARIOS if scenario_names is None or s[0] in scenario_names]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = op.join(tmpdir, 'benchmark.moneyguru')
+        Currency.set_rates_db(RatesDB(':memory:', False))
+        transaction_count = generate_document(path, spec)
+        document = dict(spec._asdict(), end_date=spec.end_date.isoformat())
+        document.update(transactions=transaction_count, file_size=os.stat(path).st_size)
+        results = {}
+        for name, setup, run in scenarios:
+            results[name] = run_scenario(setup, run, path, spec, repeat)
+    return {
+        'date': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': sys.platform,
+        'document': document,
+        'scenarios': results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--accounts', type=int, default=40)
+    parser.add_argument('--years', type=float, default=5)
+    parser.add_argument('--transactions-per-day', type=float, default=5)
+    parser.add_argument('--currencies', type=int, default=3)
+    parser.add_argument('--schedules', type=int, default=20)
+    parser.add_argument('--budgets', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--end-date', type=lambda s: datetime.strptime(s, '%Y-%m-%d').date(), default=date.today(),
+        help="Date of the last generated transactions (YYYY-MM-DD)."
+    )
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--scenario', action='append', choices=[s[0] for s in SCENARIOS],
+                        help="Scenario to run. Can be repeated. All of them by default.")
+    parser.add_argument('--output', help="File to write results to, instead of stdout.")
+    args = parser.parse_args()
+    spec = DocumentSpec(
+        args.accounts, args.years, args.transactions_per_day, args.currencies, args.schedules,
+        args.budgets, args.seed, args.end_date
+    )
+    results = run_suite(spec, args.repeat, args.scenario)
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'wt') as fp:
+            fp.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
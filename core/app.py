@@ -32,12 +32,14 @@ class PreferenceNames:
     * ``AutoDecimalPlace``
     * ``CustomRanges``
     * ``ShowScheduleScopeDialog``
+    * ``JournaledSave``
     """
     HadFirstLaunch = 'HadFirstLaunch'
     AutoSaveInterval = 'AutoSaveInterval'
     AutoDecimalPlace = 'AutoDecimalPlace'
     CustomRanges = 'CustomRanges'
     ShowScheduleScopeDialog = 'ShowScheduleScopeDialog'
+    JournaledSave = 'JournaledSave'
     DisabledCorePlugins = 'DisabledCorePlugins'
     EnabledUserPlugins = 'EnabledUserPlugins'
 
@@ -168,6 +170,7 @@ class Application(Broadcaster):
         self._autosave_interval = self.get_default(PreferenceNames.AutoSaveInterval, 10)
         self._auto_decimal_place = self.get_default(PreferenceNames.AutoDecimalPlace, False)
         self._show_schedule_scope_dialog = self.get_default(PreferenceNames.ShowScheduleScopeDialog, True)
+        self._journaled_save = self.get_default(PreferenceNames.JournaledSave, False)
         self.saved_custom_ranges = [None] * 3
         self._load_custom_ranges()
         self.plugins = []
@@ -434,6 +437,21 @@ class Application(Broadcaster):
         self._auto_decimal_place = value
         self.set_default(PreferenceNames.AutoDecimalPlace, value)
 
+    @property
+    def journaled_save(self):
+        """*get/set bool*. Whether saves only append changes to the file when possible.
+
+        .. seealso:: :class:`core.saver.native.Journal`
+        """
+        return self._journaled_save
+
+    @journaled_save.setter
+    def journaled_save(self, value):
+        if value == self._journaled_save:
+            return
+        self._journaled_save = value
+        self.set_default(PreferenceNames.JournaledSave, value)
+
     @property
     def show_schedule_scope_dialog(self):
         """*get/set bool*. Whether we prompt the user for schedule editing scope.
@@ -13,13 +13,15 @@ import os.path as op
 from functools import wraps
 
 from hscommon.notify import Repeater
-from hscommon.util import nonone, allsame, dedupe, extract, first
+from hscommon.util import nonone, allsame, dedupe, extract, first, flatten
 from hscommon.trans import tr
 from hscommon.gui.base import GUIObject
+from hscommon.gui.progress_window import ProgressWindow
+from hscommon.jobprogress.job import JobCancelled
 
 from .const import NOEDIT, DATE_FORMAT_FOR_PREFERENCES
 from .exception import FileFormatError, OperationAborted
-from .loader import native
+from .loader import native, compact
 from .model.account import Account, Group, AccountList, GroupList, AccountType
 from .model.amount import parse_amount, format_amount
 from .model.currency import Currency
@@ -28,11 +30,13 @@ from .model.date import (
     MonthRange, QuarterRange, YearRange, YearToDateRange, RunningYearRange,
     AllTransactionsRange, CustomDateRange, inc_month
 )
+from .model.memo import CookMemo
 from .model.oven import Oven
 from .model.recurrence import Spawn
 from .model.transaction_list import TransactionList
 from .model.undo import Undoer, Action
-from .saver.native import save as save_native
+from .saver.native import save as save_native, Journal
+from .saver.compact import save as save_compact
 
 SELECTED_DATE_RANGE_PREFERENCE = 'SelectedDateRange'
 SELECTED_DATE_RANGE_START_PREFERENCE = 'SelectedDateRangeStart'
@@ -70,6 +74,16 @@ class ScheduleScope:
     Cancel = 2
 
 AUTOSAVE_BUFFER_COUNT = 10 # Number of autosave files that will be kept in the cache.
+# When a new date range requires us to cook at least that many days further than we already did
+# and that we have schedules or budgets, we cook in the background.
+BACKGROUND_COOKING_MIN_DAYS = 366
+
+# Notifications after which figures in our memo might be stale even if nothing was cooked (exchange
+# rates or account types can change in the meantime).
+MEMO_INVALIDATING_MESSAGES = {
+    'account_changed', 'date_range_changed', 'document_changed', 'performed_undo_or_redo',
+    'transaction_changed',
+}
 
 def handle_abort(method):
     @wraps(method)
@@ -118,10 +132,9 @@ class BaseDocument:
     def _add_transactions(self, transactions):
         if not transactions:
             return
-        for txn in transactions:
-            self.transactions.add(txn)
+        self.transactions.extend(transactions)
         min_date = min(t.date for t in transactions)
-        self._cook(from_date=min_date)
+        self._cook(from_date=min_date, dirty_accounts=self._dirty_accounts(transactions))
 
     def _change_transaction(
             self, transaction, date=NOEDIT, description=NOEDIT, payee=NOEDIT,
@@ -149,7 +162,7 @@ class BaseDocument:
                 self.transactions.add(transaction)
             elif date_changed:
                 self.transactions.move_last(transaction)
-        self.transactions.clear_cache()
+        self.transactions.clear_cache([transaction])
 
     def _clean_empty_categories(self, from_account=None):
         for account in list(self.accounts.auto_created):
@@ -163,9 +176,21 @@ class BaseDocument:
         self.transactions.clear()
         self._cook()
 
-    def _cook(self, from_date=None):
+    def _cook(self, from_date=None, dirty_accounts=None):
         # Without date ranges and spawns, it's OK to pass `None` as an `until_date`.
-        self.oven.cook(from_date=from_date, until_date=None)
+        self.oven.cook(from_date=from_date, until_date=None, dirty_accounts=dirty_accounts)
+
+    def _dirty_accounts(self, transactions, previous=None):
+        """Returns the set of accounts affected by ``transactions``.
+
+        The result is meant to be sent to :meth:`.Oven.cook` so that only entries of these accounts
+        are re-created. When a change can re-assign splits, call this once before the change and
+        send the result as ``previous`` to the call made after the change.
+        """
+        result = set(flatten(t.affected_accounts() for t in transactions))
+        if previous is not None:
+            result |= previous
+        return result
 
     # --- Public
     def change_transaction(self, original, new, global_scope=False):
@@ -193,13 +218,15 @@ class BaseDocument:
         for split in new.splits:
             if split.account is not None:
                 split.account = self.accounts.find(split.account.name, split.account.type)
+        dirty_accounts = self._dirty_accounts([original])
         original.set_splits(new.splits, preserve_instances=True)
         min_date = min(original.date, new.date)
         self._change_transaction(
             original, date=new.date, description=new.description,
             payee=new.payee, checkno=new.checkno, notes=new.notes, global_scope=global_scope
         )
-        self._cook(from_date=min_date)
+        dirty_accounts = self._dirty_accounts([original], previous=dirty_accounts)
+        self._cook(from_date=min_date, dirty_accounts=dirty_accounts)
         self._clean_empty_categories()
 
     def change_transactions(
@@ -237,13 +264,15 @@ class BaseDocument:
             Currency.get_rates_db().ensure_rates(date, currencies_to_ensure)
 
         min_date = date if date is not NOEDIT else datetime.date.max
+        dirty_accounts = self._dirty_accounts(transactions)
         for transaction in transactions:
             min_date = min(min_date, transaction.date)
             self._change_transaction(
                 transaction, date=date, description=description, payee=payee, checkno=checkno,
                 from_=from_, to=to, amount=amount, currency=currency, global_scope=global_scope
             )
-        self._cook(from_date=min_date)
+        dirty_accounts = self._dirty_accounts(transactions, previous=dirty_accounts)
+        self._cook(from_date=min_date, dirty_accounts=dirty_accounts)
         self._clean_empty_categories()
 
     def delete_transactions(self, transactions, from_account=None, global_scope=False):
@@ -272,7 +301,7 @@ class BaseDocument:
             else:
                 self.transactions.remove(txn)
         min_date = min(t.date for t in transactions)
-        self._cook(from_date=min_date)
+        self._cook(from_date=min_date, dirty_accounts=self._dirty_accounts(transactions))
         self._clean_empty_categories(from_account=from_account)
 
     def duplicate_transactions(self, transactions):
@@ -332,6 +361,7 @@ class BaseDocument:
             Currency.get_rates_db().ensure_rates(date, [amount.currency.code, entry.account.currency.code])
         candidate_dates = [entry.date, date, reconciliation_date, entry.reconciliation_date]
         min_date = min(d for d in candidate_dates if d is not NOEDIT and d is not None)
+        dirty_accounts = self._dirty_accounts([entry.transaction])
         if reconciliation_date is not NOEDIT:
             entry.split.reconciliation_date = reconciliation_date
         if (amount is not NOEDIT) and (len(entry.splits) == 1):
@@ -344,7 +374,8 @@ class BaseDocument:
             entry.transaction, date=date, description=description,
             payee=payee, checkno=checkno, global_scope=global_scope
         )
-        self._cook(from_date=min_date)
+        dirty_accounts = self._dirty_accounts([entry.transaction], previous=dirty_accounts)
+        self._cook(from_date=min_date, dirty_accounts=dirty_accounts)
         self._clean_empty_categories()
 
     def delete_entries(self, entries):
@@ -422,11 +453,26 @@ class Document(BaseDocument, Repeater, GUIObject):
         #: :class:`.GroupList` containing all account groups of the document.
         self.groups = GroupList()
         self._undoer = Undoer(self.accounts, self.groups, self.transactions, self.schedules, self.budgets)
+        self._undoer.add_listener(self._record_in_journals)
         self._date_range = YearRange(datetime.date.today())
         self._filter_string = ''
         self._filter_type = None
         self._document_id = None
         self._dirty_flag = False
+        self._journals = {} # filename: Journal
+        # Whether the document was loaded from or last saved to a compact file. Its saves keep that
+        # format (see save_to_xml()).
+        self._compact = False
+        self._autosave_filename = None
+        # Set by the autosave thread when a journaled autosave is due.
+        self._autosave_requested = False
+        # Balances, cash flows and budgeted amounts shared by all views until the next cook.
+        self._memo = CookMemo(self.oven)
+        #: :class:`.ProgressWindow` for cooking in the background. We only cook in the background if
+        #: the UI layer gives it a view.
+        self.cook_progress = ProgressWindow(self._background_cook_finished)
+        # (cook, date_range) of the background cooking in progress
+        self._background_cook = None
         self._restore_preferences()
 
     # --- Private
@@ -448,8 +494,23 @@ class Document(BaseDocument, Repeater, GUIObject):
     def _async_autosave(self):
         # Because this method is called asynchronously, it's possible that, if unlucky, it happens
         # exactly as the user is commiting a change. In these cases, the autosaved file might be a
-        # save of the data in a quite weird state. I think this risk is acceptable. The alternative
-        # is to put locks everywhere, which would complexify the application.
+        # save of the data in a quite weird state. I think this risk is acceptable for a complete
+        # save because the next autosave fixes it. The alternative is to put locks everywhere,
+        # which would complexify the application.
+        # Journaled autosaves, however, keep whatever they append and our journals are updated by
+        # the main thread. We leave these autosaves to the main thread (see notify()).
+        if self.app.journaled_save:
+            self._autosave_requested = True
+            return
+        self._autosave()
+
+    def _autosave(self):
+        if self.app.journaled_save and self._autosave_filename in self._journals:
+            # We keep appending to the same autosave file until its journal needs compaction.
+            if self._journals[self._autosave_filename].can_append(self.accounts):
+                self.save_to_xml(self._autosave_filename, autosave=True)
+                return
+            del self._journals[self._autosave_filename]
         existing_names = [name for name in os.listdir(self.app.cache_path) if name.startswith('autosave')]
         existing_names.sort()
         timestamp = int(time.time())
@@ -457,7 +518,8 @@ class Document(BaseDocument, Repeater, GUIObject):
         while autosave_name in existing_names:
             timestamp += 1
             autosave_name = 'autosave{0}.moneyguru'.format(timestamp)
-        self.save_to_xml(op.join(self.app.cache_path, autosave_name), autosave=True)
+        self._autosave_filename = op.join(self.app.cache_path, autosave_name)
+        self.save_to_xml(self._autosave_filename, autosave=True)
         if len(existing_names) >= AUTOSAVE_BUFFER_COUNT:
             os.remove(op.join(self.app.cache_path, existing_names[0]))
 
@@ -468,10 +530,63 @@ class Document(BaseDocument, Repeater, GUIObject):
         del self.budgets[:]
         self._undoer.clear()
         self._dirty_flag = False
+        self._journals = {}
+        self._compact = False
         BaseDocument._clear(self)
 
-    def _cook(self, from_date=None):
-        self.oven.cook(from_date=from_date, until_date=self.date_range.end)
+    def _background_cook_finished(self, jobid):
+        if self._background_cook is None: # cancelled
+            return
+        cook, date_range = self._background_cook
+        self._background_cook = None
+        self.notify('date_range_will_change')
+        self._date_range = date_range
+        if not self.oven.apply_cook(cook):
+            # Something was cooked in the meantime (our result is stale) or cooking failed.
+            self.oven.continue_cooking(date_range.end)
+        self.notify('date_range_changed')
+
+    def _cancel_background_cook(self):
+        if self._background_cook is None:
+            return
+        self._background_cook = None
+        self.cook_progress.cancel()
+        # The cooking thread works on copies of spawn caches, but there's no point in letting it
+        # run alongside our own cooking.
+        self.cook_progress.wait()
+
+    def _cook(self, from_date=None, dirty_accounts=None):
+        self._cancel_background_cook()
+        self.oven.cook(from_date=from_date, until_date=self.date_range.end, dirty_accounts=dirty_accounts)
+
+    def _cook_in_background(self, date_range):
+        # Starts cooking until the end of ``date_range`` in the background if it's worth it and
+        # returns whether we did. When the cooking is done, ``date_range`` becomes our date range.
+        if not self.cook_progress.has_view() or not (self.schedules or self.budgets):
+            return False
+        until_date = date_range.end
+        if until_date.toordinal() - self.oven.cooked_until.toordinal() < BACKGROUND_COOKING_MIN_DAYS:
+            return False
+        cook = self.oven.prepare_cook(self.oven.cooked_until, until_date)
+        self._background_cook = (cook, date_range)
+        self.cook_progress.run(None, tr("Cooking transactions"), self._compute_background_cook, (cook, ))
+        return True
+
+    def _compute_background_cook(self, j, cook):
+        try:
+            self.oven.compute_cook(cook, j)
+        except JobCancelled:
+            raise
+        except Exception:
+            # If we let it through, cook_progress re-raises the error in the main thread instead of
+            # calling _background_cook_finished() and we're left with a half-done date range change.
+            # Our cook isn't computed, so it's cooked again in the main thread when we finish, where
+            # errors have their normal course.
+            logging.warning("Background cooking failed", exc_info=True)
+
+    def _record_in_journals(self, action):
+        for journal in self._journals.values():
+            journal.record(action)
 
     def _get_action_from_changed_transactions(self, transactions, global_scope=False):
         if len(transactions) == 1 and not isinstance(transactions[0], Spawn) \
@@ -616,13 +731,13 @@ class Document(BaseDocument, Repeater, GUIObject):
                 account.group = group
             if account_number is not NOEDIT:
                 account.account_number = account_number
+                self.accounts.reindex([account])
             if inactive is not NOEDIT:
                 account.inactive = inactive
             if notes is not NOEDIT:
                 account.notes = notes
         self._undoer.record(action)
         self._cook()
-        self.transactions.clear_cache()
         self.notify('account_changed')
 
     def delete_accounts(self, accounts, reassign_to=None):
@@ -966,10 +1081,42 @@ class Document(BaseDocument, Repeater, GUIObject):
         else:
             for split in splits:
                 split.reconciliation_date = None
-        self._cook(from_date=min_date)
+        dirty_accounts = self._dirty_accounts([e.transaction for e in entries])
+        self._cook(from_date=min_date, dirty_accounts=dirty_accounts)
         self.notify('transaction_changed')
 
+    def normal_balance(self, account, date, currency=None):
+        """Memoized :meth:`.EntryList.normal_balance` of ``account``.
+
+        :param account: :class:`.Account`
+        :param date: ``datetime.date``
+        :param currency: :class:`.Currency`
+        """
+        key = ('balance', account, date, currency)
+        return self._memo.get(key, lambda: account.entries.normal_balance(date, currency=currency))
+
+    def normal_cash_flow(self, account, date_range, currency=None):
+        """Memoized :meth:`.EntryList.normal_cash_flow` of ``account``.
+
+        :param account: :class:`.Account`
+        :param date_range: :class:`.DateRange`
+        :param currency: :class:`.Currency`
+        """
+        key = ('cash_flow', account, date_range, currency)
+        return self._memo.get(key, lambda: account.entries.normal_cash_flow(date_range, currency=currency))
+
     # --- Budget
+    def budgeted_amount_for_account(self, account, date_range, currency=None):
+        """Memoized :meth:`.BudgetList.normal_amount_for_account`.
+
+        :param account: :class:`.Account`
+        :param date_range: :class:`.DateRange`
+        :param currency: :class:`.Currency`
+        """
+        key = ('budget_account', account, date_range, currency)
+        compute = lambda: self.budgets.normal_amount_for_account(account, date_range, currency=currency)
+        return self._memo.get(key, compute)
+
     def budgeted_amount_for_target(self, target, date_range, filter_excluded=True):
         """Returns the amount budgeted for **all** budgets targeting ``target``.
 
@@ -987,23 +1134,28 @@ class Document(BaseDocument, Repeater, GUIObject):
         :param filter_excluded: ``bool``
         :rtype: :class:`.Amount`
         """
-        if target is None:
-            budgets = self.budgets[:]
-            currency = self.default_currency
-        else:
-            budgets = self.budgets.budgets_for_target(target)
-            currency = target.currency
-        if filter_excluded:
-            # we must remove any budget touching an excluded account.
-            is_not_excluded = lambda b: (b.account not in self.excluded_accounts)\
-                and (b.target not in self.excluded_accounts)
-            budgets = list(filter(is_not_excluded, budgets))
-        if not budgets:
-            return 0
-        budgeted_amount = sum(-b.amount_for_date_range(date_range, currency=currency) for b in budgets)
-        if target is not None:
-            budgeted_amount = target.normalize_amount(budgeted_amount)
-        return budgeted_amount
+        def compute():
+            if target is None:
+                budgets = self.budgets[:]
+                currency = self.default_currency
+            else:
+                budgets = self.budgets.budgets_for_target(target)
+                currency = target.currency
+            if filter_excluded:
+                # we must remove any budget touching an excluded account.
+                is_not_excluded = lambda b: (b.account not in self.excluded_accounts)\
+                    and (b.target not in self.excluded_accounts)
+                budgets = list(filter(is_not_excluded, budgets))
+            if not budgets:
+                return 0
+            budgeted_amount = sum(-b.amount_for_date_range(date_range, currency=currency) for b in budgets)
+            if target is not None:
+                budgeted_amount = target.normalize_amount(budgeted_amount)
+            return budgeted_amount
+
+        excluded = frozenset(self.excluded_accounts) if filter_excluded else None
+        key = ('budget_target', target, date_range, self.default_currency, excluded)
+        return self._memo.get(key, compute)
 
     def change_budget(self, original, new):
         """Changes the attributes of ``original`` so that they match those of ``new``.
@@ -1158,17 +1310,22 @@ class Document(BaseDocument, Repeater, GUIObject):
     def load_from_xml(self, filename):
         """Clears the document and loads data from ``filename``.
 
-        ``filename`` must be a path to a moneyGuru XML document.
+        ``filename`` must be a path to a moneyGuru XML document or to a document in the compact
+        format (see :meth:`save_to_compact`). The format is detected from the file's header.
 
         :param filename: ``str``
         """
-        loader = native.Loader(self.default_currency)
+        if compact.is_compact_file(filename):
+            loader = compact.Loader(self.default_currency)
+        else:
+            loader = native.Loader(self.default_currency)
         try:
             loader.parse(filename)
         except FileFormatError:
             raise FileFormatError(tr('"%s" is not a moneyGuru file') % filename)
         loader.load()
         self._clear()
+        self._compact = isinstance(loader, compact.Loader)
         self._document_id = loader.document_id
         for propname in self._properties:
             if propname in loader.properties:
@@ -1177,8 +1334,7 @@ class Document(BaseDocument, Repeater, GUIObject):
             self.groups.append(group)
         for account in loader.accounts:
             self.accounts.add(account)
-        for transaction in loader.transactions:
-            self.transactions.add(transaction, position=transaction.position)
+        self.transactions.extend(loader.transactions, keep_position=True)
         for recurrence in loader.schedules:
             self.schedules.append(recurrence)
         for budget in loader.budgets:
@@ -1193,29 +1349,69 @@ class Document(BaseDocument, Repeater, GUIObject):
     def save_to_xml(self, filename, autosave=False):
         """Saves the document to ``filename``.
 
-        ``filename`` must be a path to a moneyGuru XML document.
+        ``filename`` must be a path to a moneyGuru XML document. However, if the document was
+        loaded from a compact file (or last saved with :meth:`save_to_compact`), it is saved in the
+        compact format instead so that saving doesn't silently convert the user's file. Autosaves
+        are always in the XML format.
 
         If ``autosave`` is true, the operation will not affect the document's modified state and
         will not make editing stop, if editing there is (like it normally does without the autosave
         flag to make sure that the input being currently done by the user is saved).
 
+        When the ``journaled_save`` preference is enabled, only the changes since the last save to
+        ``filename`` are appended to it when possible (see :class:`.Journal`).
+
         :param filename: ``str``
         :param autosave: ``bool``
         """
         # When called from _async_autosave, it should not disrupt the user: no stop edition, no
         # change in the save state.
+        if self._compact and not autosave:
+            self.save_to_compact(filename)
+            return
         if not autosave:
             self.stop_edition()
         if self._document_id is None:
             self._document_id = uuid.uuid4().hex
-        save_native(
-            filename, self._document_id, self._properties, self.accounts, self.groups,
-            self.transactions, self.schedules, self.budgets
+        args = (
+            self._document_id, self._properties, self.accounts, self.groups, self.transactions,
+            self.schedules, self.budgets
         )
+        if self.app.journaled_save:
+            journal = self._journals.get(filename)
+            if journal is None:
+                journal = self._journals[filename] = Journal(filename)
+            journal.save(*args)
+        else:
+            if not autosave:
+                # Non-journaled autosaves happen in the autosave thread, which mustn't touch our
+                # journals. A stale journal doesn't append to a file that was rewritten anyway.
+                self._journals.pop(filename, None)
+            save_native(filename, *args)
         if not autosave:
             self._undoer.set_save_point()
             self._dirty_flag = False
 
+    def save_to_compact(self, filename):
+        """Saves the document to ``filename`` in the compact format.
+
+        The compact format is a SQLite database which is faster to load and save than the XML
+        format. :meth:`load_from_xml` detects it automatically.
+
+        :param filename: ``str``
+        """
+        self.stop_edition()
+        if self._document_id is None:
+            self._document_id = uuid.uuid4().hex
+        save_compact(
+            filename, self._document_id, self._properties, self.accounts, self.groups,
+            self.transactions, self.schedules, self.budgets
+        )
+        self._journals.pop(filename, None)
+        self._compact = True
+        self._undoer.set_save_point()
+        self._dirty_flag = False
+
     def import_entries(self, target_account, ref_account, matches):
         """Imports entries in ``mathes`` into ``target_account``.
 
@@ -1271,9 +1467,11 @@ class Document(BaseDocument, Repeater, GUIObject):
             self.accounts.add(account)
         if target_account is not ref_account and ref_account.reference is not None:
             target_account.reference = ref_account.reference
+            self.accounts.reindex([target_account])
         for entry, ref in matches:
             if ref is not None:
                 ref.transaction.date = entry.date
+                self.transactions.reindex([ref.transaction])
                 ref.split.amount = entry.split.amount
                 ref.transaction.balance(strong_split=ref.split, keep_two_splits=True)
                 ref.split.reference = entry.split.reference
@@ -1292,6 +1490,8 @@ class Document(BaseDocument, Repeater, GUIObject):
         # make the document dirty (ok, it's just one action: setting doc props). That's what this
         # flag is for.
         self._dirty_flag = True
+        for journal in self._journals.values():
+            journal.invalidate()
 
     # --- Date Range
     def select_month_range(self, starting_point):
@@ -1376,6 +1576,9 @@ class Document(BaseDocument, Repeater, GUIObject):
         if date_range == self._date_range:
             return
         self.stop_edition()
+        self._cancel_background_cook()
+        if self._cook_in_background(date_range):
+            return
         self.notify('date_range_will_change')
         self._date_range = date_range
         self.oven.continue_cooking(date_range.end)
@@ -1413,12 +1616,26 @@ class Document(BaseDocument, Repeater, GUIObject):
         self.notify('performed_undo_or_redo')
 
     # --- Misc
+    def notify(self, msg):
+        if msg in MEMO_INVALIDATING_MESSAGES:
+            self._memo.clear()
+        Repeater.notify(self, msg)
+        if self._autosave_requested:
+            # We're in the main thread and, since we notify after our changes, our data is in a
+            # consistent state. A requested journaled autosave waits for the next notification.
+            self._autosave_requested = False
+            try:
+                self._autosave()
+            except OSError:
+                logging.warning("Journaled autosave failed", exc_info=True)
+
     def close(self):
         """Cleanup the document and close it.
 
         Saves preferences and tells GUI elements about the document closing (so that they can save
         their own preferences if needed).
         """
+        self._cancel_background_cook()
         self._save_preferences()
         self.notify('document_will_close')
 
@@ -1586,6 +1803,6 @@ class ImportDocument(BaseDocument):
         self.cook_flag = True
         self.oven.cook(from_date=None, until_date=None)
 
-    def _cook(self, from_date=None):
+    def _cook(self, from_date=None, dirty_accounts=None):
         pass
 
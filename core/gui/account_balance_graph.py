@@ -22,6 +22,16 @@ class AccountBalanceGraph(BalanceGraph):
         entry = self._account.entries.last_entry(date=date)
         return entry.normal_balance() if entry else 0
 
+    def _balance_changes(self, date_range):
+        if self._account is None:
+            return {}
+        entries = self._account.entries.entries_in_range(date_range)
+        # When there are many entries at the same date, the last one wins.
+        return {e.date: e.normal_balance() for e in entries}
+
+    def _balance_changes_key(self):
+        return self._account
+
     def _budget_for_date(self, date):
         date_range = DateRange(date.min, date)
         return self.document.budgeted_amount_for_target(
@@ -19,13 +19,19 @@ class AccountFlowGraph(BarGraph):
     def _currency(self):
         return self._account.currency
     
-    def _get_cash_flow(self, date_range):
-        self.document.oven.continue_cooking(date_range.end) # it's possible that the overflow is not cooked
+    def _get_cash_flows(self, date_ranges):
+        if not date_ranges:
+            return []
+        # it's possible that the overflow is not cooked
+        self.document.oven.continue_cooking(date_ranges[-1].end)
         account = self._account
         currency = self._currency()
-        cash_flow = account.entries.normal_cash_flow(date_range, currency=currency)
-        budgeted = self.document.budgets.normal_amount_for_account(account, date_range, currency=currency)
-        return cash_flow + budgeted
+        cash_flows = account.entries.normal_cash_flows(date_ranges, currency=currency)
+        budgets = self.document.budgets
+        return [
+            cash_flow + budgets.normal_amount_for_account(account, date_range, currency=currency)
+            for cash_flow, date_range in zip(cash_flows, date_ranges)
+        ]
     
     # --- Properties
     @property
@@ -69,7 +69,7 @@ class BalancePieChart(_AccountPieChart):
         currency = self.document.default_currency
 
         def get_value(account):
-            balance = account.entries.normal_balance(date=date, currency=currency)
+            balance = self.document.normal_balance(account, date, currency=currency)
             budget_date_range = DateRange(date.min, self.document.date_range.end)
             budgeted = self.document.budgeted_amount_for_target(account, budget_date_range)
             budgeted = convert_amount(budgeted, currency, date)
@@ -93,8 +93,8 @@ class CashFlowPieChart(_AccountPieChart):
         currency = self.document.default_currency
 
         def get_value(account):
-            cash_flow = account.entries.normal_cash_flow(date_range, currency=currency)
-            budgeted = self.document.budgets.normal_amount_for_account(account, date_range, currency=currency)
+            cash_flow = self.document.normal_cash_flow(account, date_range, currency=currency)
+            budgeted = self.document.budgeted_amount_for_account(account, date_range, currency=currency)
             return cash_flow + budgeted
 
         return [(a, get_value(a)) for a in accounts]
@@ -23,6 +23,12 @@ class BrushID:
 
 class BalanceGraph(Graph):
     # BalanceGraph's data point is (float x, float y)
+    def __init__(self, parent_view):
+        Graph.__init__(self, parent_view)
+        # (cache key, date range) -> balance changes. Only valid for the cook it was computed in.
+        self._balance_changes_cache = {}
+        self._balance_changes_cook_count = None
+
     # --- Virtual
     def _balance_for_date(self, date):
         return 0
@@ -30,12 +36,42 @@ class BalanceGraph(Graph):
     def _budget_for_date(self, date):
         return 0
 
+    def _balance_changes(self, date_range):
+        """Returns the balance at each date of ``date_range`` where it might change.
+
+        The result is a ``{date: balance}`` dict. The balance at other dates is the balance of the
+        previous date in the dict (or of the day before ``date_range`` if there's none). If we
+        can't tell when the balance changes, ``None`` is returned and :meth:`_balance_for_date` is
+        called for every day of the range.
+        """
+        return None
+
+    def _balance_changes_key(self):
+        """Returns a hashable describing what :meth:`_balance_changes` depends on.
+
+        Along with the date range, it's the key under which balance changes are cached.
+        """
+        return None
+
+    # --- Private
+    def _cached_balance_changes(self, date_range):
+        cook_count = self.document.oven.cook_count
+        if cook_count != self._balance_changes_cook_count:
+            self._balance_changes_cache = {}
+            self._balance_changes_cook_count = cook_count
+        key = (self._balance_changes_key(), date_range)
+        if key not in self._balance_changes_cache:
+            self._balance_changes_cache[key] = self._balance_changes(date_range)
+        return self._balance_changes_cache[key]
+
     # --- Override
     # Computation Notes: When the balance in the graph changes, we have to create a flat line until
     # one day prior to the change. However, when budgets are involved, the line is *not* flattened.
     # To save some calculations (in a year range, those take a lot of time if they're made every day),
     # rather than calculating the budget every day, they are only calculated when the balance without
     # budget changes. this is what the algorithm below reflects.
+    # When the subclass can tell us at which dates the balance changes, we only visit those dates
+    # (and today and the end of the range, which always get a data point) rather than every day.
     def compute_data(self):
         date_range = self.document.date_range
         TODAY = date.today()
@@ -43,8 +79,21 @@ class BalanceGraph(Graph):
         last_balance = self._balance_for_date(date_range.start - ONE_DAY)
         if last_balance:
             date2value[date_range.start] = last_balance
-        for date_point in date_range:
-            balance = self._balance_for_date(date_point)
+        date2balance = self._cached_balance_changes(date_range)
+        if date2balance is None:
+            date_points = date_range
+        else:
+            date_points = set(date2balance)
+            date_points.add(date_range.end)
+            if TODAY in date_range:
+                date_points.add(TODAY)
+            date_points = sorted(date_points)
+        balance = last_balance
+        for date_point in date_points:
+            if date2balance is None:
+                balance = self._balance_for_date(date_point)
+            else:
+                balance = date2balance.get(date_point, balance)
             if (balance != last_balance) or (date_point == TODAY) or (date_point == date_range.end):
                 if date2value and last_balance != balance:
                     # create a "step"
@@ -55,16 +55,29 @@ class BarGraph(Graph):
     def _get_cash_flow(self, date_range):
         return 0
     
+    def _get_cash_flows(self, date_ranges):
+        # ``date_ranges`` are sorted and contiguous. Subclasses can compute them all at once.
+        return [self._get_cash_flow(date_range) for date_range in date_ranges]
+
     # --- Override
     def compute_data(self):
         TODAY = date.today()
         self._data = []
-        for period in self._bar_periods():
+        periods = list(self._bar_periods())
+        # The period containing today is split in its past and future parts.
+        date_ranges = []
+        for period in periods:
+            if TODAY in period:
+                date_ranges += [period.past, period.future]
+            else:
+                date_ranges.append(period)
+        cash_flows = iter(self._get_cash_flows(date_ranges))
+        for period in periods:
             if TODAY in period:
-                past_amount = float(self._get_cash_flow(period.past))
-                future_amount = float(self._get_cash_flow(period.future))
+                past_amount = float(next(cash_flows))
+                future_amount = float(next(cash_flows))
             else:
-                amount = float(self._get_cash_flow(period))
+                amount = float(next(cash_flows))
                 if TODAY > period.end: # all in the past
                     past_amount = amount
                     future_amount = 0
@@ -42,6 +42,17 @@ class CompletableEdit(DocumentGUIObject):
             self._candidates = result
         self._candidates = dedupe([name for name in self._candidates if name.strip()])
 
+    def _candidates_starting_with(self, text):
+        # Descriptions and payees can be numerous, so we ask the document's completion index for
+        # those matching ``text`` rather than filtering all candidates. Returns None if there's
+        # nothing to complete.
+        if self.mainwindow is not None and self.attrname in {'description', 'payee'}:
+            if not text:
+                return []
+            candidates = self.mainwindow.document.transactions.completions(self.attrname, text)
+            return [name for name in candidates if name.strip()]
+        return self.candidates or None
+
     def _set_completion(self, completion):
         completion = nonone(completion, '')
         self._complete_completion = completion
@@ -117,8 +128,9 @@ class CompletableEdit(DocumentGUIObject):
     @text.setter
     def text(self, value):
         self._text = value
-        if self.candidates:
-            self._completions = CompletionList(value, self._candidates)
+        candidates = self._candidates_starting_with(value)
+        if candidates is not None:
+            self._completions = CompletionList(value, candidates)
             self._set_completion(self._completions.current())
         else:
             self._completions = None
@@ -140,6 +140,7 @@ class CSVOptions(MainWindowGUIObject):
             self.view.show_message(str(e))
         else:
             self.view.hide()
+            self.mainwindow.show_next_csv_options()
 
     def delete_selected_layout(self):
         if self.layout is self._default_layout:
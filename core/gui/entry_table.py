@@ -9,7 +9,7 @@
 from hscommon.trans import tr, trget
 from hscommon.util import dedupe
 from hscommon.gui.column import Column, Columns
-from .entry_table_base import EntryTableBase, PreviousBalanceRow, TotalRow
+from .entry_table_base import EntryTableBase
 
 trcol = trget('columns')
 
@@ -75,20 +75,13 @@ class EntryTable(EntryTableBase):
         account = self.account
         if account is None:
             return
-        self.account = account
-        rows = self._get_account_rows(account)
-        is_native = lambda row: self.document.is_amount_native(row._debit)\
-            and self.document.is_amount_native(row._credit)
-        self._all_amounts_are_native = all(is_native(row) for row in rows)
-        if not rows:
-            # We still show a total row
-            rows.append(TotalRow(self, account, self.document.date_range.end, 0, 0))
-        if isinstance(rows[0], PreviousBalanceRow):
-            self.header = rows[0]
-            del rows[0]
-        for row in rows[:-1]:
-            self.append(row)
-        self.footer = rows[-1]
+        entries = self.mainwindow.visible_entries_for_account(account)
+        self._all_amounts_are_native = all(self.document.is_amount_native(e.amount) for e in entries)
+        self.header = self._get_previous_balance_row(account)
+        # Rows are only created when the view asks for them.
+        self.set_virtual_rows(entries, lambda entry: self.ENTRY_ROWCLASS(self, entry, account))
+        # We always show a total row, even when there's no entries.
+        self.footer = self._get_total_row(account, entries)
         balance_visible = account.is_balance_sheet_account()
         self.columns.set_column_visible('balance', balance_visible)
         self._restore_from_explicit_selection(refresh_view=False)
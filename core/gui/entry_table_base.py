@@ -352,13 +352,20 @@ class EntryTableBase(TransactionTableBase):
         entry = self._new_entry()
         account = entry.account
         last_suitable_index = 0 if self.header is not None else -1
-        for index, row in enumerate(self):
-            if not isinstance(row, EntryTableRow):
-                continue
-            if row.account is not account:
+        for index in range(len(self)):
+            # Look at virtual items when we can to avoid creating rows.
+            item = self.virtual_item(index)
+            if item is not None:
+                row_account, row_date = item.account, item.date
+            else:
+                row = self[index]
+                if not isinstance(row, EntryTableRow):
+                    continue
+                row_account, row_date = row.account, row._date
+            if row_account is not account:
                 continue
             last_suitable_index = index
-            if row._date > entry.date:
+            if row_date > entry.date:
                 insert_index = index
                 break
         else:
@@ -375,6 +382,9 @@ class EntryTableBase(TransactionTableBase):
         if self._get_current_account() is not None:
             TransactionTableBase.add(self)
 
+    def _virtual_item_transaction(self, entry):
+        return entry.transaction
+
     # --- Virtual
     def _get_current_account(self):
         raise NotImplementedError()
@@ -385,26 +395,38 @@ class EntryTableBase(TransactionTableBase):
     # --- Private
     def _get_account_rows(self, account):
         result = []
+        previous_balance_row = self._get_previous_balance_row(account)
+        if previous_balance_row is not None:
+            result.append(previous_balance_row)
+        entries = self.mainwindow.visible_entries_for_account(account)
+        result += [self.ENTRY_ROWCLASS(self, entry, account) for entry in entries]
+        if result:
+            result.append(self._get_total_row(account, entries))
+        return result
+
+    def _get_previous_balance_row(self, account):
+        if not account.is_balance_sheet_account():
+            return None
         date_range = self.document.date_range
-        if account.is_balance_sheet_account():
-            prev_entry = account.entries.last_entry(date_range.start-ONE_DAY)
-            if prev_entry is not None:
-                balance = prev_entry.balance_with_budget
-                rbalance = prev_entry.reconciled_balance
-                result.append(PreviousBalanceRow(self, date_range.start, balance, rbalance, account))
+        prev_entry = account.entries.last_entry(date_range.start-ONE_DAY)
+        if prev_entry is None:
+            return None
+        balance = prev_entry.balance_with_budget
+        rbalance = prev_entry.reconciled_balance
+        return PreviousBalanceRow(self, date_range.start, balance, rbalance, account)
+
+    def _get_total_row(self, account, entries):
+        # Totals are computed from entries rather than rows so that they don't require rows to
+        # be created.
         total_debit = 0
         total_credit = 0
-        entries = self.mainwindow.visible_entries_for_account(account)
         for entry in entries:
-            row = self.ENTRY_ROWCLASS(self, entry, account)
-            result.append(row)
-            convert = lambda a: convert_amount(a, account.currency, entry.date)
-            total_debit += convert(row._debit)
-            total_credit += convert(row._credit)
-        if result:
-            total_row = TotalRow(self, account, date_range.end, total_debit, total_credit)
-            result.append(total_row)
-        return result
+            amount = entry.amount
+            if amount > 0:
+                total_debit += convert_amount(amount, account.currency, entry.date)
+            elif amount < 0:
+                total_credit += convert_amount(-amount, account.currency, entry.date)
+        return TotalRow(self, account, self.document.date_range.end, total_debit, total_credit)
 
     def _new_entry(self):
         account = self._get_current_account()
@@ -419,7 +441,7 @@ class EntryTableBase(TransactionTableBase):
         # returns (selected_count, total_count, total_debit, total_credit)
         entries = self.selected_entries
         selected = len(entries)
-        total = sum(1 for row in self if isinstance(row, EntryTableRow))
+        total = sum(1 for index in range(len(self)) if self._transaction_at(index) is not None)
         total_currency = self._get_totals_currency()
         amounts = [convert_amount(e.amount, total_currency, e.date) for e in entries]
         total_debit = sum(a for a in amounts if a > 0)
@@ -10,6 +10,7 @@
 # unit, we rename our imported first() function here
 from hscommon.util import flatten, dedupe, first as getfirst
 from hscommon.trans import tr
+from bisect import bisect_right
 from collections import defaultdict
 
 from hscommon.notify import Listener
@@ -103,7 +104,9 @@ class AccountPane:
 
         """
 
-        import_entries = self.import_entries
+        # Entries are equal (and hash the same) when they're for the same split, so we can look
+        # re-cooked import entries up by their previous instance.
+        import_entries = {e: e for e in self.import_entries}
 
         existing_entries = self.existing_entries
 
@@ -139,10 +142,9 @@ class AccountPane:
                     # entry because it is not recooked.
                     self.matches.append([match_entry.existing, entry])
                 else:
-                    # Otherwise, we have to search through our import entries based on equality
+                    # Otherwise, we have to look our import entry up based on equality
                     # because the reference will have changed between cooks.
-                    [import_entry] = [e for e in import_entries
-                                      if e == match_entry.imported]
+                    import_entry = import_entries[match_entry.imported]
                     self.matches.append([entry, import_entry])
 
                 # Add both items to our processed set.
@@ -171,7 +173,7 @@ class AccountPane:
         # First, we must put in our user binds.
         user_binds = list(self._user_binds.items())
         for (existing_entry, import_entry), bound in user_binds:
-            new_import_entry = self._get_matching_entry(import_entry, import_entries)
+            new_import_entry = import_entries.get(import_entry)
             if new_import_entry is None:
                 # If a plugin has modified our imports such that the imported entry
                 # no longer exists, then clean up that record in ``_user_binds``.
@@ -199,29 +201,26 @@ class AccountPane:
 
         # So our last step is to ensure that if a plugin has made a recommendation about a match
         # that the user has indicated was incorrect, we must make sure that match is broken.
-        for (existing_entry, import_entry), bound in self._user_binds.items():
-            if not bound:
-                import_entry = self._get_matching_entry(import_entry, import_entries)
-                match = [[e, i] for [e, i] in self.matches if
-                         e and i and
-                         (e, i) == (existing_entry, import_entry)]
-                if match:
-                    [[e, i]] = match
-                    self.matches.remove([e, i])
-                else:
-                    continue
-                # if not e.reconciled?
-                # So here, the end effect is that if the entry is reconciled the existing
-                # entry disappears when the bind is broken.
-                self.matches.append([e, None])
-                self.matches.append([None, i])
-
-    @staticmethod
-    def _get_matching_entry(entry, entry_list):
-        for e in entry_list:
-            if e == entry:
-                return e
-        return None
+        unbound = {
+            (existing_entry, import_entry)
+            for (existing_entry, import_entry), bound in self._user_binds.items() if not bound
+        }
+        if not unbound:
+            return
+        kept = []
+        broken = []
+        for e, i in self.matches:
+            if e and i and (e, i) in unbound:
+                broken.append((e, i))
+            else:
+                kept.append([e, i])
+        self.matches[:] = kept
+        for e, i in broken:
+            # if not e.reconciled?
+            # So here, the end effect is that if the entry is reconciled the existing
+            # entry disappears when the bind is broken.
+            self.matches.append([e, None])
+            self.matches.append([None, i])
 
     def match_entries(self, binding_plugins=None, import_entries=None):
         """Match existing to imported entries.
@@ -248,32 +247,59 @@ class AccountPane:
         self._sort_matches()
         self.match_flag = True
 
-    def _sort_matches(self):
-        def key_func(t):
-
-            # Sort by import date, existing entry date,
-            # and secondary sort by if there is no import-to-existing
-            # bind.
+    @staticmethod
+    def _match_sort_key(match):
+        # Sort by import date, existing entry date,
+        # and secondary sort by if there is no import-to-existing
+        # bind.
+        existing, imported = match
+        if existing is not None and imported is not None:
+            return_date = imported.date
+        elif existing:
+            return_date = existing.date
+        else:
+            return_date = imported.date
+        return return_date, existing is None
 
-            if None not in t:
-                return_date = t[1].date
-            elif t[0]:
-                return_date = t[0].date
-            else:
-                return_date = t[1].date
-            return return_date, t[0] is None
+    def _sort_matches(self):
+        self.matches.sort(key=self._match_sort_key)
 
-        self.matches.sort(key=key_func)
+    def _replace_matches(self, old_matches, new_matches):
+        # Replaces ``old_matches`` with ``new_matches`` in our sorted ``matches`` without touching
+        # the other matches. Returns False if one of ``old_matches`` isn't there.
+        for match in old_matches:
+            try:
+                self.matches.remove(match)
+            except ValueError:
+                return False
+        keys = [self._match_sort_key(m) for m in self.matches]
+        for match in new_matches:
+            key = self._match_sort_key(match)
+            index = bisect_right(keys, key)
+            keys.insert(index, key)
+            self.matches.insert(index, match)
+        return True
 
     def bind(self, existing, imported):
+        """Binds ``existing`` with ``imported``, which were both unmatched until now.
+
+        Only the two affected matches are updated. If one of our entries was already matched, we
+        recompute all matches.
+        """
         self._user_binds[(existing, imported)] = True  # Bind
-        self._convert_matches()
-        self._sort_matches()
+        if not self._replace_matches([[existing, None], [None, imported]], [[existing, imported]]):
+            self._convert_matches()
+            self._sort_matches()
 
     def unbind(self, existing, imported):
+        """Breaks the match between ``existing`` and ``imported``.
+
+        Like in :meth:`bind`, only the affected match is updated.
+        """
         self._user_binds[(existing, imported)] = False  # Unbind
-        self._convert_matches()
-        self._sort_matches()
+        if not self._replace_matches([[existing, imported]], [[existing, None], [None, imported]]):
+            self._convert_matches()
+            self._sort_matches()
 
     @property
     def selected_target(self):
@@ -460,6 +486,25 @@ class ImportWindow(MainWindowGUIObject):
         self._add_plugin_listeners(select_actions)
         self._always_import_action_plugins.extend(always_actions)
 
+    def _add_panes_for_loader(self, loader):
+        # Each loader gets it's own ``ImportDocument`` class.
+        import_document = ImportDocument(self.app)
+        accounts = [a for a in loader.accounts if a.is_balance_sheet_account() and a.entries]
+        parsing_date_format = DateFormat.from_sysformat(loader.parsing_date_format)
+        import_document.reset_from_loader(loader, parsing_date_format)
+        import_document.cook()
+        for account in accounts:
+            target_account = None
+            if loader.target_account is not None:
+                target_account = loader.target_account
+            elif account.reference:
+                target_account = getfirst(
+                    t for t in self.target_accounts if t.reference == account.reference
+                )
+            self.panes.append(AccountPane(import_document,
+                                          account,
+                                          target_account))
+
     def _add_plugin_listeners(self, plugins):
         listeners = [Listener(plugin) for plugin in plugins
                      if not plugin.always_perform_action()]
@@ -604,33 +649,23 @@ class ImportWindow(MainWindowGUIObject):
         self.target_accounts = [a for a in self.document.accounts if a.is_balance_sheet_account()]
         self.target_accounts.sort(key=lambda a: a.name.lower())
 
-    def refresh_panes(self):
+    def refresh_panes(self, loaders=None):
+        """Re-cooks existing panes and adds panes for the accounts of ``loaders``.
+
+        :param loaders: list of loaded :class:`.loader.base.Loader`. Defaults to the main window's
+                        ``loader``.
+        """
         for pane in self.panes:
             pane.import_document.cook()
 
-        if not hasattr(self.mainwindow, 'loader'):
-            return
-
-        # Each loader gets it's own ``ImportDocument`` class.
-        import_document = ImportDocument(self.app)
+        if loaders is None:
+            if not hasattr(self.mainwindow, 'loader'):
+                return
+            loaders = [self.mainwindow.loader]
 
         self.refresh_targets()
-        accounts = [a for a in self.mainwindow.loader.accounts if a.is_balance_sheet_account() and a.entries]
-
-        parsing_date_format = DateFormat.from_sysformat(self.mainwindow.loader.parsing_date_format)
-        import_document.reset_from_loader(self.mainwindow.loader, parsing_date_format)
-        import_document.cook()
-        for account in accounts:
-            target_account = None
-            if self.mainwindow.loader.target_account is not None:
-                target_account = self.mainwindow.loader.target_account
-            elif account.reference:
-                target_account = getfirst(
-                    t for t in self.target_accounts if t.reference == account.reference
-                )
-            self.panes.append(AccountPane(import_document,
-                                          account,
-                                          target_account))
+        for loader in loaders:
+            self._add_panes_for_loader(loader)
         # XXX Should replace by _update_selected_pane()?
 
         self._always_perform_actions()
@@ -638,8 +673,9 @@ class ImportWindow(MainWindowGUIObject):
         self._refresh_swap_list_items()
         self.import_table.refresh()
 
-    def show(self):
-        self.refresh_panes()
+    def show(self, loaders=None):
+        """Adds panes for ``loaders`` (see :meth:`refresh_panes`) and shows the window."""
+        self.refresh_panes(loaders)
         self.view.refresh_target_accounts()
         self.view.refresh_tabs()
         self.view.show()
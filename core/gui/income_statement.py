@@ -28,12 +28,12 @@ class IncomeStatement(Report):
         account = node.account
         date_range = self.document.date_range
         currency = self.document.default_currency
-        cash_flow = account.entries.normal_cash_flow(date_range)
-        cash_flow_native = account.entries.normal_cash_flow(date_range, currency)
-        last_cash_flow = account.entries.normal_cash_flow(date_range.prev())
-        last_cash_flow_native = account.entries.normal_cash_flow(date_range.prev(), currency)
-        remaining = self.document.budgets.normal_amount_for_account(account, date_range)
-        remaining_native = self.document.budgets.normal_amount_for_account(account, date_range, currency)
+        cash_flow = self.document.normal_cash_flow(account, date_range)
+        cash_flow_native = self.document.normal_cash_flow(account, date_range, currency)
+        last_cash_flow = self.document.normal_cash_flow(account, date_range.prev())
+        last_cash_flow_native = self.document.normal_cash_flow(account, date_range.prev(), currency)
+        remaining = self.document.budgeted_amount_for_account(account, date_range)
+        remaining_native = self.document.budgeted_amount_for_account(account, date_range, currency)
         delta = cash_flow - last_cash_flow
 
         # Amounts for totals are converted in the document's currency
@@ -17,7 +17,8 @@ from ..document import FilterType
 from ..exception import OperationAborted, FileFormatError
 from ..model.date import inc_month, DateFormat
 from ..model.recurrence import Recurrence, RepeatType
-from ..loader import csv, qif, ofx, native
+from ..loader import csv
+from ..loader.batch import parse_file, load_files
 from .base import MESSAGES_DOCUMENT_CHANGED
 from .search_field import SearchField
 from .date_range_selector import DateRangeSelector
@@ -105,6 +106,7 @@ class MainWindow(Repeater, GUIObject):
         self.completion_lookup = CompletionLookup(self)
 
         self.csv_options = CSVOptions(self)
+        self._pending_csv_loaders = []
         self.import_window = ImportWindow(self)
 
         msgs = MESSAGES_DOCUMENT_CHANGED | {'filter_applied', 'date_range_changed'}
@@ -272,12 +274,13 @@ class MainWindow(Repeater, GUIObject):
 
     def _visible_entries_for_account(self, account):
         date_range = self.document.date_range
-        entries = [e for e in account.entries if e.date in date_range]
+        entries = account.entries.entries_in_range(date_range)
         query_string = self.document.filter_string
         filter_type = self.document.filter_type
         if query_string:
             query = self.app.parse_search_query(query_string)
-            entries = [e for e in entries if e.transaction.matches(query)]
+            matching = self.document.oven.search_index.matching(query)
+            entries = [e for e in entries if e.transaction in matching]
         if filter_type is FilterType.Unassigned:
             entries = [e for e in entries if not e.transfer]
         elif (filter_type is FilterType.Income) or (filter_type is FilterType.Expense):
@@ -446,24 +449,42 @@ class MainWindow(Repeater, GUIObject):
         :meth:`load_parsed_file_for_import`.
         """
         default_date_format = DateFormat(self.app.date_format).sys_format
-        for loaderclass in (native.Loader, ofx.Loader, qif.Loader, csv.Loader):
-            try:
-                loader = loaderclass(
-                    self.document.default_currency, default_date_format=default_date_format
-                )
-                loader.parse(filename)
-                break
-            except FileFormatError:
-                pass
-        else:
-            # No file fitted
-            raise FileFormatError(tr('%s is of an unknown format.') % filename)
-        self.loader = loader
+        self.loader = parse_file(filename, self.document.default_currency, default_date_format)
         if isinstance(self.loader, csv.Loader):
             self.csv_options.show()
         else:
             self.load_parsed_file_for_import()
 
+    def parse_files_for_import(self, filenames):
+        """Parses and loads ``filenames`` for importing, all at once.
+
+        Files are loaded in parallel (see :func:`.load_files`) and all those containing accounts
+        to import are shown together in the Import window. CSV files need to be configured before
+        being loaded, so we show the CSV options window for each of them, one after the other (see
+        :meth:`show_next_csv_options`).
+
+        :raises: :exc:`.FileFormatError` listing files that couldn't be imported, after having shown
+                 those that could.
+        """
+        default_date_format = DateFormat(self.app.date_format).sys_format
+        results = load_files(filenames, self.document.default_currency, default_date_format)
+        loaders = []
+        errors = []
+        for filename, result in zip(filenames, results):
+            if isinstance(result, FileFormatError):
+                errors.append(str(result))
+            elif isinstance(result, csv.Loader):
+                self._pending_csv_loaders.append(result)
+            elif any(a.is_balance_sheet_account() for a in result.accounts) and result.transactions:
+                loaders.append(result)
+            else:
+                errors.append(tr('%s does not contain any account to import.') % filename)
+        if loaders:
+            self.import_window.show(loaders)
+        self.show_next_csv_options()
+        if errors:
+            raise FileFormatError('\n'.join(errors))
+
     def select_pane_of_type(self, pane_type, clear_filter=True):
         if clear_filter:
             self.document.filter_string = ''
@@ -503,6 +524,12 @@ class MainWindow(Repeater, GUIObject):
     def show_message(self, message):
         self.view.show_message(message)
 
+    def show_next_csv_options(self):
+        """Shows CSV options for the next CSV file queued by :meth:`parse_files_for_import`."""
+        if self._pending_csv_loaders:
+            self.loader = self._pending_csv_loaders.pop(0)
+            self.csv_options.show()
+
     def toggle_area_visibility(self, area):
         if area in self.hidden_areas:
             self.hidden_areas.remove(area)
@@ -6,8 +6,13 @@
 # which should be included with this package. The terms are also available at 
 # http://www.gnu.org/licenses/gpl-3.0.html
 
+from itertools import groupby
+from operator import itemgetter
+
 from hscommon.trans import tr
-from ..model.date import DateRange
+from ..model.amount import sum_amounts
+from ..model.currency import Currency
+from ..model.date import DateRange, ONE_DAY
 from .balance_graph import BalanceGraph
 from .base import SheetViewNotificationsMixin
 
@@ -23,6 +28,45 @@ class NetWorthGraph(BalanceGraph, SheetViewNotificationsMixin):
         date_range = DateRange(date.min, date)
         return self.document.budgeted_amount_for_target(None, date_range)
     
+    def _balance_changes(self, date_range):
+        # We merge the dates at which the balance of each account changes and sum all balances at
+        # each of those dates. A balance converted from a foreign currency also changes with the
+        # exchange rates of its currency and of ours.
+        currency = self._currency
+        rate_dates = {}
+        changes = []
+        for account in self._accounts:
+            entries = account.entries
+            if not len(entries):
+                continue
+            if account.currency == currency:
+                changes += ((e.date, account, e.balance) for e in entries.entries_in_range(date_range))
+                continue
+            for rate_currency in (account.currency, currency):
+                if rate_currency not in rate_dates:
+                    rate_dates[rate_currency] = rate_currency.rate_change_dates(date_range)
+            dates = {e.date for e in entries.entries_in_range(date_range)}
+            dates.update(rate_dates[account.currency])
+            dates.update(rate_dates[currency])
+            changes += ((date, account, None) for date in dates)
+        changes.sort(key=itemgetter(0))
+        account2balance = {
+            a: a.entries.balance(date=date_range.start - ONE_DAY, currency=currency)
+            for a in self._accounts
+        }
+        result = {}
+        for date, day_changes in groupby(changes, key=itemgetter(0)):
+            for _, account, balance in day_changes:
+                if balance is None:
+                    balance = account.entries.balance(date=date, currency=currency)
+                account2balance[account] = balance
+            # We sum balances like _balance_for_date() does so that we get the exact same amounts.
+            result[date] = sum_amounts(account2balance.values())
+        return result
+
+    def _balance_changes_key(self):
+        return (frozenset(self._accounts), self._currency, Currency.get_rates_db().change_count)
+
     def compute_data(self):
         accounts = set(a for a in self.document.accounts if a.is_balance_sheet_account())
         self._accounts = accounts - self.document.excluded_accounts
@@ -23,9 +23,10 @@ class TransactionSelectionMixin:
 
 
     def select_transactions(self, transactions):
+        transactions = set(transactions)
         selected_indexes = []
-        for index, row in enumerate(self):
-            if hasattr(row, 'transaction') and row.transaction in transactions:
+        for index in range(len(self)):
+            if self._transaction_at(index) in transactions:
                 selected_indexes.append(index)
         self.selected_indexes = selected_indexes
 
@@ -36,7 +37,27 @@ class TransactionSelectionMixin:
         # return self.mainwindow.explicitly_selected_transactions
         return []
 
+    # virtual
+    def _virtual_item_transaction(self, item):
+        # Returns the transaction of a model item of our virtual rows.
+        return item
+
     # private
+    def _date_at(self, index):
+        # Like _transaction_at(), but for the date of the row.
+        item = self.virtual_item(index)
+        if item is not None:
+            return item.date
+        return self[index]._date
+
+    def _transaction_at(self, index):
+        # Returns the transaction of the row at `index` (None if it has none). When our rows are
+        # virtual, we don't want to create rows just for that, so we look at the model item.
+        item = self.virtual_item(index)
+        if item is not None:
+            return self._virtual_item_transaction(item)
+        return getattr(self[index], 'transaction', None)
+
     def _restore_from_explicit_selection(self, refresh_view=True):
         if self._explicitly_selected_transactions:
             self.select_transactions(self._explicitly_selected_transactions)
@@ -48,8 +69,8 @@ class TransactionSelectionMixin:
     def _select_nearest_date(self, target_date):
         # This method assumes that self is sorted by date
         last_delta = datetime.timedelta.max
-        for index, row in enumerate(self):
-            delta = abs(row._date - target_date)
+        for index in range(len(self)):
+            delta = abs(self._date_at(index) - target_date)
             if delta > last_delta:
                 # The last iteration was the correct one
                 self.selected_index = index - 1
@@ -73,7 +73,7 @@ class TransactionView(BaseView, ViewWithTransactionsMixin):
 
     def _set_visible_transactions(self):
         date_range = self.document.date_range
-        txns = [t for t in self.document.oven.transactions if t.date in date_range]
+        txns = self.document.oven.transactions_in_range(date_range)
         query_string = self.document.filter_string
         filter_type = self.document.filter_type
         if not query_string and filter_type is None:
@@ -81,7 +81,8 @@ class TransactionView(BaseView, ViewWithTransactionsMixin):
             return
         if query_string:
             query = self.app.parse_search_query(query_string)
-            txns = [t for t in txns if t.matches(query)]
+            matching = self.document.oven.search_index.matching(query)
+            txns = [t for t in txns if t in matching]
         if filter_type is FilterType.Unassigned:
             txns = [t for t in txns if t.has_unassigned_split]
         elif filter_type is FilterType.Income:
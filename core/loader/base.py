@@ -333,7 +333,7 @@ class Loader:
                 if split_info.amount:
                     currencies.add(split_info.amount.currency)
 
-        self.transaction_infos.sort(key=attrgetter('date'))
+        self.transaction_infos.sort(key=lambda info: (info.date, nonone(info.position, 0)))
         for date, transaction_infos in groupby(self.transaction_infos, attrgetter('date')):
             start_date = min(start_date, date)
             for position, info in enumerate(transaction_infos, start=1):
@@ -375,7 +375,17 @@ class Loader:
             self.budgets.append(budget)
         self._post_load()
         self.oven.cook(datetime.date.min, until_date=None)
-        Currency.get_rates_db().ensure_rates(start_date, [x.code for x in currencies])
+        self._rates_start_date = start_date
+        self._rates_currency_codes = [x.code for x in currencies]
+        self.ensure_rates()
+
+    def ensure_rates(self):
+        """Makes sure that exchange rates for the loaded currencies are available.
+
+        Called by :meth:`load`, but has to be called again when the loader was loaded in another
+        process (see :mod:`core.loader.batch`).
+        """
+        Currency.get_rates_db().ensure_rates(self._rates_start_date, self._rates_currency_codes)
 
 
 class GroupInfo:
@@ -421,6 +431,7 @@ class TransactionInfo:
         self.currency = None
         self.reference = None # will be applied to all splits
         self.mtime = 0
+        self.position = None # when None, the order in which transactions were read determines it
         self.splits = []
 
     def is_valid(self):
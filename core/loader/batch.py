@@ -0,0 +1,100 @@
+# Copyright 2016 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+"""Parses and loads many files for import at once.
+
+Loaders don't depend on the document they're imported into, so we can parse and load them in a
+pool of processes and send them back (pickled) to the main process.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+from hscommon.trans import tr
+
+from ..exception import FileFormatError
+from ..model.currency import Currency, RatesDB
+from . import csv, qif, ofx, native
+
+# Loaders we try, in order, until one can parse the file.
+LOADER_CLASSES = (native.Loader, ofx.Loader, qif.Loader, csv.Loader)
+
+def parse_file(filename, default_currency, default_date_format=None):
+    """Returns a loader having parsed ``filename``.
+
+    We successively try to read it as a moneyGuru file, an OFX, a QIF and finally a CSV.
+
+    :param filename: path of the file to parse.
+    :param default_currency: :class:`.Currency` of accounts that don't specify one.
+    :param default_date_format: sys format of dates, when it can't be guessed.
+    :raises: :exc:`.FileFormatError` if no loader can parse the file.
+    """
+    for loaderclass in LOADER_CLASSES:
+        try:
+            loader = loaderclass(default_currency, default_date_format=default_date_format)
+            loader.parse(filename)
+            return loader
+        except FileFormatError:
+            pass
+    raise FileFormatError(tr('%s is of an unknown format.') % filename)
+
+def load_file(filename, default_currency, default_date_format=None):
+    """Returns a loader having parsed and loaded ``filename``.
+
+    CSV loaders are only parsed because their columns have to be configured before loading.
+
+    Arguments are the same as in :func:`parse_file`.
+    """
+    loader = parse_file(filename, default_currency, default_date_format)
+    if not isinstance(loader, csv.Loader):
+        loader.load()
+    return loader
+
+def _try_load_file(filename, default_currency, default_date_format):
+    try:
+        return load_file(filename, default_currency, default_date_format)
+    except FileFormatError as e:
+        return e
+
+def _load_file_in_process(filename, currencies, default_currency_code, default_date_format):
+    # Currencies registered by plugins in the main process have to be registered here too. As for
+    # exchange rates, the main process takes care of fetching them, so we don't want our rates DB
+    # to have any provider.
+    for args in currencies:
+        Currency.register(*args)
+    Currency.set_rates_db(RatesDB(':memory:', False))
+    return _try_load_file(filename, Currency(default_currency_code), default_date_format)
+
+def load_files(filenames, default_currency, default_date_format=None, max_workers=None):
+    """Loads ``filenames`` in a pool of processes with :func:`load_file`.
+
+    Exchange rates needed by the loaded files are fetched in the main process.
+
+    :param filenames: list of paths to load.
+    :param max_workers: number of processes in our pool. Defaults to the number of CPUs.
+    :returns: a list with, for each filename, either a loader or the :exc:`.FileFormatError` that
+              prevented it from being loaded.
+    """
+    if len(filenames) < 2 or max_workers == 1:
+        result = [_try_load_file(fn, default_currency, default_date_format) for fn in filenames]
+    else:
+        currencies = [
+            (c.code, c.name, c.exponent, c.start_date, c.start_rate, c.stop_date, c.latest_rate, c.priority)
+            for c in Currency.all
+        ]
+        with ProcessPoolExecutor(max_workers) as executor:
+            futures = [
+                executor.submit(
+                    _load_file_in_process, fn, currencies, default_currency.code, default_date_format
+                )
+                for fn in filenames
+            ]
+            result = [future.result() for future in futures]
+        for loader in result:
+            if isinstance(loader, FileFormatError) or isinstance(loader, csv.Loader):
+                continue
+            loader.ensure_rates()
+    return result
+
@@ -0,0 +1,202 @@
+# Copyright 2016 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+"""Loads documents saved in moneyGuru's compact format (see :mod:`core.saver.compact`).
+
+Unlike the other loaders, this one doesn't go through info objects: the file was written by us,
+so we directly create model instances from its rows.
+"""
+
+import datetime
+from collections import defaultdict
+import sqlite3 as sqlite
+
+from hscommon.trans import tr
+from hscommon.util import tryint
+
+from ..exception import FileFormatError
+from ..model.account import Account, Group, AccountList, GroupList
+from ..model.amount import amount_from_shifted
+from ..model.budget import Budget
+from ..model.currency import Currency
+from ..model.recurrence import Recurrence, Spawn
+from ..model.transaction import Transaction, Split
+from ..model.transaction_list import TransactionList
+from ..saver.compact import FORMAT_VERSION, TransactionKind
+
+FILE_HEADER = b'SQLite format 3\0'
+
+def is_compact_file(filename):
+    """Returns whether ``filename`` is a document in the compact format, judging by its header."""
+    try:
+        with open(filename, 'rb') as fp:
+            return fp.read(len(FILE_HEADER)) == FILE_HEADER
+    except IOError:
+        return False
+
+def int2date(value):
+    return datetime.date.fromordinal(value) if value is not None else None
+
+class Loader:
+    """Loads a document in the compact format.
+
+    After :meth:`parse` and :meth:`load` have been called, the loaded document is available through
+    the same attributes as with :class:`core.loader.native.Loader`.
+
+    :param default_currency: :class:`.Currency` of the account list.
+    """
+    def __init__(self, default_currency):
+        self.default_currency = default_currency
+        self.document_id = None
+        self.properties = {}
+        self.groups = GroupList()
+        self.accounts = AccountList(default_currency)
+        self.transactions = TransactionList()
+        self.schedules = []
+        self.budgets = []
+        self.con = None
+        self._currencies = set()
+
+    # --- Private
+    def _amount(self, shifted_value, currency_code):
+        if currency_code is None:
+            return 0
+        try:
+            currency = Currency(currency_code)
+        except ValueError:
+            msg = tr(
+                "Unsupported currency: {}. Aborting load. Did you disable a currency plugin?"
+            ).format(currency_code)
+            raise FileFormatError(msg)
+        self._currencies.add(currency)
+        return amount_from_shifted(shifted_value, currency)
+
+    def _load_transactions(self, account_by_name):
+        # Returns a list of (row, transaction) for all rows of the transactions table.
+        id2splits = defaultdict(list)
+        sql = "select transaction_id, account, amount, currency, memo, reference, reconciliation_date from splits"
+        for txn_id, account_name, amount, currency, memo, reference, recdate in self.con.execute(sql):
+            id2splits[txn_id].append((account_name, amount, currency, memo, reference, recdate))
+        result = []
+        sql = "select * from transactions order by id"
+        for row in self.con.execute(sql):
+            txn_id, kind, _, _, date, position, description, payee, checkno, notes, mtime = row
+            if kind == TransactionKind.ScheduleDeletion:
+                result.append((row, None))
+                continue
+            txn = Transaction(int2date(date), description, payee, checkno)
+            txn.notes = notes or ''
+            txn.position = position
+            txn.mtime = mtime
+            for account_name, amount, currency, memo, reference, recdate in id2splits[txn_id]:
+                account = account_by_name.get(account_name) if account_name else None
+                split = Split(txn, account, self._amount(amount, currency))
+                split.memo = memo or ''
+                split.reference = reference
+                split.reconciliation_date = int2date(recdate)
+                txn.splits.append(split)
+            result.append((row, txn))
+        return result
+
+    def _load_model(self):
+        for name, value in self.con.execute("select name, value from properties"):
+            if name == 'default_currency':
+                value = Currency.by_code.get(value)
+            else:
+                value = tryint(value, default=None)
+            if value is not None:
+                self.properties[name] = value
+        group_by_key = {}
+        for name, group_type in self.con.execute("select name, type from groups"):
+            group = Group(name, group_type)
+            group_by_key[(name, group_type)] = group
+            self.groups.append(group)
+        account_by_name = {}
+        sql = "select name, currency, type, group_name, reference, account_number, inactive, notes from accounts"
+        for row in self.con.execute(sql):
+            name, currency_code, account_type, group_name, reference, account_number, inactive, notes = row
+            try:
+                currency = Currency(currency_code)
+            except ValueError:
+                currency = self.default_currency
+            account = Account(name, currency, account_type)
+            if group_name:
+                account.group = group_by_key.get((group_name, account_type))
+            account.reference = reference
+            account.account_number = account_number or ''
+            account.inactive = bool(inactive)
+            account.notes = notes or ''
+            account_by_name[name] = account
+            self.accounts.add(account)
+        sql = "select id, repeat_type, repeat_every, stop_date from schedules order by id"
+        schedule_rows = list(self.con.execute(sql))
+        txn_rows = self._load_transactions(account_by_name)
+        schedule_id2rows = defaultdict(list)
+        start_date = datetime.date.max
+        for row, txn in txn_rows:
+            kind, schedule_id = row[1], row[2]
+            if kind == TransactionKind.Normal:
+                self.transactions.add(txn, keep_position=True)
+                start_date = min(start_date, txn.date)
+            else:
+                schedule_id2rows[schedule_id].append((row, txn))
+        for schedule_id, repeat_type, repeat_every, stop_date in schedule_rows:
+            rows = schedule_id2rows[schedule_id]
+            ref = next(txn for row, txn in rows if row[1] == TransactionKind.ScheduleRef)
+            recurrence = Recurrence(ref, repeat_type, repeat_every)
+            recurrence.stop_date = int2date(stop_date)
+            for row, txn in rows:
+                kind, recurrence_date = row[1], int2date(row[3])
+                if kind == TransactionKind.ScheduleException:
+                    recurrence.date2exception[recurrence_date] = Spawn(recurrence, txn, recurrence_date, txn.date)
+                elif kind == TransactionKind.ScheduleDeletion:
+                    recurrence.delete_at(recurrence_date)
+                elif kind == TransactionKind.ScheduleGlobalChange:
+                    recurrence.date2globalchange[recurrence_date] = Spawn(recurrence, txn, recurrence_date, txn.date)
+            self.schedules.append(recurrence)
+        sql = "select account, target, amount, currency, repeat_type, repeat_every, start_date, stop_date, notes " \
+            "from budgets"
+        for row in self.con.execute(sql):
+            account_name, target_name, amount, currency, repeat_type, repeat_every, start, stop, notes = row
+            account = account_by_name.get(account_name)
+            if account is None:
+                continue
+            target = account_by_name.get(target_name) if target_name else None
+            budget = Budget(account, target, self._amount(amount, currency), int2date(start), repeat_type=repeat_type)
+            budget.notes = notes or ''
+            budget.stop_date = int2date(stop)
+            if repeat_every:
+                budget.repeat_every = repeat_every
+            self.budgets.append(budget)
+        currencies = self._currencies | {a.currency for a in self.accounts}
+        Currency.get_rates_db().ensure_rates(start_date, [c.code for c in currencies])
+
+    # --- Public
+    def parse(self, filename):
+        """Opens ``filename`` and raises ``FileFormatError`` if it's not a compact document."""
+        if not is_compact_file(filename):
+            raise FileFormatError()
+        try:
+            self.con = sqlite.connect(filename)
+            meta = dict(self.con.execute("select name, value from meta"))
+        except sqlite.DatabaseError:
+            raise FileFormatError()
+        if tryint(meta.get('format_version')) != FORMAT_VERSION:
+            raise FileFormatError()
+        self.document_id = meta.get('document_id')
+
+    def load(self):
+        """Creates model instances from the parsed file.
+
+        You must have called :meth:`parse` before calling this.
+        """
+        try:
+            self._load_model()
+        except sqlite.DatabaseError:
+            raise FileFormatError()
+        finally:
+            self.con.close()
+
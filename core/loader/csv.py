@@ -28,6 +28,10 @@ class CsvField:
     Reference = 'reference'
 
 MERGABLE_FIELDS = {CsvField.Description, CsvField.Payee}
+DIALECT_ATTRS = [
+    'delimiter', 'doublequote', 'escapechar', 'lineterminator', 'quotechar', 'quoting',
+    'skipinitialspace',
+]
 
 class Loader(base.Loader):
     FILE_ENCODING = 'latin-1'
@@ -39,6 +43,18 @@ class Loader(base.Loader):
         self.dialect = None # last used dialect
         self.rawlines = [] # last prepared file
 
+    def __getstate__(self):
+        # Dialects are classes created on the fly, which can't be pickled (see core.loader.batch).
+        state = self.__dict__.copy()
+        if self.dialect is not None:
+            state['dialect'] = {attr: getattr(self.dialect, attr) for attr in DIALECT_ATTRS}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.dialect is not None:
+            self.dialect = type('UnpickledDialect', (csv.Dialect, ), self.dialect)
+
     # --- Private
     @staticmethod
     def _merge_columns(columns, lines):
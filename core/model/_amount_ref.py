@@ -170,3 +170,35 @@ class Amount:
         "*readonly*. ``float``. numerical value of the amount."""
         return self._value
 
+    @property
+    def shifted_value(self):
+        "*readonly*. ``int``. :attr:`value` shifted by the currency's exponent (1.23 USD -> 123)."""
+        return self._shifted_value
+
+
+def sum_amounts(amounts):
+    """Returns the sum of ``amounts``, the same as ``sum(amounts)``.
+
+    In amount.c, no intermediate :class:`Amount` is created.
+    """
+    return sum(amounts)
+
+def running_totals(amounts, start, include=None):
+    """Returns a list of the running totals of ``amounts``, starting from ``start``.
+
+    When ``include`` is not ``None``, it's a sequence of ``bool`` of the same length as
+    ``amounts`` and amounts for which it's false aren't added to the running total. Totals are
+    exactly what ``total += amount`` gives.
+    """
+    total = start
+    result = []
+    if include is None:
+        for amount in amounts:
+            total += amount
+            result.append(total)
+    else:
+        for amount, included in zip(amounts, include):
+            if included:
+                total += amount
+            result.append(total)
+    return result
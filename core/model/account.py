@@ -4,7 +4,9 @@
 # which should be included with this package. The terms are also available at
 # http://www.gnu.org/licenses/gpl-3.0.html
 
+from collections import defaultdict
 from functools import partial
+from itertools import count
 
 from .entry import EntryList
 from .sort import sort_string
@@ -150,6 +152,74 @@ def new_name(base_name, search_func):
         name = '%s %d' % (base_name, index)
     return name
 
+class _ListIndex:
+    """Maps keys to the items of a list having them.
+
+    Used by :class:`AccountList` and :class:`GroupList` to find items without looking at all of
+    them. Because lookups have to return the *first* item of the list that matches, we remember
+    the order in which items were indexed.
+
+    ``keys_func(item)`` returns, for an item, a list of ``(index_name, key)`` tuples. ``None`` keys
+    are not indexed.
+    """
+    def __init__(self, keys_func):
+        self._keys_func = keys_func
+        self._key2items = defaultdict(list)
+        self._item2keys = {}
+        self._item2order = {}
+        self._counter = count()
+
+    def add(self, item):
+        if item in self._item2keys:
+            self.remove(item)
+        else:
+            self._item2order[item] = next(self._counter)
+        keys = [key for key in self._keys_func(item) if key[1] is not None]
+        for key in keys:
+            self._key2items[key].append(item)
+        self._item2keys[item] = keys
+
+    def clear(self):
+        self._key2items.clear()
+        self._item2keys.clear()
+        self._item2order.clear()
+
+    def first(self, keys):
+        """Returns the first indexed item having any of ``keys``, ``None`` if there's none."""
+        candidates = []
+        for key in keys:
+            candidates += self._key2items.get(key, [])
+        if candidates:
+            return min(candidates, key=self._item2order.__getitem__)
+
+    def remove(self, item):
+        for key in self._item2keys.pop(item, []):
+            items = self._key2items[key]
+            items.remove(item)
+            if not items:
+                del self._key2items[key]
+
+    def forget(self, item):
+        self.remove(item)
+        self._item2order.pop(item, None)
+
+    def reindex(self, items):
+        for item in items:
+            keys = [key for key in self._keys_func(item) if key[1] is not None]
+            if item in self._item2keys and keys != self._item2keys[item]:
+                self.add(item)
+
+
+def _normalize_account_name(name):
+    return name.lower().strip()
+
+def _account_index_keys(account):
+    return [
+        ('name', _normalize_account_name(account.name)),
+        ('number', account.account_number or None),
+        ('reference', account.reference),
+    ]
+
 class AccountList(list):
     """Manages the list of :class:`Account` in a document.
 
@@ -158,12 +228,17 @@ class AccountList(list):
     ``default_currency`` is the currency that we want new accounts (created in :meth:`find`) to
     have.
 
+    Accounts are indexed by name, number and reference so that :meth:`find` and
+    :meth:`find_reference` don't have to look at every account. When one of these attributes is
+    changed elsewhere than in :meth:`set_account_name`, :meth:`reindex` has to be called.
+
     Subclasses ``list``.
     """
     def __init__(self, default_currency):
         list.__init__(self)
         self.default_currency = default_currency
         self.auto_created = set()
+        self._index = _ListIndex(_account_index_keys)
 
     def add(self, account):
         """Adds ``account`` to the list.
@@ -172,10 +247,12 @@ class AccountList(list):
         """
         if self.find_reference(account.reference) is None:
             list.append(self, account)
+            self._index.add(account)
 
     def clear(self):
         """Removes all elements from the list."""
         del self[:]
+        self._index.clear()
 
     def filter(self, group=NOT_GIVEN, type=NOT_GIVEN):
         """Returns all accounts of the given ``type`` and/or ``group``.
@@ -193,15 +270,17 @@ class AccountList(list):
     def find(self, name, auto_create_type=None):
         """Returns the first account matching with ``name`` (case insensitive)
 
+        An account also matches when ``name`` starts with its :attr:`Account.account_number`.
+
         If ``auto_create_type`` is not ``None`` and no account is found, create an account of type
         ``auto_create_type`` and return it.
         """
-        normalized = name.lower().strip()
-        for account in self:
-            if account.name.lower().strip() == normalized:
-                return account
-            elif account.account_number and normalized.startswith(account.account_number):
-                return account
+        normalized = _normalize_account_name(name)
+        keys = [('name', normalized)]
+        keys += [('number', normalized[:length]) for length in range(1, len(normalized) + 1)]
+        account = self._index.first(keys)
+        if account is not None:
+            return account
         if auto_create_type:
             account = Account(name.strip(), self.default_currency, type=auto_create_type)
             self.add(account)
@@ -212,9 +291,7 @@ class AccountList(list):
         """Returns the account with ``reference`` or ``None`` if it isn't there."""
         if reference is None:
             return None
-        for account in self:
-            if account.reference == reference:
-                return account
+        return self._index.first([('reference', reference)])
 
     def has_multiple_currencies(self):
         """Returns whether there's at least one account with a different currency.
@@ -231,9 +308,17 @@ class AccountList(list):
         """
         return new_name(base_name, self.find)
 
+    def reindex(self, accounts=None):
+        """Updates our index for ``accounts`` which had their name, number or reference changed.
+
+        If ``accounts`` is ``None``, all our accounts are checked.
+        """
+        self._index.reindex(self if accounts is None else accounts)
+
     def remove(self, account):
         """Removes ``account`` from the list."""
         list.remove(self, account)
+        self._index.forget(account)
         self.auto_created.discard(account)
 
     def set_account_name(self, account, new_name):
@@ -247,7 +332,11 @@ class AccountList(list):
         if (other is not None) and (other is not account):
             raise DuplicateAccountNameError()
         account.name = new_name.strip()
+        self.reindex([account])
+
 
+def _group_index_keys(group):
+    return [('name', (group.name.lower(), group.type))]
 
 class GroupList(list):
     """Manages the list of :class:`Group` in a document.
@@ -257,11 +346,25 @@ class GroupList(list):
     Unlike with accounts, group names are not unique to the whole document, but only within an
     account type. Therefore, there can be an asset group with the same name as a liability group.
 
+    Like :class:`AccountList`, groups are indexed by name. When a group's name or type is changed
+    elsewhere than in :meth:`set_group_name`, :meth:`reindex` has to be called.
+
     Subclasses ``list``.
     """
+    def __init__(self, *args, **kwargs):
+        list.__init__(self, *args, **kwargs)
+        self._index = _ListIndex(_group_index_keys)
+        for group in self:
+            self._index.add(group)
+
+    def append(self, group):
+        list.append(self, group)
+        self._index.add(group)
+
     def clear(self):
         """Removes all elements from the list."""
         del self[:]
+        self._index.clear()
 
     def filter(self, type=NOT_GIVEN):
         """Returns all accounts of the given ``type``.
@@ -279,10 +382,7 @@ class GroupList(list):
         :param name: ``str``
         :param base_type: :class:`AccountType`.
         """
-        lowered = name.lower()
-        for item in self:
-            if item.name.lower() == lowered and item.type == base_type:
-                return item
+        return self._index.first([('name', (name.lower(), base_type))])
 
     def new_name(self, base_name, base_type):
         """Returns a unique name from ``base_name``.
@@ -295,6 +395,18 @@ class GroupList(list):
         """
         return new_name(base_name, partial(self.find, base_type=base_type))
 
+    def reindex(self, groups=None):
+        """Updates our index for ``groups`` which had their name or type changed.
+
+        If ``groups`` is ``None``, all our groups are checked.
+        """
+        self._index.reindex(self if groups is None else groups)
+
+    def remove(self, group):
+        """Removes ``group`` from the list."""
+        list.remove(self, group)
+        self._index.forget(group)
+
     def set_group_name(self, group, newname):
         """Rename ``group`` to ``newname``.
 
@@ -304,4 +416,5 @@ class GroupList(list):
         if (other is not None) and (other is not group):
             raise DuplicateAccountNameError()
         group.name = newname
+        self.reindex([group])
 
@@ -15,10 +15,12 @@ from .currency import Currency
 try:
     if os.environ.get('USE_PY_AMOUNT'):
         raise ImportError()
-    from ._amount import Amount
+    from ._amount import Amount, sum_amounts, running_totals
+    # So that pickle finds our extension type where we import it from.
+    Amount.__module__ = __name__
 except ImportError:
     print("Using amount_ref")
-    from ._amount_ref import Amount
+    from ._amount_ref import Amount, sum_amounts, running_totals
 
 class UnsupportedCurrencyError(ValueError):
     """We're trying to parse an amount specifying an unsupported currency."""
@@ -227,7 +229,7 @@ def parse_amount(
     else:
         raise ValueError('No currency given')
 
-def convert_amount(amount, target_currency, date):
+def convert_amount(amount, target_currency, date, rates_db=None):
     """Returns ``amount`` converted to ``target_currency`` using ``date`` exchange rates.
 
     .. seealso:: :meth:`.Currency.value_in`
@@ -235,13 +237,14 @@ def convert_amount(amount, target_currency, date):
     :param amount: :class:`Amount`
     :param target_currency: :class:`.Currency`
     :param date: ``datetime.date``
+    :param rates_db: See :meth:`.Currency.value_in`.
     """
     if amount == 0:
         return amount
     currency = amount.currency
     if currency == target_currency:
         return amount
-    exchange_rate = currency.value_in(target_currency, date)
+    exchange_rate = currency.value_in(target_currency, date, rates_db)
     return Amount(amount.value * exchange_rate, target_currency)
 
 def prorate_amount(amount, spread_over_range, wanted_range):
@@ -270,3 +273,85 @@ def same_currency(amount1, amount2):
 def of_currency(amount, currency):
     return not amount or amount.currency == currency
 
+def amount_from_shifted(shifted_value, currency):
+    """Returns an :class:`Amount` from a value shifted by ``currency``'s exponent.
+
+    This is the reverse of :attr:`Amount.shifted_value`. If ``currency`` is ``None``, the value
+    has to be zero and ``0`` is returned.
+    """
+    if currency is None:
+        assert not shifted_value
+        return 0
+    return Amount(shifted_value / 10 ** currency.exponent, currency)
+
+class AmountArray:
+    """A column of amounts which we convert and sum in bulk.
+
+    Summing :class:`Amount` instances one by one creates a new instance at each addition. When we
+    have a lot of amounts to sum (all splits of an account, all transactions of a table), we put
+    them in an ``AmountArray``, which sums them in amount.c, only creating :class:`Amount`
+    instances for results.
+
+    Results are exactly those we'd get by summing :class:`Amount` instances, float
+    :attr:`~Amount.value` included: adding zero to an amount gives that very amount, and a converted
+    amount keeps its unrounded value. Like with :class:`Amount`, mixing (non-zero) amounts of
+    different currencies raises ``ValueError``. Use :meth:`convert` first.
+
+    :param amounts: iterable of :class:`Amount` (or ``0``).
+    """
+    def __init__(self, amounts=()):
+        self._amounts = list(amounts)
+
+    def __len__(self):
+        return len(self._amounts)
+
+    def __getitem__(self, index):
+        return self._amounts[index]
+
+    def __repr__(self):
+        return '<AmountArray %d>' % len(self)
+
+    # --- Public
+    def append(self, amount):
+        """Appends ``amount`` (an :class:`Amount` or ``0``) to the array."""
+        self._amounts.append(amount)
+
+    def convert(self, currency, dates, rates_db=None):
+        """Returns a new array with all amounts :func:`converted <convert_amount>` to ``currency``.
+
+        Only non-zero amounts of a currency other than ``currency`` are actually converted, using
+        the rate for the date at the same index in ``dates``. Each rate is only looked up once.
+
+        :param currency: :class:`.Currency`
+        :param dates: sequence of ``datetime.date`` of the same length as the array.
+        :param rates_db: See :meth:`.Currency.value_in`.
+        """
+        result = AmountArray()
+        converted = result._amounts
+        rates = {} # (currency, date): exchange rate
+        for amount, date in zip(self._amounts, dates):
+            if amount and amount.currency != currency:
+                key = (amount.currency, date)
+                rate = rates.get(key)
+                if rate is None:
+                    rate = rates[key] = amount.currency.value_in(currency, date, rates_db)
+                # Same as convert_amount()
+                amount = Amount(amount.value * rate, currency)
+            converted.append(amount)
+        return result
+
+    def cumsum(self, start=0, include=None):
+        """Returns a list of running totals (one for each amount in the array).
+
+        When the running total doesn't change from one amount to the next, the same object is
+        used in both places.
+
+        :param start: :class:`Amount` (or ``0``) from which the running total starts.
+        :param include: sequence of ``bool``, of the same length as the array. When set, amounts for
+                        which it's false are not added to the running total.
+        """
+        return running_totals(self._amounts, start, include)
+
+    def sum(self):
+        """Returns the sum of all amounts in the array."""
+        return sum_amounts(self._amounts)
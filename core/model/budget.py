@@ -6,11 +6,11 @@
 # which should be included with this package. The terms are also available at 
 # http://www.gnu.org/licenses/gpl-3.0.html
 
+from bisect import bisect_left, bisect_right
 from datetime import date
+from operator import attrgetter
 
-from hscommon.util import extract
-
-from .amount import prorate_amount
+from .amount import AmountArray, prorate_amount
 from .date import DateRange, ONE_DAY
 from .recurrence import Recurrence, Spawn, DateCounter, RepeatType
 from .transaction import Transaction, Split
@@ -20,6 +20,7 @@ class BudgetSpawn(Spawn):
 
     The only difference with a normal spawn is that its ``is_budget`` attribute is true.
     """
+    __slots__ = []
     is_budget = True
 
 class Budget(Recurrence):
@@ -69,43 +70,59 @@ class Budget(Recurrence):
         end_date = next(date_counter) - ONE_DAY
         return BudgetSpawn(self, ref, recurrence_date=recurrence_date, date=end_date)
     
-    def get_spawns(self, end, transactions, consumedtxns):
+    def get_spawns(self, end, transactions, consumedtxns, spawn_cache=None, rates_db=None):
         """Returns the list of transactions spawned by our budget.
 
         Works pretty much like :meth:`core.model.recurrence.Recurrence.get_spawns`, except for the
-        extra arguments.
+        extra arguments. Spawns' amounts are adjusted, so if we don't want cached spawns to change,
+        we have to pass a new ``spawn_cache``.
 
-        :param transactions: Transactions that can affect our budget spawns' final amount.
-        :type transactions: list of :class:`.Transaction`
+        :param transactions: Transactions that can affect our budget spawns' final amount. Those not
+                             affecting our account are ignored, so passing only the transactions
+                             affecting it is cheaper.
+        :type transactions: iterable of :class:`.Transaction`
         :param consumedtxns: Transactions that have already been "consumed" by a budget spawn in
                              this current round of spawning (one a budget "ate" a transaction, we
                              don't have it affect another). This set is going to be mutated
                              (augmented) by this method. All you have to do is start with an empty
                              set and pass it around for each call.
         :type consumedtxns: set of :class:`.Transaction`
+        :param dict spawn_cache: See :meth:`.Recurrence.get_spawns`.
+        :param rates_db: See :meth:`.Currency.value_in`.
         """
-        spawns = Recurrence.get_spawns(self, end)
+        spawns = Recurrence.get_spawns(self, end, spawn_cache=spawn_cache)
         # No spawn in the past
         spawns = [spawn for spawn in spawns if spawn.date > date.today()]
         account = self.account
         budget_amount = self.amount if account.is_debit_account() else -self.amount
-        relevant_transactions = set(t for t in transactions if account in t.affected_accounts())
-        relevant_transactions -= consumedtxns
+        relevant_transactions = {
+            t for t in transactions if t not in consumedtxns and account in t.affected_accounts()
+        }
+        # Sort once and bisect each spawn's period rather than scanning all transactions per spawn.
+        relevant_transactions = sorted(relevant_transactions, key=attrgetter('date'))
+        relevant_dates = [t.date for t in relevant_transactions]
         for spawn in spawns:
-            affects_spawn = lambda t: spawn.recurrence_date <= t.date <= spawn.date
-            wheat, shaft = extract(affects_spawn, relevant_transactions)
-            relevant_transactions = shaft
-            txns_amount = sum(t.amount_for_account(account, budget_amount.currency) for t in wheat)
+            low = bisect_left(relevant_dates, spawn.recurrence_date)
+            high = bisect_right(relevant_dates, spawn.date)
+            wheat = [t for t in relevant_transactions[low:high] if t not in consumedtxns]
+            splits = [(s, t.date) for t in wheat for s in t.splits if s.account is account]
+            amounts = AmountArray(s.amount for s, _ in splits)
+            txns_amount = amounts.convert(budget_amount.currency, [d for _, d in splits], rates_db).sum()
             if abs(txns_amount) < abs(budget_amount):
                 spawn_amount = budget_amount - txns_amount
-                if spawn.amount_for_account(account, budget_amount.currency) != spawn_amount:
+                if spawn.amount_for_account(account, budget_amount.currency, rates_db) != spawn_amount:
                     spawn.amount = abs(spawn_amount)
                     spawn.set_splits([Split(spawn, account, spawn_amount), Split(spawn, self.target, -spawn_amount)])
             else:
                 spawn.set_splits([])
-            consumedtxns |= set(wheat)
-        self._previous_spawns = spawns
+            consumedtxns.update(wheat)
+        if spawn_cache is None:
+            self._previous_spawns = spawns
         return spawns
+
+    def set_spawn_cache(self, date2instances, spawns):
+        Recurrence.set_spawn_cache(self, date2instances, spawns)
+        self._previous_spawns = spawns
     
     # --- Public
     def amount_for_date_range(self, date_range, currency):
@@ -6,6 +6,9 @@
 # which should be included with this package. The terms are also available at 
 # http://www.gnu.org/licenses/gpl-3.0.html
 
+from bisect import bisect_left, insort
+from itertools import count, islice
+
 from hscommon.util import dedupe
 
 from .sort import sort_string
@@ -44,3 +47,84 @@ class CompletionList:
             return None
         self._index = (self._index - 1) % len(self._completions)
         return self.current()
+
+
+class CompletionIndex:
+    """Distinct values used by transactions, in reverse mtime order.
+
+    A value's mtime is the highest mtime of the transactions using it. Each value has to be
+    :meth:`added <add>` and :meth:`removed <remove>` with the mtime of the transaction using it,
+    once per transaction. This way, we always know a value's mtime without looking at transactions.
+
+    String values can be looked up by prefix (see :meth:`starting_with`). For this, we keep a list
+    of (normalized) values sorted alphabetically, which we bisect.
+    """
+    def __init__(self):
+        self._value2mtimes = {} # value: {mtime: count}
+        # value: (-mtime, seq). Sort key of values. When mtimes are equal, the value added first
+        # comes first.
+        self._value2key = {}
+        self._seq = count()
+        self._prefixes = None # [(normalized value, value)], lazily built
+        self._ordered = None # cached result of values()
+
+    # --- Private
+    @staticmethod
+    def _normalize(value):
+        return sort_string(value.strip())
+
+    def _update_key(self, value, mtime):
+        seq = self._value2key[value][1]
+        self._value2key[value] = (-mtime, seq)
+
+    # --- Public
+    def add(self, value, mtime):
+        mtimes = self._value2mtimes.get(value)
+        if mtimes is None:
+            mtimes = self._value2mtimes[value] = {}
+            self._value2key[value] = (-mtime, next(self._seq))
+            if self._prefixes is not None:
+                insort(self._prefixes, (self._normalize(value), value))
+        elif -mtime < self._value2key[value][0]:
+            self._update_key(value, mtime)
+        mtimes[mtime] = mtimes.get(mtime, 0) + 1
+        self._ordered = None
+
+    def remove(self, value, mtime):
+        mtimes = self._value2mtimes[value]
+        remaining = mtimes[mtime] - 1
+        if remaining:
+            mtimes[mtime] = remaining
+            return
+        del mtimes[mtime]
+        if not mtimes:
+            del self._value2mtimes[value]
+            del self._value2key[value]
+            if self._prefixes is not None:
+                item = (self._normalize(value), value)
+                del self._prefixes[bisect_left(self._prefixes, item)]
+        elif -mtime == self._value2key[value][0]:
+            self._update_key(value, max(mtimes))
+        self._ordered = None
+
+    def starting_with(self, prefix):
+        """Returns string values starting with ``prefix``, in reverse mtime order.
+
+        Like in :class:`CompletionList`, values are compared in their :func:`.sort_string` form.
+        """
+        if self._prefixes is None:
+            self._prefixes = sorted((self._normalize(v), v) for v in self._value2key)
+        normalized = self._normalize(prefix)
+        result = []
+        for value_normalized, value in islice(self._prefixes, bisect_left(self._prefixes, (normalized, )), None):
+            if not value_normalized.startswith(normalized):
+                break
+            result.append(value)
+        result.sort(key=self._value2key.__getitem__)
+        return result
+
+    def values(self):
+        """Returns all values in reverse mtime order."""
+        if self._ordered is None:
+            self._ordered = sorted(self._value2key, key=self._value2key.__getitem__)
+        return self._ordered
@@ -11,6 +11,7 @@ easily figure out their exchange value.
 """
 
 import os
+from bisect import bisect_left, bisect_right
 from datetime import datetime, date, timedelta
 import logging
 import sqlite3 as sqlite
@@ -131,14 +132,38 @@ class Currency:
         """Returns the range of date for which rates are available for this currency."""
         return self.get_rates_db().date_range(self.code)
 
-    def value_in(self, currency, date):
-        """Returns the value of this currency in terms of the other currency on the given date."""
+    def value_in(self, currency, date, rates_db=None):
+        """Returns the value of this currency in terms of the other currency on the given date.
+
+        :param rates_db: :class:`RatesDB` (or :class:`RatesSnapshot`) to get the rate from. The
+                         global one if ``None``.
+        """
         if self.start_date is not None and date < self.start_date:
             return self.start_rate
         elif self.stop_date is not None and date > self.stop_date:
             return self.latest_rate
         else:
-            return self.get_rates_db().get_rate(date, self.code, currency.code)
+            if rates_db is None:
+                rates_db = self.get_rates_db()
+            return rates_db.get_rate(date, self.code, currency.code)
+
+    def rate_change_dates(self, date_range):
+        """Returns the dates of ``date_range`` at which our value (in any currency) might change.
+
+        On all other dates of ``date_range``, :meth:`value_in` gives the same result as the day
+        before. The result is sorted.
+
+        :param date_range: :class:`.DateRange`
+        """
+        start_date, end_date = date_range.start, date_range.end
+        result = set(self.get_rates_db().rate_dates(self.code, start_date, end_date))
+        if self.start_date is not None and start_date <= self.start_date <= end_date:
+            result.add(self.start_date)
+        if self.stop_date is not None:
+            stop_change = self.stop_date + timedelta(days=1)
+            if start_date <= stop_change <= end_date:
+                result.add(stop_change)
+        return sorted(result)
 
     def set_CAD_value(self, value, date):
         """Sets the currency's value in CAD on the given date."""
@@ -159,14 +184,37 @@ CAD = Currency.register('CAD', 'Canadian dollar', latest_rate=1)
 def date2str(date):
     return '%d%02d%02d' % (date.year, date.month, date.day)
 
+def seek_value_in_CAD(history, str_date, currency_code):
+    """Returns the value in CAD of ``currency_code`` at ``str_date`` from its rate ``history``.
+
+    We look for the nearest rate at or before ``str_date``. If there's none, we look for the nearest
+    rate after it. If there's none either, the currency's latest rate is used.
+
+    :param history: ``([str_date], [CAD value])``, sorted by date.
+    """
+    dates, rates = history
+    index = bisect_right(dates, str_date)
+    if index and rates[index - 1]:
+        return rates[index - 1]
+    index = bisect_left(dates, str_date)
+    if index < len(dates) and rates[index]:
+        return rates[index]
+    return Currency(currency_code).latest_rate
+
 class RatesDB:
     """Stores exchange rates for currencies.
 
     The currencies are identified with ISO 4217 code (USD, CAD, EUR, etc.).
     The rates are represented as float and represent the value of the currency in CAD.
+
+    The first time we need a rate for a currency, its whole rate history is loaded in memory in a
+    single query. Subsequent lookups for that currency are made by bisecting that history instead
+    of hitting the database. When a new rate is set, the history is updated in place and only the
+    cached lookups it affects are invalidated.
     """
     def __init__(self, db_or_path=':memory:', async=True):
-        self._cache = {} # {(date, currency): CAD value
+        self._cache = {} # {currency: {date: CAD value}}
+        self._histories = {} # {currency: ([str_date], [CAD value])}, sorted by date
         self.db_or_path = db_or_path
         if isinstance(db_or_path, str):
             self.con = sqlite.connect(str(db_or_path))
@@ -177,6 +225,9 @@ class RatesDB:
         self.async = async
         self._fetched_values = Queue()
         self._fetched_ranges = {} # a currency --> (start, end) map
+        #: ``int``. Incremented each time a rate is set. Allows data derived from rates to be cached
+        #: until the next change.
+        self.change_count = 0
 
     def _execute(self, *args, **kwargs):
         def create_tables():
@@ -206,18 +257,52 @@ class RatesDB:
             create_tables()
         return self.con.execute(*args, **kwargs) # try again
 
+    def _get_history(self, currency_code):
+        try:
+            return self._histories[currency_code]
+        except KeyError:
+            sql = "select date, rate from rates where currency = ? order by date"
+            rows = self._execute(sql, [currency_code]).fetchall()
+            history = ([row[0] for row in rows], [row[1] for row in rows])
+            self._histories[currency_code] = history
+            return history
+
     def _seek_value_in_CAD(self, str_date, currency_code):
         if currency_code == 'CAD':
             return 1
-
-        def seek(date_op, desc):
-            sql = "select rate from rates where date %s ? and currency = ? order by date %s limit 1" % (date_op, desc)
-            cur = self._execute(sql, [str_date, currency_code])
-            row = cur.fetchone()
-            if row:
-                return row[0]
-
-        return seek('<=', 'desc') or seek('>=', '') or Currency(currency_code).latest_rate
+        return seek_value_in_CAD(self._get_history(currency_code), str_date, currency_code)
+
+    def _update_history(self, str_date, currency_code, value):
+        # Updates the loaded history of `currency_code` and invalidates cached values of the dates
+        # that were resolved through the rates surrounding the updated date.
+        cache = self._cache.get(currency_code)
+        if currency_code not in self._histories:
+            if cache:
+                cache.clear()
+            return
+        dates, rates = self._histories[currency_code]
+        index = bisect_left(dates, str_date)
+        if index < len(dates) and dates[index] == str_date:
+            old_value = rates[index]
+            rates[index] = value
+        else:
+            old_value = None
+            dates.insert(index, str_date)
+            rates.insert(index, value)
+        if not cache:
+            return
+        if not value or old_value == 0:
+            # Null rates are skipped by our seek, so the affected dates could be anywhere.
+            cache.clear()
+            return
+        # Dates between the previous rate and the next one might have been resolved with either of
+        # them (before the first rate, we seek forward).
+        lower = dates[index - 1] if index else None
+        upper = dates[index + 1] if index + 1 < len(dates) else None
+        for cached_date in list(cache):
+            cached_str_date = date2str(cached_date)
+            if (lower is None or cached_str_date > lower) and (upper is None or cached_str_date < upper):
+                del cache[cached_date]
 
     def _ensure_filled(self, date_start, date_end, currency_code):
         """Make sure that the cache contains *something* for each of the dates in the range.
@@ -230,11 +315,12 @@ class RatesDB:
         # provider gives it to us.
         if date_end >= date.today():
             date_end = date.today() - timedelta(1)
-        sql = "select rate from rates where date = ? and currency = ?"
+        dates, _ = self._get_history(currency_code)
         for curdate in iterdaterange(date_start, date_end):
-            cur = self._execute(sql, [date2str(curdate), currency_code])
-            if cur.fetchone() is None:
-                nearby_rate = self._seek_value_in_CAD(date2str(curdate), currency_code)
+            str_date = date2str(curdate)
+            index = bisect_left(dates, str_date)
+            if index == len(dates) or dates[index] != str_date:
+                nearby_rate = self._seek_value_in_CAD(str_date, currency_code)
                 self.set_CAD_value(curdate, currency_code, nearby_rate)
                 logging.debug("Filled currency void for %s at %s (value: %2.2f)", currency_code, curdate, nearby_rate)
 
@@ -256,6 +342,8 @@ class RatesDB:
 
     def clear_cache(self):
         self._cache = {}
+        self._histories = {}
+        self.change_count += 1
 
     def date_range(self, currency_code):
         """Returns (start, end) of the cached rates for currency.
@@ -284,35 +372,68 @@ class RatesDB:
         if not self._fetched_values.empty():
             self._save_fetched_rates()
         # This method is a bottleneck and has been optimized for speed.
-        value1 = None
-        value2 = None
-        if currency1_code == 'CAD':
-            value1 = 1
-        else:
-            value1 = self._cache.get((date, currency1_code))
-        if currency2_code == 'CAD':
-            value2 = 1
-        else:
-            value2 = self._cache.get((date, currency2_code))
-        if value1 is None or value2 is None:
-            str_date = date2str(date)
-            if value1 is None:
-                value1 = self._seek_value_in_CAD(str_date, currency1_code)
-                self._cache[(date, currency1_code)] = value1
-            if value2 is None:
-                value2 = self._seek_value_in_CAD(str_date, currency2_code)
-                self._cache[(date, currency2_code)] = value2
-        return value1 / value2
+        return self._get_CAD_value(date, currency1_code) / self._get_CAD_value(date, currency2_code)
+
+    def _get_CAD_value(self, date, currency_code):
+        if currency_code == 'CAD':
+            return 1
+        try:
+            return self._cache[currency_code][date]
+        except KeyError:
+            value = self._seek_value_in_CAD(date2str(date), currency_code)
+            self._cache.setdefault(currency_code, {})[date] = value
+            return value
+
+    def rate_dates(self, currency_code, start_date, end_date):
+        """Returns the dates between ``start_date`` and ``end_date`` for which we have a rate.
+
+        The rates of ``currency_code`` we return can only change at those dates.
+
+        :param currency_code: ``str``
+        :param start_date: ``datetime.date``
+        :param end_date: ``datetime.date``
+        :rtype: list of ``datetime.date``
+        """
+        if currency_code == 'CAD':
+            return []
+        if not self._fetched_values.empty():
+            self._save_fetched_rates()
+        dates, _ = self._get_history(currency_code)
+        start_index = bisect_left(dates, date2str(start_date))
+        end_index = bisect_right(dates, date2str(end_date))
+        return [datetime.strptime(s, '%Y%m%d').date() for s in dates[start_index:end_index]]
 
     def set_CAD_value(self, date, currency_code, value):
         """Sets the daily value in CAD for currency at date"""
-        # we must clear the whole cache because there might be other dates affected by this change
-        # (dates when the currency server has no rates).
-        self.clear_cache()
         str_date = date2str(date)
         sql = "replace into rates(date, currency, rate) values(?, ?, ?)"
         self._execute(sql, [str_date, currency_code, value])
         self.con.commit()
+        self.change_count += 1
+        # Other dates might be affected by this change (dates when the currency server has no
+        # rates), but only those surrounding `date`.
+        self._update_history(str_date, currency_code, value)
+
+    def snapshot(self, currency_codes):
+        """Returns a :class:`RatesSnapshot` of the rates of ``currency_codes``.
+
+        Rates fetched in the meantime are saved first. Our database connection can only be used from
+        the thread that created it, but the snapshot doesn't need it, so it can be used from any
+        thread.
+
+        :param currency_codes: iterable of ``str``.
+        """
+        if not self._fetched_values.empty():
+            self._save_fetched_rates()
+        histories = {}
+        cache = {}
+        for currency_code in set(currency_codes):
+            if currency_code == 'CAD':
+                continue
+            dates, rates = self._get_history(currency_code)
+            histories[currency_code] = (dates[:], rates[:])
+            cache[currency_code] = dict(self._cache.get(currency_code, {}))
+        return RatesSnapshot(histories, cache)
 
     def register_rate_provider(self, rate_provider):
         """Adds `rate_provider` to the list of providers supported by this DB.
@@ -394,6 +515,36 @@ class RatesDB:
         else:
             do()
 
+class RatesSnapshot:
+    """Read-only copy of some currencies' rates in a :class:`RatesDB`.
+
+    Created with :meth:`RatesDB.snapshot`. Rates are looked up exactly like in :class:`RatesDB`,
+    but only for the currencies that were snapshotted. Looking up any other currency raises
+    ``KeyError``.
+    """
+    def __init__(self, histories, cache):
+        self._histories = histories # {currency: ([str_date], [CAD value])}, sorted by date
+        self._cache = cache # {currency: {date: CAD value}}
+
+    def _get_CAD_value(self, date, currency_code):
+        if currency_code == 'CAD':
+            return 1
+        cache = self._cache[currency_code]
+        try:
+            return cache[date]
+        except KeyError:
+            value = seek_value_in_CAD(self._histories[currency_code], date2str(date), currency_code)
+            cache[date] = value
+            return value
+
+    def get_rate(self, date, currency1_code, currency2_code):
+        """Returns the exchange rate between currency1 and currency2 for date.
+
+        See :meth:`RatesDB.get_rate`.
+        """
+        return self._get_CAD_value(date, currency1_code) / self._get_CAD_value(date, currency2_code)
+
+
 def initialize_db(path):
     """Initialize the app wide currency db if not already initialized."""
     ratesdb = RatesDB(str(path))
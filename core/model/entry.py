@@ -8,10 +8,9 @@
 
 import bisect
 import datetime
-from collections import defaultdict, Sequence
-from itertools import takewhile
+from array import array
+from collections import Sequence
 
-from hscommon.util import flatten
 from .amount import convert_amount, same_currency
 
 class Entry:
@@ -27,6 +26,8 @@ class Entry:
     Most entries are created by the :class:`.Oven`, which does the necessary calculations to compute
     running total information that the entry needs on init.
     """
+    __slots__ = ['split', 'amount', 'balance', 'reconciled_balance', 'balance_with_budget', 'index']
+
     def __init__(self, split, amount, balance, reconciled_balance, balance_with_budget):
         #: The :class:`.Split` our entry wraps.
         self.split = split
@@ -159,16 +160,20 @@ class EntryList(Sequence):
     The main roles of this class is to manage entry order as well as managing "last entries" to be
     able to easily answer questions like "What's the running total of the last entry at date X?"
 
+    To answer these questions quickly, we maintain an array of entry date ordinals (which we can
+    bisect) alongside our entries. For cash flows, we lazily build, for each currency we're asked
+    about, a list of cumulative (converted) amounts aligned with our entries. The cash flow for a
+    date range is then the difference between two items of that list.
+
     :param account: :class:`.Account` for which we manage entries.
     """
     def __init__(self, account):
         #: :class:`.Account` for which we manage entries.
         self.account = account
         self._entries = []
-        self._date2entries = defaultdict(list)
-        self._sorted_entry_dates = []
-        # the key for this dict is (date_range, currency)
-        self._daterange2cashflow = {}
+        self._ordinals = array('l')
+        # currency -> [cumulative cash flow at each entry]
+        self._currency2cash_flows = {}
         self._last_reconciled = None
 
     def __getitem__(self, key):
@@ -189,12 +194,26 @@ class EntryList(Sequence):
         else:
             return 0
 
+    def _cash_flows(self, currency):
+        # Returns cumulative cash flows in ``currency`` for all our entries, extending the list for
+        # entries that were added since last time.
+        cash_flows = self._currency2cash_flows.setdefault(currency, [])
+        if len(cash_flows) < len(self._entries):
+            total = cash_flows[-1] if cash_flows else 0
+            for entry in self._entries[len(cash_flows):]:
+                if not getattr(entry.transaction, 'is_budget', False):
+                    total += convert_amount(entry.amount, currency, entry.date)
+                cash_flows.append(total)
+        return cash_flows
+
     def _cash_flow(self, date_range, currency):
-        cache = self._date2entries
-        entries = flatten(cache[date] for date in date_range if date in cache)
-        entries = (e for e in entries if not getattr(e.transaction, 'is_budget', False))
-        amounts = (convert_amount(e.amount, currency, e.date) for e in entries)
-        return sum(amounts)
+        start_index = bisect.bisect_left(self._ordinals, date_range.start.toordinal())
+        end_index = bisect.bisect_right(self._ordinals, date_range.end.toordinal())
+        if start_index >= end_index:
+            return 0
+        cash_flows = self._cash_flows(currency)
+        before = cash_flows[start_index - 1] if start_index > 0 else 0
+        return cash_flows[end_index - 1] - before
 
     # --- Public
     def add_entry(self, entry):
@@ -205,10 +224,7 @@ class EntryList(Sequence):
         """
         entry.index = len(self)
         self._entries.append(entry)
-        date = entry.date
-        self._date2entries[date].append(entry)
-        if not self._sorted_entry_dates or self._sorted_entry_dates[-1] < date:
-            self._sorted_entry_dates.append(date)
+        self._ordinals.append(entry.date.toordinal())
         if (self._last_reconciled is None) or (entry.reconciliation_key >= self._last_reconciled.reconciliation_key):
             self._last_reconciled = entry
 
@@ -222,6 +238,23 @@ class EntryList(Sequence):
         """
         return self._balance('balance', date, currency=currency)
 
+    def balances_before(self, from_date):
+        """Returns the balances of the entries that :meth:`clear` would keep for ``from_date``.
+
+        This is what we start from when cooking entries from ``from_date``, without having to clear
+        anything yet.
+
+        :param from_date: ``datetime.date``
+        :returns: ``(balance, balance_with_budget, balance_of_reconciled)``
+        """
+        index = bisect.bisect_left(self._ordinals, from_date.toordinal())
+        if not index:
+            return 0, 0, 0
+        kept = self._entries[:index]
+        last = kept[-1]
+        last_reconciled = max(kept, key=lambda e: e.reconciliation_key)
+        return last.balance, last.balance_with_budget, last_reconciled.reconciled_balance
+
     def balance_of_reconciled(self):
         """Returns :attr:`Entry.reconciled_balance` for our last reconciled entry."""
         entry = self._last_reconciled
@@ -243,33 +276,63 @@ class EntryList(Sequence):
         :param currency: :class:`.Currency`
         """
         currency = currency or self.account.currency
-        cache_key = (date_range, currency)
-        if cache_key not in self._daterange2cashflow:
-            cash_flow = self._cash_flow(date_range, currency)
-            self._daterange2cashflow[cache_key] = cash_flow
-        return self._daterange2cashflow[cache_key]
+        return self._cash_flow(date_range, currency)
+
+    def cash_flows(self, date_ranges, currency=None):
+        """Returns the list of :meth:`cash_flow` for each range of ``date_ranges``.
+
+        ``date_ranges`` have to be sorted by start date. This allows us to find the entries of all
+        ranges in a single sweep of our entries rather than searching for each range separately.
+
+        :param date_ranges: list of :class:`.DateRange`
+        :param currency: :class:`.Currency`
+        """
+        currency = currency or self.account.currency
+        cash_flows = self._cash_flows(currency)
+        result = []
+        start_index = 0
+        for date_range in date_ranges:
+            start_index = bisect.bisect_left(self._ordinals, date_range.start.toordinal(), start_index)
+            end_index = bisect.bisect_right(self._ordinals, date_range.end.toordinal(), start_index)
+            if start_index >= end_index:
+                result.append(0)
+                continue
+            before = cash_flows[start_index - 1] if start_index > 0 else 0
+            result.append(cash_flows[end_index - 1] - before)
+        return result
 
     def clear(self, from_date):
         """Remove all entries from ``from_date``."""
         if from_date is None:
-            self._entries = []
+            index = 0
         else:
-            self._entries = list(takewhile(lambda e: e.date < from_date, self._entries))
+            index = bisect.bisect_left(self._ordinals, from_date.toordinal())
+        del self._entries[index:]
+        del self._ordinals[index:]
+        for cash_flows in self._currency2cash_flows.values():
+            del cash_flows[index:]
         if self._entries:
-            index = bisect.bisect_left(self._sorted_entry_dates, from_date)
-            for date in self._sorted_entry_dates[index:]:
-                del self._date2entries[date]
-            for date_range, currency in list(self._daterange2cashflow.keys()):
-                if date_range.end >= from_date:
-                    del self._daterange2cashflow[(date_range, currency)]
-            del self._sorted_entry_dates[index:]
             self._last_reconciled = max(self._entries, key=lambda e: e.reconciliation_key)
         else:
-            self._date2entries = defaultdict(list)
-            self._daterange2cashflow = {}
-            self._sorted_entry_dates = []
             self._last_reconciled = None
 
+    def entries_from(self, from_date):
+        """Returns the entries that :meth:`clear` would remove for ``from_date``.
+
+        :param from_date: ``datetime.date``
+        """
+        index = bisect.bisect_left(self._ordinals, from_date.toordinal())
+        return self._entries[index:]
+
+    def entries_in_range(self, date_range):
+        """Returns the list of entries occurring in ``date_range``.
+
+        :param date_range: :class:`.DateRange`
+        """
+        start_index = bisect.bisect_left(self._ordinals, date_range.start.toordinal())
+        end_index = bisect.bisect_right(self._ordinals, date_range.end.toordinal())
+        return self._entries[start_index:end_index]
+
     def last_entry(self, date=None):
         """Return the last entry with a date that isn't after ``date``.
 
@@ -279,12 +342,9 @@ class EntryList(Sequence):
             if date is None:
                 return self._entries[-1]
             else:
-                if date not in self._date2entries: # find the nearest smaller date
-                    index = bisect.bisect_right(self._sorted_entry_dates, date) - 1
-                    if index < 0:
-                        return None
-                    date = self._sorted_entry_dates[index]
-                return self._date2entries[date][-1]
+                index = bisect.bisect_right(self._ordinals, date.toordinal())
+                if index > 0:
+                    return self._entries[index - 1]
         return None
 
     def normal_balance(self, date=None, currency=None):
@@ -303,3 +363,8 @@ class EntryList(Sequence):
         cash_flow = self.cash_flow(date_range, currency)
         return self.account.normalize_amount(cash_flow)
 
+    def normal_cash_flows(self, date_ranges, currency=None):
+        """Returns :meth:`normalized <.Account.normalize_amount>` :meth:`cash_flows`."""
+        normalize = self.account.normalize_amount
+        return [normalize(cash_flow) for cash_flow in self.cash_flows(date_ranges, currency)]
+
@@ -0,0 +1,44 @@
+# Copyright 2016 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+class CookMemo:
+    """Memoizes figures derived from cooked data until the next cook.
+
+    Many views (sheets, graphs, pie charts) compute the same balances, cash flows and budgeted
+    amounts for the same accounts and date ranges on the same notification. These figures only
+    change when the :class:`.Oven` cooks, so we can compute them once and share them.
+
+    Anything else the figures depend on (date range, currency, excluded accounts) has to be part of
+    the key. For things we can't put in a key (exchange rates, for example), :meth:`clear` can be
+    called explicitly.
+
+    :param oven: :class:`.Oven` whose cooks invalidate our memo.
+    """
+    def __init__(self, oven):
+        self._oven = oven
+        self._cook_count = None
+        self._values = {}
+
+    # --- Public
+    def clear(self):
+        """Forget all memoized values."""
+        self._values = {}
+
+    def get(self, key, compute):
+        """Returns the value memoized under ``key``, calling ``compute()`` if there's none.
+
+        :param key: a hashable describing everything the value depends on.
+        :param compute: callable without arguments returning the value.
+        """
+        if self._oven.cook_count != self._cook_count:
+            self.clear()
+            self._cook_count = self._oven.cook_count
+        try:
+            return self._values[key]
+        except KeyError:
+            result = self._values[key] = compute()
+            return result
+
@@ -6,16 +6,22 @@
 # which should be included with this package. The terms are also available at
 # http://www.gnu.org/licenses/gpl-3.0.html
 
+import bisect
+from array import array
 from collections import defaultdict
 from datetime import date
 from itertools import dropwhile
 from operator import attrgetter
 
+from hscommon.jobprogress.job import nulljob
 from hscommon.util import flatten
 
-from .amount import convert_amount
+from .amount import AmountArray
+from .currency import Currency
 from .entry import Entry
 from .budget import BudgetSpawn
+from .recurrence import Spawn
+from .search import SearchIndex
 
 class Oven:
     """Computes raw data from transactions, schedules, budgets.
@@ -37,13 +43,28 @@ class Oven:
         #: List of cooked transactions, containing :class:`.Transaction` instances mixed with
         #: schedule and budget :class:`.Spawn` instances (in date/position order).
         self.transactions = []
+        # Date ordinals of our cooked transactions, which we bisect to find date ranges.
+        self._ordinals = array('l')
+        #: :class:`.SearchIndex` of :attr:`transactions`, kept up to date as we cook.
+        self.search_index = SearchIndex()
+        #: ``int``. Incremented each time we cook. Allows data derived from cooked entries to be
+        #: cached until the next cook.
+        self.cook_count = 0
 
-    def _budget_spawns(self, until_date, schedule_spawns):
+    def _budget_spawns(self, cook, transactions, until_date, schedule_spawns):
         if not self._budgets:
             return []
         result = []
         ref_date = min(b.start_date for b in self._budgets)
-        relevant_txns = list(dropwhile(lambda t: t.date < ref_date, self._transactions)) + schedule_spawns
+        relevant_txns = list(dropwhile(lambda t: t.date < ref_date, transactions)) + schedule_spawns
+        # Group relevant txns by budget account in a single pass so that each budget only looks at
+        # the txns affecting its own account.
+        budget_accounts = {b.account for b in self._budgets}
+        account2txns = defaultdict(set)
+        for txn in relevant_txns:
+            for split in txn.splits:
+                if split.account in budget_accounts:
+                    account2txns[split.account].add(txn)
         # It's possible to have 2 budgets overlapping in date range and having the same account
         # When it happens, we need to keep track of which budget "consume" which txns
         account2consumedtxns = defaultdict(set)
@@ -51,41 +72,105 @@ class Oven:
             if not budget.amount:
                 continue
             consumedtxns = account2consumedtxns[budget.account]
-            spawns = budget.get_spawns(until_date, relevant_txns, consumedtxns)
+            # Budget spawns' amounts change as we spawn them, so we always start with new ones.
+            spawn_cache = {}
+            spawns = budget.get_spawns(
+                until_date, account2txns[budget.account], consumedtxns, spawn_cache=spawn_cache,
+                rates_db=cook.rates_db
+            )
+            cook.spawn_caches[budget] = (spawn_cache, spawns)
             spawns = [spawn for spawn in spawns if not spawn.is_null]
             result += spawns
         return result
 
-    def _cook_reconciliation_balances(self, splits, start_balance):
-        balance = start_balance
-        result = {} # split: reconciliation balance
+    def _currency_codes(self, transactions):
+        # Codes of the currencies that cooking ``transactions`` (and spawning our recurrences) might
+        # convert from or to.
+        currencies = set()
+        for budget in self._budgets:
+            if budget.amount:
+                currencies.add(budget.amount.currency)
+            currencies.update(a.currency for a in (budget.account, budget.target) if a is not None)
+        txns = list(transactions)
+        for recurrence in list(self._scheduled) + list(self._budgets):
+            txns.append(recurrence.ref)
+            txns += recurrence.date2exception.values()
+            txns += recurrence.date2globalchange.values()
+        for txn in txns:
+            if txn is None:
+                continue
+            for split in txn.splits:
+                if split.amount:
+                    currencies.add(split.amount.currency)
+                if split.account is not None:
+                    currencies.add(split.account.currency)
+        return {c.code for c in currencies}
+
+    def _expand_dirty_accounts(self, dirty_accounts, previous_spawns, new_spawns):
+        # Spawn instances are re-created whenever their recurrence's spawn cache is reset. Entries
+        # of any account touched by a spawn that appeared or disappeared must be re-created.
+        result = set(dirty_accounts)
+        for spawn in set(previous_spawns).symmetric_difference(new_spawns):
+            result |= spawn.affected_accounts()
+        # A budget spawn's amount depends on the transactions of its account, so when that account
+        # is dirty, the entries of the budget's target have to be re-created as well.
+        for budget in self._budgets:
+            if budget.account in result and budget.target is not None:
+                result.add(budget.target)
+        return result
 
+    def _cook_reconciliation_balances(self, splits, start_balance, spawn2position):
         def recdate_key(s):
             t = s.transaction
             rdate = s.reconciliation_date
             if rdate is None:
                 rdate = t.date
-            return (rdate, t.date, t.position)
+            return (rdate, t.date, spawn2position.get(t, t.position))
         by_recdate = sorted(splits, key=recdate_key)
-        for split in by_recdate:
-            if split.reconciled:
-                balance += split.amount
-            result[split] = balance
-        return result
+        amounts = AmountArray(s.amount for s in by_recdate)
+        balances = amounts.cumsum(start_balance, include=[s.reconciled for s in by_recdate])
+        return dict(zip(by_recdate, balances)) # split: reconciliation balance
 
-    def _cook_splits(self, account, splits):
+    def _cook_splits(self, account, splits, from_date, spawn2position, rates_db):
+        # Returns the entries of ``account`` from ``from_date`` along with their running totals,
+        # ``(entries, (balances, reconciled_balances, balances_with_budget))``. Our start balances
+        # are those of the entries that are kept when clearing from ``from_date``.
+        # We don't touch the entries we already have for ``splits``: we might be cooking in another
+        # thread. They're re-used and updated when the cook is applied. Only new splits get new
+        # entries.
         entries = account.entries
-        balance = entries.balance()
-        balance_with_budget = entries.balance_with_budget()
-        split2reconciledbal = self._cook_reconciliation_balances(splits, entries.balance_of_reconciled())
-        for split in splits:
-            amount = split.amount
-            converted_amount = convert_amount(amount, account.currency, split.transaction.date)
-            balance_with_budget += converted_amount
-            if not isinstance(split.transaction, BudgetSpawn):
-                balance += converted_amount
-            reconciled_balance = split2reconciledbal[split]
-            entries.add_entry(Entry(split, amount, balance, reconciled_balance, balance_with_budget))
+        start_balance, start_balance_with_budget, start_reconciled = entries.balances_before(from_date)
+        split2entry = {e.split: e for e in entries.entries_from(from_date)}
+        split2reconciledbal = self._cook_reconciliation_balances(splits, start_reconciled, spawn2position)
+        amounts = AmountArray(s.amount for s in splits)
+        converted = amounts.convert(account.currency, [s.transaction.date for s in splits], rates_db)
+        is_budget = [isinstance(s.transaction, BudgetSpawn) for s in splits]
+        balances = converted.cumsum(start_balance, include=[not b for b in is_budget])
+        if any(is_budget) or start_balance_with_budget != start_balance:
+            balances_with_budget = converted.cumsum(start_balance_with_budget)
+        else:
+            balances_with_budget = balances
+        reconciled_balances = [split2reconciledbal[split] for split in splits]
+        result = []
+        for split, balance, reconciled_balance, balance_with_budget in zip(
+                splits, balances, reconciled_balances, balances_with_budget):
+            entry = split2entry.get(split)
+            if entry is None:
+                entry = Entry(split, split.amount, balance, reconciled_balance, balance_with_budget)
+            result.append(entry)
+        return result, (balances, reconciled_balances, balances_with_budget)
+
+    def transactions_in_range(self, date_range):
+        """Returns the cooked :attr:`transactions` occurring in ``date_range``.
+
+        Because :attr:`transactions` are sorted by date, we get them by bisecting instead of
+        looking at each transaction.
+
+        :param date_range: :class:`.DateRange`
+        """
+        start_index = bisect.bisect_left(self._ordinals, date_range.start.toordinal())
+        end_index = bisect.bisect_right(self._ordinals, date_range.end.toordinal())
+        return self.transactions[start_index:end_index]
 
     def continue_cooking(self, until_date):
         """Cooks from where we stop last time until ``until_date``.
@@ -98,15 +183,37 @@ class Oven:
         if until_date > self._cooked_until:
             self.cook(self._cooked_until, until_date)
 
-    def cook(self, from_date=None, until_date=None):
+    def cook(self, from_date=None, until_date=None, dirty_accounts=None):
         """Cooks raw data into :attr:`transactions`.
 
+        This is :meth:`prepare_cook`, :meth:`compute_cook` and :meth:`apply_cook` in one go.
+
         :param from_date: when set, saves calculation time by re-using existing cooked transactions.
         :type from_date: ``datetime.date``
         :param until_date: because of recurrence, we must always have a date at which we stop
                            cooking. If we don't, we might end up in an infinite loop. If not set,
                            will be the date of the transaction with the highest date.
         :type until_date: ``datetime.date``
+        :param dirty_accounts: when set, only entries of these accounts are re-created. Entries of
+                               other accounts are left intact. It's the caller's responsibility to
+                               make sure that all accounts affected by the change that triggered
+                               the cooking (before *and* after the change) are in there. Accounts
+                               of re-created spawns and targets of budgets for dirty accounts are
+                               automatically added to the set.
+        :type dirty_accounts: set of :class:`.Account`
+        """
+        cook = self.prepare_cook(from_date, until_date, dirty_accounts)
+        self.compute_cook(cook)
+        self.apply_cook(cook)
+
+    def prepare_cook(self, from_date=None, until_date=None, dirty_accounts=None):
+        """Takes a snapshot of what has to be cooked and returns it as a :class:`Cook`.
+
+        Arguments are the same as in :meth:`cook`. This has to be called from the main thread
+        because we sort our raw transactions and take a snapshot of the exchange rates we need from
+        the :class:`.RatesDB`, which can't be used from another thread.
+
+        :rtype: :class:`Cook`
         """
         # Determine from/until dates
         if from_date is None:
@@ -123,22 +230,60 @@ class Oven:
         self._transactions.sort(key=attrgetter('date', 'position')) # needed in case until_date is None
         if until_date is None:
             until_date = self._transactions[-1].date if self._transactions else from_date
-        # Clear old cooked data
-        for account in self._accounts:
-            account.entries.clear(from_date)
-        if from_date == date.min:
-            self.transactions = []
-        else:
-            self.transactions = [t for t in self.transactions if t.date < from_date]
-        # Cook
-        spawns = flatten(recurrence.get_spawns(until_date) for recurrence in self._scheduled)
-        spawns += self._budget_spawns(until_date, spawns)
+        index = bisect.bisect_left(self._ordinals, from_date.toordinal())
+        previous_spawns = [t for t in self.transactions[index:] if isinstance(t, Spawn)]
+        cook = Cook(
+            from_date, until_date, dirty_accounts, list(self._transactions), previous_spawns,
+            self.cook_count
+        )
+        for recurrence in self._scheduled:
+            cook.spawn_caches[recurrence] = (dict(recurrence.date2instances), None)
+        cook.live_spawn_caches = {r: r.date2instances for r in list(self._scheduled) + list(self._budgets)}
+        cook.rates_db = Currency.get_rates_db().snapshot(self._currency_codes(cook.transactions))
+        return cook
+
+    def compute_cook(self, cook, j=nulljob):
+        """Computes the spawns and entries of ``cook``.
+
+        Neither the oven, the accounts, the recurrences nor their cached spawns are modified, so this
+        can be called from another thread. Spawns are cached in copies of recurrences' spawn caches
+        and positions are assigned to spawns in :meth:`apply_cook`. Amounts are converted with the
+        rates snapshot of ``cook``, never with the :class:`.RatesDB`.
+
+        :param cook: :class:`Cook` returned by :meth:`prepare_cook`.
+        :param j: :class:`hscommon.jobprogress.job.Job` to report progress to and to check for
+                  cancellation with.
+        """
+        from_date = cook.from_date
+        until_date = cook.until_date
+        dirty_accounts = cook.dirty_accounts
+        j = j.start_subjob([1, 2])
+        # Spawns before from_date are already cooked, but budgets need schedule spawns from their
+        # start date.
+        spawn_from_date = from_date
+        if self._budgets:
+            spawn_from_date = min([from_date] + [b.start_date for b in self._budgets])
+        spawns = []
+        for recurrence in j.iter_with_progress(list(cook.spawn_caches)):
+            spawn_cache, _ = cook.spawn_caches[recurrence]
+            recurrence_spawns = recurrence.get_spawns(
+                until_date, from_date=spawn_from_date, spawn_cache=spawn_cache
+            )
+            cook.spawn_caches[recurrence] = (spawn_cache, recurrence_spawns)
+            spawns += recurrence_spawns
+        spawns += self._budget_spawns(cook, cook.transactions, until_date, spawns)
         # To ensure that our sort order stay correct and consistent, we assign position values
         # to our spawns. To ensure that there's no overlap, we start our position counter at
         # len(transactions)
-        for counter, spawn in enumerate(spawns, start=len(self._transactions)):
-            spawn.position = counter
-        txns = self._transactions + spawns
+        spawn2position = {
+            spawn: counter for counter, spawn in enumerate(spawns, start=len(cook.transactions))
+        }
+        if dirty_accounts is None:
+            tocook_accounts = self._accounts
+        else:
+            new_spawns = (s for s in spawns if s.date >= from_date)
+            tocook_accounts = self._expand_dirty_accounts(dirty_accounts, cook.previous_spawns, new_spawns)
+        txns = cook.transactions + spawns
         # we don't filter out txns > until_date because they might be budgets affecting current data
         # XXX now that budget's base date is the start date, isn't this untrue?
         tocook = [t for t in txns if from_date <= t.date]
@@ -147,10 +292,113 @@ class Oven:
         account2splits = defaultdict(list)
         for split in splits:
             account = split.account
-            if account is not None:
+            if account is not None and (dirty_accounts is None or account in tocook_accounts):
                 account2splits[account].append(split)
-        for account, splits in account2splits.items():
-            self._cook_splits(account, splits)
+        account2entries = {}
+        account2balances = {}
+        for account, splits in j.iter_with_progress(list(account2splits.items())):
+            entries, balances = self._cook_splits(account, splits, from_date, spawn2position, cook.rates_db)
+            account2entries[account] = entries
+            account2balances[account] = balances
+        cook.tocook_accounts = tocook_accounts
+        cook.account2entries = account2entries
+        cook.account2balances = account2balances
+        cook.spawn2position = spawn2position
+        cook.tocook = tocook
+
+    def apply_cook(self, cook):
+        """Swaps in the result of a :meth:`computed <compute_cook>` ``cook``.
+
+        If we've been cooked since ``cook`` was prepared or if a recurrence's spawn cache was reset
+        in the meantime, its result is stale and nothing is done.
+
+        :param cook: :class:`Cook` returned by :meth:`prepare_cook`.
+        :returns: whether ``cook`` was applied.
+        """
+        if cook.cook_count != self.cook_count or cook.tocook is None:
+            return False
+        if any(r.date2instances is not cache for r, cache in cook.live_spawn_caches.items()):
+            return False
+        for recurrence, (spawn_cache, spawns) in cook.spawn_caches.items():
+            recurrence.set_spawn_cache(spawn_cache, spawns)
+        for spawn, position in cook.spawn2position.items():
+            spawn.position = position
+        from_date = cook.from_date
+        if from_date == date.min:
+            self.transactions = []
+            self._ordinals = array('l')
+            self.search_index.clear()
+        else:
+            index = bisect.bisect_left(self._ordinals, from_date.toordinal())
+            self.search_index.remove(self.transactions[index:])
+            del self.transactions[index:]
+            del self._ordinals[index:]
+        # Clear old cooked data
+        for account in cook.tocook_accounts:
+            account.entries.clear(from_date)
+        for account, entries in cook.account2entries.items():
+            balances, reconciled_balances, balances_with_budget = cook.account2balances[account]
+            entry_list = account.entries
+            for entry, balance, reconciled_balance, balance_with_budget in zip(
+                    entries, balances, reconciled_balances, balances_with_budget):
+                # Re-used entries only need their running totals updated.
+                entry.amount = entry.split.amount
+                entry.balance = balance
+                entry.reconciled_balance = reconciled_balance
+                entry.balance_with_budget = balance_with_budget
+                entry_list.add_entry(entry)
+        tocook = cook.tocook
         self.transactions += tocook
-        self._cooked_until = until_date
+        self._ordinals.extend(t.date.toordinal() for t in tocook)
+        self.search_index.add(tocook)
+        self._cooked_until = cook.until_date
+        self.cook_count += 1
+        return True
+
+    # --- Properties
+    @property
+    def cooked_until(self):
+        """*readonly*. Date until which we're cooked."""
+        return self._cooked_until
+
+
+class Cook:
+    """A snapshot of what has to be cooked by an :class:`Oven`, along with the result once cooked.
+
+    Created by :meth:`Oven.prepare_cook`, filled by :meth:`Oven.compute_cook` and applied by
+    :meth:`Oven.apply_cook`. All initialization arguments are directly assigned to their
+    corresponding attributes.
+    """
+    def __init__(self, from_date, until_date, dirty_accounts, transactions, previous_spawns, cook_count):
+        #: ``datetime.date``. Cooked data from that date is replaced.
+        self.from_date = from_date
+        #: ``datetime.date``. Recurrences are spawned until that date.
+        self.until_date = until_date
+        #: Set of :class:`.Account` whose entries have to be re-created. ``None`` means all of them.
+        self.dirty_accounts = dirty_accounts
+        #: Date/position sorted copy of the oven's raw transactions.
+        self.transactions = transactions
+        #: Previously cooked spawns that are going to be replaced.
+        self.previous_spawns = previous_spawns
+        #: :attr:`Oven.cook_count` at the moment we were prepared.
+        self.cook_count = cook_count
+        #: Accounts whose entries are cleared from :attr:`from_date`.
+        self.tocook_accounts = None
+        #: ``{account: [entry]}`` of entries to add once cleared. Entries that were already there
+        #: before the cook are re-used.
+        self.account2entries = None
+        #: ``{account: (balances, reconciled_balances, balances_with_budget)}`` of running totals
+        #: to set in :attr:`account2entries` once cleared.
+        self.account2balances = None
+        #: ``{recurrence: (spawn_cache, spawns)}``. Copies of recurrences' spawn caches, which are
+        #: filled while computing and installed when applied, along with the spawns computed.
+        self.spawn_caches = {}
+        #: ``{recurrence: date2instances}`` of recurrences' spawn caches when we were prepared.
+        self.live_spawn_caches = None
+        #: ``{spawn: position}`` of positions to give to our spawns.
+        self.spawn2position = None
+        #: :class:`.RatesSnapshot` of the rates we convert amounts with.
+        self.rates_db = None
+        #: New cooked transactions, from :attr:`from_date`.
+        self.tocook = None
 
@@ -6,9 +6,12 @@
 # which should be included with this package. The terms are also available at
 # http://www.gnu.org/licenses/gpl-3.0.html
 
+import bisect
 import copy
 import datetime
+import threading
 from calendar import monthrange
+from collections import OrderedDict
 from itertools import chain
 
 from hscommon.util import nonone
@@ -101,6 +104,66 @@ class DateCounter:
         return new_date
 
 
+class DateSequence:
+    """Memoized list of the dates a :class:`DateCounter` yields.
+
+    Recurrences are spawned over and over again, always from their start date. Instead of
+    re-computing their dates each time, we keep them in a list which we extend as needed.
+
+    Use :func:`get_date_sequence` rather than instantiating this directly.
+
+    Sequences are shared by all documents and by the cooking thread. :attr:`dates` is only ever
+    appended to, under a lock, so it can be read without one.
+    """
+    def __init__(self, base_date, repeat_type, repeat_every):
+        #: List of dates computed so far, in order.
+        self.dates = []
+        self._counter = DateCounter(base_date, repeat_type, repeat_every, datetime.date.max)
+        self._exhausted = False
+        self._lock = threading.Lock()
+
+    def index_after(self, end):
+        """Returns the index, in :attr:`dates`, of the first date after ``end``.
+
+        :attr:`dates` is extended as needed so that ``dates[:index]`` are all the dates up to
+        ``end``.
+        """
+        dates = self.dates
+        if self._exhausted or (dates and dates[-1] >= end):
+            return bisect.bisect_right(dates, end)
+        with self._lock:
+            while not self._exhausted and (not dates or dates[-1] < end):
+                try:
+                    dates.append(next(self._counter))
+                except (StopIteration, OverflowError, ValueError):
+                    # Overflows happen when we reach the limits of datetime.date
+                    self._exhausted = True
+        return bisect.bisect_right(dates, end)
+
+
+DATE_SEQUENCE_CACHE_SIZE = 1000
+# Least recently used sequences come first.
+_date_sequences = OrderedDict()
+_date_sequences_lock = threading.Lock()
+
+def get_date_sequence(base_date, repeat_type, repeat_every):
+    """Returns the shared :class:`DateSequence` for these :class:`DateCounter` arguments.
+
+    We keep at most ``DATE_SEQUENCE_CACHE_SIZE`` sequences. When we need room, the least recently
+    used one is forgotten. Callers holding it can keep using it.
+    """
+    key = (base_date, repeat_type, repeat_every)
+    with _date_sequences_lock:
+        result = _date_sequences.get(key)
+        if result is None:
+            if len(_date_sequences) >= DATE_SEQUENCE_CACHE_SIZE:
+                _date_sequences.popitem(last=False)
+            result = _date_sequences[key] = DateSequence(base_date, repeat_type, repeat_every)
+        else:
+            _date_sequences.move_to_end(key)
+    return result
+
+
 class Spawn(Transaction):
     """Instance of a recurrent transaction at a specific date.
 
@@ -116,6 +179,8 @@ class Spawn(Transaction):
 
     Subclasses :class:`.Transaction`.
     """
+    __slots__ = ['recurrence_date', 'ref', 'recurrence']
+
     def __init__(self, recurrence, ref, recurrence_date, date=None):
         date = date or recurrence_date
         Transaction.__init__(self, date, ref.description, ref.payee, ref.checkno)
@@ -209,6 +274,21 @@ class Recurrence:
     def _create_spawn(self, ref, date):
         return Spawn(self, ref, date)
 
+    @staticmethod
+    def _is_recurrence_date(dates, end_index, date):
+        index = bisect.bisect_left(dates, date, 0, end_index)
+        return index < end_index and dates[index] == date
+
+    def _index_to_spawn_from(self, dates, end_index, from_date):
+        # Returns the index of the first recurrence date which can have a spawn at from_date or
+        # later. Global changes can push spawns after their recurrence date, so we have to start
+        # early enough to include those.
+        deltas = [ref.date - date for date, ref in self.date2globalchange.items()]
+        max_delta = max(deltas + [datetime.timedelta(days=0)])
+        if from_date - datetime.date.min <= max_delta:
+            return 0
+        return bisect.bisect_left(dates, from_date - max_delta, 0, end_index)
+
     def _update_ref(self):
         # Go through our recurrence dates and see if we should either move our start date due to
         # deleted spawns or to update or ref transaction due to a global change that end up being
@@ -282,12 +362,18 @@ class Recurrence:
         self.date2exception[date] = None
         self._update_ref()
 
-    def get_spawns(self, end):
+    def get_spawns(self, end, from_date=None, spawn_cache=None):
         """Returns the list of transactions spawned by our recurrence.
 
         We start at :attr:`start_date` and end at ``end``. We have to specify an end to our spawning
         to avoid getting infinite results.
 
+        If ``from_date`` is specified, we skip spawns happening before it (we might still return a
+        few of them). Spawns being cached, those we return are the same as without ``from_date``.
+
+        If ``spawn_cache`` is specified, it's used instead of :attr:`date2instances`, which is left
+        untouched. It can then be installed with :meth:`set_spawn_cache`.
+
         .. rubric:: End date adjustment
 
         If a changed date end up being smaller than the "spawn date", it's possible that a spawn
@@ -297,8 +383,11 @@ class Recurrence:
         doesn't go far enough, so we must adjust our max date by this delta.
 
         :param datetime.date end: When to stop spawning.
+        :param datetime.date from_date: When to start spawning.
+        :param dict spawn_cache: ``recurrence_date -> spawn`` mapping to use as a cache.
         :rtype: list of :class:`Spawn`
         """
+        date2instances = self.date2instances if spawn_cache is None else spawn_cache
         if self.date2exception:
             end = max(end, max(self.date2exception.keys()))
         if self.date2globalchange:
@@ -307,11 +396,31 @@ class Recurrence:
                 end += -min_date_delta
         end = min(end, nonone(self.stop_date, datetime.date.max))
 
-        date_counter = DateCounter(self.start_date, self.repeat_type, self.repeat_every, end)
+        sequence = get_date_sequence(self.start_date, self.repeat_type, self.repeat_every)
+        dates = sequence.dates
+        end_index = sequence.index_after(end)
         result = []
         global_date_delta = datetime.timedelta(days=0)
         current_ref = self.ref
-        for current_date in date_counter:
+        start_index = 0
+        if from_date is not None:
+            start_index = self._index_to_spawn_from(dates, end_index, from_date)
+        if start_index > 0:
+            # Our iteration below doesn't see what happened before start_index. We have to pick
+            # the global change that applies from there and exceptions that were moved after
+            # from_date.
+            first_date = dates[start_index] if start_index < end_index else datetime.date.max
+            for current_date in sorted(d for d in self.date2globalchange if d < first_date):
+                if self._is_recurrence_date(dates, end_index, current_date):
+                    current_ref = self.date2globalchange[current_date]
+                    global_date_delta = current_ref.date - current_date
+            for current_date in sorted(d for d in self.date2exception if d < first_date):
+                exception = self.date2exception[current_date]
+                if exception is None or exception.date < from_date:
+                    continue
+                if self._is_recurrence_date(dates, end_index, current_date):
+                    result.append(exception)
+        for current_date in dates[start_index:end_index]:
             if current_date in self.date2globalchange:
                 current_ref = self.date2globalchange[current_date]
                 global_date_delta = current_ref.date - current_date
@@ -320,14 +429,14 @@ class Recurrence:
                 if exception is not None:
                     result.append(exception)
             else:
-                if current_date not in self.date2instances:
+                if current_date not in date2instances:
                     spawn = self._create_spawn(current_ref, current_date)
                     if global_date_delta:
                         # Only muck with spawn.date if we have a delta. otherwise we're breaking
                         # budgets.
                         spawn.date = current_date + global_date_delta
-                    self.date2instances[current_date] = spawn
-                result.append(self.date2instances[current_date])
+                    date2instances[current_date] = spawn
+                result.append(date2instances[current_date])
         return result
 
     def reassign_account(self, account, reassign_to=None):
@@ -359,6 +468,14 @@ class Recurrence:
         """Empties :attr:`date2instances`."""
         self.date2instances = {}
 
+    def set_spawn_cache(self, date2instances, spawns):
+        """Installs a spawn cache filled by :meth:`get_spawns`.
+
+        :param dict date2instances: the ``spawn_cache`` passed to :meth:`get_spawns`.
+        :param spawns: the list of spawns :meth:`get_spawns` returned.
+        """
+        self.date2instances = date2instances
+
     def stop_at(self, spawn):
         """Stop further spawning at ``spawn`` (sets :attr:`stop_date`)."""
         self.stop_date = spawn.recurrence_date
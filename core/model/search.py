@@ -0,0 +1,186 @@
+# Copyright 2016 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+"""Inverted index used to resolve search queries without scanning all transactions.
+
+The results of :meth:`SearchIndex.matching` are the same as filtering transactions with
+:meth:`.Transaction.matches`.
+"""
+
+from collections import defaultdict
+
+def trigrams(s):
+    """Returns the set of 3 characters substrings of ``s``."""
+    return {s[i:i+3] for i in range(len(s) - 2)}
+
+class TextIndex:
+    """Maps string values to the transactions having them.
+
+    Distinct values are themselves indexed by trigram so that we can quickly find all values
+    containing a substring. Because values (payees, descriptions, memos) tend to repeat a lot, the
+    number of distinct values is much lower than the number of transactions.
+    """
+    def __init__(self):
+        self._value2txns = {}
+        self._trigram2values = defaultdict(set)
+
+    # --- Public
+    def add(self, value, txn):
+        txns = self._value2txns.get(value)
+        if txns is None:
+            txns = self._value2txns[value] = set()
+            for trigram in trigrams(value):
+                self._trigram2values[trigram].add(value)
+        txns.add(txn)
+
+    def remove(self, value, txn):
+        txns = self._value2txns.get(value)
+        if txns is None:
+            return
+        txns.discard(txn)
+        if not txns:
+            del self._value2txns[value]
+            for trigram in trigrams(value):
+                values = self._trigram2values[trigram]
+                values.discard(value)
+                if not values:
+                    del self._trigram2values[trigram]
+
+    def containing(self, substring):
+        """Returns the set of transactions having a value containing ``substring``."""
+        if len(substring) < 3:
+            candidates = self._value2txns.keys()
+        else:
+            postings = [self._trigram2values.get(trigram) for trigram in trigrams(substring)]
+            if not all(postings):
+                return set()
+            postings.sort(key=len)
+            candidates = postings[0].intersection(*postings[1:])
+        result = set()
+        for value in candidates:
+            if substring in value:
+                result |= self._value2txns[value]
+        return result
+
+    def equal_to(self, value):
+        """Returns the set of transactions having exactly ``value``."""
+        return set(self._value2txns.get(value, ()))
+
+
+class SearchIndex:
+    """Index of transactions by the fields :meth:`.Transaction.matches` looks at.
+
+    The index is maintained incrementally by the :class:`.Oven` as it cooks transactions. Because
+    the values of a transaction can change between the moment it's added and the moment it's
+    removed, we keep the indexed values of each transaction around.
+
+    Accounts are indexed by instance rather than by name. Names (and groups) are looked at when
+    the query is resolved, which allows accounts to be renamed without re-indexing anything.
+    """
+    def __init__(self):
+        self._description = TextIndex()
+        self._payee = TextIndex()
+        self._checkno = TextIndex()
+        self._memo = TextIndex()
+        self._amount2txns = defaultdict(set)
+        self._account2txns = defaultdict(set)
+        self._txn2values = {}
+
+    # --- Private
+    @staticmethod
+    def _discard(index, key, txn):
+        txns = index.get(key)
+        if txns is not None:
+            txns.discard(txn)
+            if not txns:
+                del index[key]
+
+    def _txns_for_accounts(self, accounts):
+        result = set()
+        for account in accounts:
+            result |= self._account2txns[account]
+        return result
+
+    # --- Public
+    def add(self, txns):
+        for txn in txns:
+            if txn in self._txn2values:
+                self.remove([txn])
+            description = txn.description.lower()
+            payee = txn.payee.lower()
+            checkno = txn.checkno.lower()
+            memos = {split.memo.lower() for split in txn.splits}
+            amounts = {abs(split.amount.value) if split.amount else 0 for split in txn.splits}
+            accounts = {split.account for split in txn.splits if split.account is not None}
+            self._txn2values[txn] = (description, payee, checkno, memos, amounts, accounts)
+            self._description.add(description, txn)
+            self._payee.add(payee, txn)
+            self._checkno.add(checkno, txn)
+            for memo in memos:
+                self._memo.add(memo, txn)
+            for amount in amounts:
+                self._amount2txns[amount].add(txn)
+            for account in accounts:
+                self._account2txns[account].add(txn)
+
+    def remove(self, txns):
+        for txn in txns:
+            values = self._txn2values.pop(txn, None)
+            if values is None:
+                continue
+            description, payee, checkno, memos, amounts, accounts = values
+            self._description.remove(description, txn)
+            self._payee.remove(payee, txn)
+            self._checkno.remove(checkno, txn)
+            for memo in memos:
+                self._memo.remove(memo, txn)
+            for amount in amounts:
+                self._discard(self._amount2txns, amount, txn)
+            for account in accounts:
+                self._discard(self._account2txns, account, txn)
+
+    def clear(self):
+        self.__init__()
+
+    def matching(self, query):
+        """Returns the set of indexed transactions matching ``query``.
+
+        :param query: a query ``dict`` as returned by :meth:`.Application.parse_search_query`.
+        :rtype: set of :class:`.Transaction`
+        """
+        result = set()
+        query_description = query.get('description')
+        if query_description is not None:
+            result |= self._description.containing(query_description)
+        query_payee = query.get('payee')
+        if query_payee is not None:
+            result |= self._payee.containing(query_payee)
+        query_checkno = query.get('checkno')
+        if query_checkno is not None:
+            result |= self._checkno.equal_to(query_checkno)
+        query_memo = query.get('memo')
+        if query_memo is not None:
+            result |= self._memo.containing(query_memo)
+        query_amount = query.get('amount')
+        if query_amount is not None:
+            query_value = query_amount.value if query_amount else 0
+            result |= self._amount2txns.get(query_value, set())
+        query_account = query.get('account')
+        if query_account is not None:
+            accounts = [a for a in self._account2txns if a.name.lower() in query_account]
+            result |= self._txns_for_accounts(accounts)
+        query_group = query.get('group')
+        if query_group is not None:
+            accounts = [
+                a for a in self._account2txns
+                if a.group is not None and a.group.name.lower() in query_group
+            ]
+            result |= self._txns_for_accounts(accounts)
+        return result
+
+    def __len__(self):
+        return len(self._txn2values)
+
@@ -30,6 +30,9 @@ class Transaction:
     we initialize what would otherwise be an empty split list with two splits: One adding ``amount``
     to ``account``, and the other adding ``-amount`` to ``None`` (an unassigned split).
     """
+    # Documents can have hundreds of thousands of transactions. Slots make them much smaller.
+    __slots__ = ['date', 'description', 'payee', 'checkno', 'notes', 'splits', 'position', 'mtime']
+
     def __init__(self, date, description=None, payee=None, checkno=None, account=None, amount=None):
         #: Date at which the transation occurs.
         self.date = date
@@ -73,7 +76,7 @@ class Transaction:
             result.splits.append(newsplit)
         return result
 
-    def amount_for_account(self, account, currency):
+    def amount_for_account(self, account, currency, rates_db=None):
         """Returns the total sum attributed to ``account``.
 
         All amounts are converted to ``currency`` before doing the sum. This is needed because we
@@ -81,11 +84,12 @@ class Transaction:
 
         :param account: :class:`.Account`
         :param currency: :class:`.Currency`
+        :param rates_db: See :meth:`.Currency.value_in`.
 
         .. seealso:: :func:`.convert_amount`
         """
         splits = (s for s in self.splits if s.account is account)
-        return sum(convert_amount(s.amount, currency, self.date) for s in splits)
+        return sum(convert_amount(s.amount, currency, self.date, rates_db) for s in splits)
 
     def affected_accounts(self):
         """Returns a set of all accounts affected by self.
@@ -387,7 +391,7 @@ class Transaction:
             if len(splits) < len(self.splits):
                 del self.splits[len(splits):]
             for split, newsplit in zip(self.splits, splits):
-                split.__dict__.update(newsplit.__dict__)
+                split.copy_from(newsplit)
                 split.transaction = self
             for split in splits[len(self.splits):]:
                 split.transaction = self
@@ -480,6 +484,8 @@ class Transaction:
 
 class Split:
     """Assignment of money to an :class:`.Account` within a :class:`Transaction`."""
+    __slots__ = ['transaction', '_account', 'memo', '_amount', 'reconciliation_date', 'reference']
+
     def __init__(self, transaction, account, amount):
         #: Transaction within which our split lives.
         self.transaction = transaction
@@ -496,6 +502,11 @@ class Split:
         return '<Split %r %s>' % (self.account_name, self.amount)
 
     # --- Public
+    def copy_from(self, other):
+        """Copies all attributes of ``other`` into ourselves."""
+        for attr in Split.__slots__:
+            setattr(self, attr, getattr(other, attr))
+
     def is_on_same_side(self, other_split):
         return (self.amount >= 0) == (other_split.amount >= 0)
 
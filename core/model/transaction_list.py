@@ -4,59 +4,120 @@
 # which should be included with this package. The terms are also available at
 # http://www.gnu.org/licenses/gpl-3.0.html
 
-from operator import itemgetter
+from collections import defaultdict
+
+from hscommon.util import dedupe
+
+from .completion import CompletionIndex
 
 class TransactionList(list):
     """Manages the :class:`.Transaction` instances of a document.
 
     This class is mostly about managing transactions sorting order, moving them around and keeping
-    a cache of values to use for completion. There's only one of those in a document, in
+    an index of values to use for completion. There's only one of those in a document, in
     :attr:`.Document.transactions`.
 
+    The completion index is built the first time it's needed and is then kept up to date as
+    transactions are added and removed. Changed transactions have to be passed to
+    :meth:`clear_cache`. Accounts are indexed by instance so that renaming them or making them
+    inactive doesn't require any re-indexing.
+
+    To compute positions without looking at every transaction, we maintain an index of our
+    transactions by date. Transaction dates are often changed directly on the transaction, so the
+    index can't always know about them. Transactions passed to our methods are re-indexed before
+    being processed and :meth:`sort`, which the :class:`.Oven` calls at each cooking, re-indexes
+    all transactions. When changing dates in any other way, call :meth:`reindex`.
+
     Subclasses ``list``.
     """
     def __init__(self, *args, **kwargs):
         list.__init__(self, *args, **kwargs)
         self._descriptions = None
         self._payees = None
-        self._account_names = None
+        self._accounts = None
+        # txn: (description, payee, accounts, mtime) as they were when the txn was indexed.
+        self._txn2completion = None
+        self._date2txns = defaultdict(set)
+        self._txn2date = {}
+        for transaction in self:
+            self._index(transaction)
 
     # --- Overrides
+    def __contains__(self, transaction):
+        return transaction in self._txn2date
+
+    def extend(self, transactions, keep_position=False):
+        """Adds all ``transactions`` to self.
+
+        Same as calling :meth:`add` for each transaction, but cached data is only cleared once.
+        """
+        for transaction in transactions:
+            self._add(transaction, keep_position=keep_position)
+
     def remove(self, transaction):
         """Removes ``transaction`` from the list."""
         list.remove(self, transaction)
-        self.clear_cache()
+        self._unindex(transaction)
+
+    def sort(self, *args, **kwargs):
+        list.sort(self, *args, **kwargs)
+        self.reindex()
 
     # --- Private
-    def _compute_completion_list(self, data_and_mtime):
-        """Returns a list of unique data sorted in mtime order.
+    def _build_completion_index(self):
+        self._descriptions = CompletionIndex()
+        self._payees = CompletionIndex()
+        self._accounts = CompletionIndex()
+        self._txn2completion = {}
+        for transaction in self:
+            self._index_completion(transaction)
+
+    def _index_completion(self, transaction):
+        values = (
+            transaction.description, transaction.payee, tuple(transaction.affected_accounts()),
+            transaction.mtime
+        )
+        self._txn2completion[transaction] = values
+        description, payee, accounts, mtime = values
+        self._descriptions.add(description, mtime)
+        self._payees.add(payee, mtime)
+        for account in accounts:
+            self._accounts.add(account, mtime)
+
+    def _unindex_completion(self, transaction):
+        values = self._txn2completion.pop(transaction, None)
+        if values is None:
+            return
+        description, payee, accounts, mtime = values
+        self._descriptions.remove(description, mtime)
+        self._payees.remove(payee, mtime)
+        for account in accounts:
+            self._accounts.remove(account, mtime)
 
-        ``data_and_mtime`` is an iterable containing ``(data, mtime)`` pairs.
-        """
-        data2mtime = {}
-        for data, mtime in data_and_mtime:
-            maxmtime = max(mtime, data2mtime.get(data, 0))
-            data2mtime[data] = maxmtime
-        data_and_mtime = sorted(data2mtime.items(), key=itemgetter(1), reverse=True)
-        return [data for data, mtime in data_and_mtime]
-
-    def _compute_account_names(self):
-        def data_and_mtime_gen():
-            for txn in self:
-                mtime = txn.mtime
-                for account in txn.affected_accounts():
-                    if not account.inactive:
-                        yield (account.name, mtime)
-
-        self._account_names = self._compute_completion_list(data_and_mtime_gen())
-
-    def _compute_descriptions(self):
-        data_and_mtime = ((t.description, t.mtime) for t in self)
-        self._descriptions = self._compute_completion_list(data_and_mtime)
-
-    def _compute_payees(self):
-        data_and_mtime = ((t.payee, t.mtime) for t in self)
-        self._payees = self._compute_completion_list(data_and_mtime)
+    def _add(self, transaction, keep_position=False, position=None):
+        if position is not None:
+            transaction.position = position
+        elif not keep_position:
+            transactions = self.transactions_at_date(transaction.date)
+            if transactions:
+                transaction.position = max(t.position for t in transactions) + 1
+        self.append(transaction)
+        self._index(transaction)
+
+    def _index(self, transaction):
+        self._date2txns[transaction.date].add(transaction)
+        self._txn2date[transaction] = transaction.date
+        if self._txn2completion is not None:
+            self._index_completion(transaction)
+
+    def _unindex(self, transaction):
+        date = self._txn2date.pop(transaction)
+        transactions = self._date2txns[date]
+        transactions.discard(transaction)
+        if not transactions:
+            del self._date2txns[date]
+        if self._txn2completion is not None:
+            self._unindex_completion(transaction)
 
     # --- Public
     def add(self, transaction, keep_position=False, position=None):
@@ -65,29 +126,28 @@ class TransactionList(list):
         If you want ``transaction.position`` to stay intact, call with ``keep_position`` at True. If
         you  specify a position, this is the one that will be used.
         """
-        if position is not None:
-            transaction.position = position
-        elif not keep_position:
-            transactions = self.transactions_at_date(transaction.date)
-            if transactions:
-                transaction.position = max(t.position for t in transactions) + 1
-        self.append(transaction)
-        self.clear_cache()
+        self._add(transaction, keep_position=keep_position, position=position)
 
     def clear(self):
         """Clears the list of all transactions."""
         del self[:]
+        self._date2txns.clear()
+        self._txn2date.clear()
         self.clear_cache()
 
-    def clear_cache(self):
-        """Clears cached data.
+    def clear_cache(self, transactions=None):
+        """Updates cached data for ``transactions``, which were changed.
 
-        For now cache date is auto-completion data (payee, transaction, account). Call this when
-        a transaction has been changed.
+        For now cached data is auto-completion data (description, payee, account). If
+        ``transactions`` is ``None``, all cached data is dropped and is rebuilt when needed.
         """
-        self._descriptions = None
-        self._payees = None
-        self._account_names = None
+        if transactions is None:
+            self._txn2completion = None
+        elif self._txn2completion is not None:
+            for transaction in transactions:
+                if transaction in self._txn2completion:
+                    self._unindex_completion(transaction)
+                    self._index_completion(transaction)
 
     def reassign_account(self, account, reassign_to=None):
         """Calls :meth:`.Transaction.reassign_account` on all transactions.
@@ -95,11 +155,15 @@ class TransactionList(list):
         If, after such an operation, a transaction ends up referencing no account at all, it is
         removed.
         """
+        changed = []
         for transaction in self[:]:
+            was_affected = account in transaction.affected_accounts()
             transaction.reassign_account(account, reassign_to)
             if not transaction.affected_accounts():
                 self.remove(transaction)
-        self.clear_cache()
+            elif was_affected:
+                changed.append(transaction)
+        self.clear_cache(changed)
 
     def move_before(self, from_transaction, to_transaction):
         """Moves ``from_transaction`` just before ``to_transaction``.
@@ -109,6 +173,8 @@ class TransactionList(list):
         """
         if from_transaction not in self:
             return
+        # It's common to move a transaction right after having changed its date.
+        self.reindex([from_transaction])
         if to_transaction is not None and to_transaction.date != from_transaction.date:
             to_transaction = None
         transactions = self.transactions_at_date(from_transaction.date)
@@ -128,29 +194,53 @@ class TransactionList(list):
         """Equivalent to :meth:`move_before` with ``to_transaction`` to ``None``."""
         self.move_before(transaction, None)
 
+    def reindex(self, transactions=None):
+        """Updates our date index for ``transactions`` which had their date changed.
+
+        If ``transactions`` is ``None``, all our transactions are checked.
+        """
+        if transactions is None:
+            transactions = self
+        for transaction in transactions:
+            indexed_date = self._txn2date.get(transaction)
+            if indexed_date is not None and indexed_date != transaction.date:
+                self._unindex(transaction)
+                self._index(transaction)
+
     def transactions_at_date(self, target_date):
         """Returns a set of all transactions occurring on ``target_date``."""
-        return set(t for t in self if t.date == target_date)
+        # Transactions which had their date changed since they were indexed are excluded.
+        return set(t for t in self._date2txns.get(target_date, ()) if t.date == target_date)
+
+    def completions(self, attrname, prefix):
+        """Returns values of ``attrname`` starting with ``prefix``, in reverse mtime order.
+
+        :param attrname: ``'description'`` or ``'payee'``.
+        :param prefix: ``str``. Compared in its :func:`.sort_string` form.
+        """
+        if self._txn2completion is None:
+            self._build_completion_index()
+        index = self._descriptions if attrname == 'description' else self._payees
+        return index.starting_with(prefix)
 
     # --- Properties
     @property
     def account_names(self):
         """A list of active account names used in the transactions, in reverse mtime order."""
-        if self._account_names is None:
-            self._compute_account_names()
-        return self._account_names
+        if self._txn2completion is None:
+            self._build_completion_index()
+        return dedupe(a.name for a in self._accounts.values() if not a.inactive)
 
     @property
     def descriptions(self):
         """A list of descriptions used in the transactions, in reverse mtime order."""
-        if self._descriptions is None:
-            self._compute_descriptions()
-        return self._descriptions
+        if self._txn2completion is None:
+            self._build_completion_index()
+        return self._descriptions.values()[:]
 
     @property
     def payees(self):
         """A list of payees used in the transactions, in reverse mtime order."""
-        if self._payees is None:
-            self._compute_payees()
-        return self._payees
-
+        if self._txn2completion is None:
+            self._build_completion_index()
+        return self._payees.values()[:]
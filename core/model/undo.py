@@ -7,6 +7,7 @@
 # http://www.gnu.org/licenses/gpl-3.0.html
 
 import copy
+import sys
 
 from hscommon.util import extract, flatten
 
@@ -16,15 +17,77 @@ ACCOUNT_SWAP_ATTRS = ['name', 'currency', 'type', 'group', 'account_number', 'no
 GROUP_SWAP_ATTRS = ['name', 'type']
 TRANSACTION_SWAP_ATTRS = ['date', 'description', 'payee', 'checkno', 'notes', 'position', 'splits']
 SPLIT_SWAP_ATTRS = ['account', 'amount', 'reconciliation_date']
-SCHEDULE_SWAP_ATTRS = ['repeat_type', 'repeat_every', 'stop_date', 'date2exception',
-                       'date2globalchange', 'date2instances']
+# Attributes we compare when determining if the splits of a transaction changed.
+SPLIT_COMPARE_ATTRS = ['account', 'amount', 'memo', 'reconciliation_date', 'reference']
+# date2instances isn't backed up: it's a spawn cache that we reset when undoing.
+SCHEDULE_SWAP_ATTRS = ['repeat_type', 'repeat_every', 'stop_date', 'date2exception', 'date2globalchange']
 BUDGET_SWAP_ATTRS = SCHEDULE_SWAP_ATTRS + ['account', 'target', 'amount']
 
-def swapvalues(first, second, attrs):
-    for attr in attrs:
-        tmp = getattr(first, attr)
-        setattr(first, attr, getattr(second, attr))
-        setattr(second, attr, tmp)
+# Default memory budget of the Undoer. When it's exceeded, the oldest actions are forgotten.
+UNDO_MAX_ACTIONS = 1000
+UNDO_MAX_BYTES = 64 * 1024 * 1024
+
+def backup(obj, attrs):
+    """Returns a ``{attr: value}`` dict of ``obj``'s current values for ``attrs``."""
+    return {attr: getattr(obj, attr) for attr in attrs}
+
+def backup_transaction(txn):
+    result = backup(txn, TRANSACTION_SWAP_ATTRS)
+    # Splits are often changed in place, so we need copies of them.
+    result['splits'] = [copy.copy(split) for split in txn.splits]
+    return result
+
+def backup_schedule(schedule, attrs):
+    result = backup(schedule, attrs)
+    result['date2exception'] = copy.copy(schedule.date2exception)
+    result['date2globalchange'] = copy.copy(schedule.date2globalchange)
+    return result
+
+def swap_backup(obj, values):
+    """Sets ``obj``'s attributes to ``values``, which then becomes the backup of its old values."""
+    for attr, value in values.items():
+        values[attr] = getattr(obj, attr)
+        setattr(obj, attr, value)
+
+def compact_backup(obj, values, following_values, key=None):
+    """Removes from ``values`` the attributes that weren't changed.
+
+    :param obj: Instance that ``values`` is a backup of.
+    :param values: ``{attr: value}`` as returned by :func:`backup`.
+    :param following_values: ``{key: values}`` of backups taken by the action that followed. They
+                             are what attributes of those instances were before that action (and
+                             after ours) even if that action already happened.
+    :param key: Key of ``obj`` in ``following_values``, if it isn't ``obj`` itself.
+    """
+    current = following_values.get(obj if key is None else key, {})
+    for attr, value in list(values.items()):
+        now = current[attr] if attr in current else getattr(obj, attr)
+        if attr == 'splits':
+            unchanged = splits_equal(value, now, following_values)
+        else:
+            unchanged = now == value
+        if unchanged:
+            del values[attr]
+
+def splits_equal(old_splits, splits, following_values):
+    if len(old_splits) != len(splits):
+        return False
+    for old, split in zip(old_splits, splits):
+        current = following_values.get(split, {})
+        for attr in SPLIT_COMPARE_ATTRS:
+            now = current[attr] if attr in current else getattr(split, attr)
+            if now != getattr(old, attr):
+                return False
+    return True
+
+def backup_size(values):
+    """Returns an estimate of the memory taken by ``values``, a backup, in bytes."""
+    result = sys.getsizeof(values)
+    for value in values.values():
+        result += sys.getsizeof(value)
+        if isinstance(value, list): # split copies
+            result += sum(sys.getsizeof(split) for split in value)
+    return result
 
 class Action:
     """A unit of change that can be undone and redone.
@@ -35,12 +98,16 @@ class Action:
     ``transactions``, ``schedules``, ``budgets``).
 
     For ``added`` and ``deleted``, it's rather easy. The set contains instances directly. For
-    ``change``, it's different. The set contains 2-sized tuples ``(instance, backup)``. Whenever
-    we're about to make a change to something, we copy it first and store that backup. Then, when
-    we undo our action, we can use our backup.
+    ``change``, it's different. It's a dict mapping instances to a backup of their attributes in the
+    form of a ``{attr: value}`` dict (for schedules, it's a ``(values, ref_values)`` tuple).
+    Whenever we're about to make a change to something, we back it up first. Then, when we undo our
+    action, we can use our backup.
+
+    Backups are complete when taken, but once the change has happened, :meth:`compact` removes
+    attributes that didn't change from them. Then, we only keep field-level deltas.
 
     To create an action, you can operate on set attributes directly for ``added`` and ``deleted``,
-    but you should use convenience method for ``changed``. They perform the copying for you.
+    but you should use convenience method for ``changed``. They perform the backup for you.
 
     :param str description: A description of the action which will be shown to the user. Example:
                             "Add Transaction", which will show as "Undo Add Transaction".
@@ -48,37 +115,60 @@ class Action:
     def __init__(self, description):
         self.description = description
         self.added_accounts = set()
-        self.changed_accounts = set()
+        self.changed_accounts = {}
         self.deleted_accounts = set()
         self.added_groups = set()
-        self.changed_groups = set()
+        self.changed_groups = {}
         self.deleted_groups = set()
         self.added_transactions = set()
-        self.changed_transactions = set()
+        self.changed_transactions = {}
         self.deleted_transactions = set()
-        self.changed_splits = set()
+        self.changed_splits = {}
         self.added_schedules = set()
-        self.changed_schedules = set()
+        self.changed_schedules = {}
         self.deleted_schedules = set()
         self.added_budgets = set()
-        self.changed_budgets = set()
+        self.changed_budgets = {}
         self.deleted_budgets = set()
+        self.compacted = False
+
+    # --- Private
+    def _all_backups(self):
+        # {instance: values} for all our backups. Schedule refs can be replaced by another instance
+        # during a change, so we key them with (schedule, 'ref').
+        result = {}
+        for changed in [self.changed_accounts, self.changed_groups, self.changed_transactions,
+                        self.changed_splits, self.changed_budgets]:
+            result.update(changed)
+        for schedule, (values, ref_values) in self.changed_schedules.items():
+            result[schedule] = values
+            result[(schedule, 'ref')] = ref_values
+        return result
 
+    # --- Public
     def change_accounts(self, accounts):
         """Record imminent changes to ``accounts``."""
-        self.changed_accounts |= set((a, copy.copy(a)) for a in accounts)
+        for account in accounts:
+            if account not in self.changed_accounts:
+                self.changed_accounts[account] = backup(account, ACCOUNT_SWAP_ATTRS)
 
     def change_groups(self, groups):
         """Record imminent changes to ``groups``."""
-        self.changed_groups |= set((g, copy.copy(g)) for g in groups)
+        for group in groups:
+            if group not in self.changed_groups:
+                self.changed_groups[group] = backup(group, GROUP_SWAP_ATTRS)
 
     def change_schedule(self, schedule):
         """Record imminent changes to ``schedule``."""
-        self.changed_schedules.add((schedule, schedule.replicate()))
+        if schedule not in self.changed_schedules:
+            self.changed_schedules[schedule] = (
+                backup_schedule(schedule, SCHEDULE_SWAP_ATTRS), backup_transaction(schedule.ref)
+            )
 
     def change_budget(self, budget):
         """Record imminent changes to ``budget``."""
-        self.changed_budgets.add((budget, budget.replicate()))
+        if budget not in self.changed_budgets:
+            self.changed_budgets[budget] = backup_schedule(budget, BUDGET_SWAP_ATTRS)
 
     def change_transactions(self, transactions):
         """Record imminent changes to ``transactions``.
@@ -87,13 +177,53 @@ class Action:
         schedule.
         """
         spawns, normal = extract(lambda t: isinstance(t, Spawn), transactions)
-        self.changed_transactions |= set((t, t.replicate()) for t in normal)
+        for txn in normal:
+            if txn not in self.changed_transactions:
+                self.changed_transactions[txn] = backup_transaction(txn)
         for schedule in set(spawn.recurrence for spawn in spawns):
             self.change_schedule(schedule)
 
     def change_splits(self, splits):
         """Record imminent changes to ``splits``."""
-        self.changed_splits |= set((s, copy.copy(s)) for s in splits)
+        for split in splits:
+            if split not in self.changed_splits:
+                self.changed_splits[split] = backup(split, SPLIT_SWAP_ATTRS)
+
+    def compact(self, following=None):
+        """Reduces our backups to the attributes that were actually changed.
+
+        This must be called once our changes have happened. If another action has been recorded
+        since then, it has to be passed as ``following`` so that we can compare our backups with
+        what instances were before its changes.
+        """
+        if self.compacted:
+            return
+        following_values = following._all_backups() if following is not None else {}
+        for changed in [self.changed_accounts, self.changed_groups, self.changed_transactions,
+                        self.changed_splits, self.changed_budgets]:
+            for obj, values in list(changed.items()):
+                compact_backup(obj, values, following_values)
+                if not values:
+                    del changed[obj]
+        for schedule, (values, ref_values) in list(self.changed_schedules.items()):
+            compact_backup(schedule, values, following_values)
+            compact_backup(schedule.ref, ref_values, following_values, key=(schedule, 'ref'))
+            if not (values or ref_values):
+                del self.changed_schedules[schedule]
+        self.compacted = True
+
+    def size_estimate(self):
+        """Returns an estimate, in bytes, of the memory our backups and deleted instances take."""
+        result = 0
+        for changed in [self.changed_accounts, self.changed_groups, self.changed_transactions,
+                        self.changed_splits, self.changed_budgets]:
+            result += sys.getsizeof(changed) + sum(backup_size(values) for values in changed.values())
+        for values, ref_values in self.changed_schedules.values():
+            result += backup_size(values) + backup_size(ref_values)
+        # Deleted transactions are only kept alive by us. Added ones live in the document.
+        for txn in self.deleted_transactions:
+            result += sys.getsizeof(txn) + sum(sys.getsizeof(split) for split in txn.splits)
+        return result
 
     def delete_accounts(self, accounts, reassign=False):
         """Record the imminent deletion of ``accounts``.
@@ -125,9 +255,18 @@ class Undoer:
     How it works is that it holds a list of :class:`.Action` and a pointer to our current action
     (most of the time, it's the last action). When we undo or redo an action, we use the information
     we has stored in our action and make proper modifications, then move our action index.
+
+    Actions are compacted (see :meth:`Action.compact`) when the action following them is recorded.
+    When we hold more than ``max_actions`` actions or when their estimated size is more than
+    ``max_bytes``, we forget the oldest ones. The last action is always kept. ``None`` means no
+    limit.
     """
-    def __init__(self, accounts, groups, transactions, scheduled, budgets):
+    def __init__(
+            self, accounts, groups, transactions, scheduled, budgets,
+            max_actions=UNDO_MAX_ACTIONS, max_bytes=UNDO_MAX_BYTES):
         self._actions = []
+        # Estimated size of each action in self._actions
+        self._sizes = []
         self._accounts = accounts
         self._groups = groups
         self._transactions = transactions
@@ -135,6 +274,12 @@ class Undoer:
         self._budgets = budgets
         self._index = -1
         self._save_point = None
+        # Last action we forgot. Having undone all our actions brings us back to the point right
+        # after it.
+        self._base = None
+        self._listeners = []
+        self.max_actions = max_actions
+        self.max_bytes = max_bytes
 
     # --- Private
     def _add_auto_created_accounts(self, transaction):
@@ -148,8 +293,8 @@ class Undoer:
             self._accounts.add(account)
         for group in groups:
             self._groups.append(group)
+        self._transactions.extend(transactions, keep_position=True)
         for txn in transactions:
-            self._transactions.add(txn, keep_position=True)
             self._add_auto_created_accounts(txn)
         for schedule in schedules:
             self._scheduled.append(schedule)
@@ -157,23 +302,28 @@ class Undoer:
             self._budgets.append(budget)
 
     def _do_changes(self, action):
-        for account, old in action.changed_accounts:
-            swapvalues(account, old, ACCOUNT_SWAP_ATTRS)
-        for group, old in action.changed_groups:
-            swapvalues(group, old, GROUP_SWAP_ATTRS)
-        for txn, old in action.changed_transactions:
+        for account, values in action.changed_accounts.items():
+            swap_backup(account, values)
+        self._accounts.reindex(action.changed_accounts)
+        for group, values in action.changed_groups.items():
+            swap_backup(group, values)
+        self._groups.reindex(action.changed_groups)
+        for txn, values in action.changed_transactions.items():
             self._remove_auto_created_account(txn)
-            swapvalues(txn, old, TRANSACTION_SWAP_ATTRS)
-            for split in txn.splits:
-                split.transaction = txn
+            self._swap_transaction(txn, values)
             self._add_auto_created_accounts(txn)
-        for split, old in action.changed_splits:
-            swapvalues(split, old, SPLIT_SWAP_ATTRS)
-        for schedule, old in action.changed_schedules:
-            swapvalues(schedule, old, SCHEDULE_SWAP_ATTRS)
-            swapvalues(schedule.ref, old.ref, TRANSACTION_SWAP_ATTRS)
-        for budget, old in action.changed_budgets:
-            swapvalues(budget, old, BUDGET_SWAP_ATTRS)
+        for split, values in action.changed_splits.items():
+            swap_backup(split, values)
+        changed_txns = set(action.changed_transactions)
+        changed_txns |= {split.transaction for split in action.changed_splits}
+        self._transactions.clear_cache(changed_txns)
+        for schedule, (values, ref_values) in action.changed_schedules.items():
+            swap_backup(schedule, values)
+            self._swap_transaction(schedule.ref, ref_values)
+            schedule.reset_spawn_cache()
+        for budget, values in action.changed_budgets.items():
+            swap_backup(budget, values)
+            budget.reset_spawn_cache()
 
     def _do_deletes(self, accounts, groups, transactions, schedules, budgets):
         for account in accounts:
@@ -191,6 +341,16 @@ class Undoer:
         for budget in budgets:
             self._budgets.remove(budget)
 
+    def _forget_old_actions(self):
+        total_size = sum(self._sizes)
+        while len(self._actions) > 1:
+            too_many = self.max_actions is not None and len(self._actions) > self.max_actions
+            too_big = self.max_bytes is not None and total_size > self.max_bytes
+            if not (too_many or too_big):
+                break
+            self._base = self._actions.pop(0)
+            total_size -= self._sizes.pop(0)
+
     def _remove_auto_created_account(self, transaction):
         for split in transaction.splits:
             account = split.account
@@ -198,7 +358,25 @@ class Undoer:
             if account in self._accounts.auto_created and len(account.entries) == 1:
                 self._accounts.remove(account)
 
+    def _swap_transaction(self, txn, values):
+        swap_backup(txn, values)
+        if 'splits' in values:
+            for split in txn.splits:
+                split.transaction = txn
+
+    def _notify_listeners(self, action):
+        for listener in self._listeners:
+            listener(action)
+
     # --- Public
+    def add_listener(self, listener):
+        """Adds ``listener`` to the callables to call whenever an action is performed.
+
+        ``listener`` is called with the :class:`Action` as an argument each time an action is
+        recorded, undone or redone.
+        """
+        self._listeners.append(listener)
+
     def can_redo(self):
         """Whether we can redo.
 
@@ -217,6 +395,9 @@ class Undoer:
     def clear(self):
         """Clear our action list."""
         self._actions = []
+        self._sizes = []
+        self._index = -1
+        self._base = None
 
     def undo_description(self):
         """Textual description of the action to be undone next."""
@@ -235,7 +416,7 @@ class Undoer:
 
         Call this method whenever the document is saved.
         """
-        self._save_point = self._actions[-1] if self._actions else None
+        self._save_point = self._actions[self._index] if self.can_undo() else self._base
 
     def record(self, action):
         """Record an action and add it to the list.
@@ -244,13 +425,24 @@ class Undoer:
         recording our new action), discard all actions following the current one before recording
         our new action.
 
+        Our previous action is compacted and if we're over our memory budget, our oldest actions
+        are forgotten.
+
         :param action: Action to be recorded.
         :type action: :class:`Action`
         """
         if self._index < -1:
-            self._actions = self._actions[:self._index + 1]
+            del self._actions[self._index + 1:]
+            del self._sizes[self._index + 1:]
+        if self._actions:
+            # Our previous action's changes are done. Its backups can be reduced to deltas.
+            self._actions[-1].compact(following=action)
+            self._sizes[-1] = self._actions[-1].size_estimate()
         self._actions.append(action)
+        self._sizes.append(action.size_estimate())
         self._index = -1
+        self._forget_old_actions()
+        self._notify_listeners(action)
 
     def undo(self):
         """Undo the next action to be undone.
@@ -273,6 +465,7 @@ class Undoer:
         )
         self._do_changes(action)
         self._index -= 1
+        self._notify_listeners(action)
 
     def redo(self):
         """Redo the next action to be redone.
@@ -294,6 +487,7 @@ class Undoer:
         )
         self._do_changes(action)
         self._index += 1
+        self._notify_listeners(action)
 
     # --- Properties
     @property
@@ -303,5 +497,6 @@ class Undoer:
         A document is modified if the current action pointer doesn't point to the same action as
         when :meth:`set_save_point` was last called.
         """
-        return self._save_point is not self._actions[self._index] if self.can_undo() else self._save_point is not None
+        current = self._actions[self._index] if self.can_undo() else self._base
+        return self._save_point is not current
 
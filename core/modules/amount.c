@@ -463,17 +463,33 @@ Amount_getvalue(Amount *self)
     return self->rval;
 }
 
+static PyObject *
+Amount_getshiftedvalue(Amount *self)
+{
+    return PyLong_FromLongLong(self->ival);
+}
+
+/* Amounts are pickled when import documents are loaded in other processes. */
+
+static PyObject *
+Amount_reduce(Amount *self)
+{
+    return Py_BuildValue("(O(OO))", Py_TYPE(self), self->rval, self->currency);
+}
+
 /* We need both __copy__ and __deepcopy__ methods for amounts to behave correctly in undo_test. */
 
 static PyMethodDef Amount_methods[] = {
     {"__copy__", (PyCFunction)Amount_copy, METH_NOARGS, ""},
     {"__deepcopy__", (PyCFunction)Amount_deepcopy, METH_VARARGS, ""},
+    {"__reduce__", (PyCFunction)Amount_reduce, METH_NOARGS, ""},
     {0, 0, 0, 0},
 };
 
 static PyGetSetDef Amount_getseters[] = {
     {"currency", (getter)Amount_getcurrency, NULL, "currency", NULL},
     {"value", (getter)Amount_getvalue, NULL, "value", NULL},
+    {"shifted_value", (getter)Amount_getshiftedvalue, NULL, "shifted_value", NULL},
     {0, 0, 0, 0, 0},
 };
 
@@ -507,7 +523,202 @@ static PyType_Spec Amount_Type_Spec = {
     Amount_Slots,
 };
 
+/* Bulk functions */
+
+static int
+add_to_total(PyObject *item, int64_t *total, PyObject **currency)
+{
+    /* Adds item to total the way Amount_add would. *currency is the currency of a non-zero total.
+       Returns 1 if total is now item itself, 0 if it's a new value and -1 on error.
+    */
+    int64_t ival;
+    int r;
+    
+    if (!check_amount(item)) {
+        PyErr_SetString(PyExc_TypeError, "Amounts can only be added to other amounts or zero.");
+        return -1;
+    }
+    ival = get_amount_ival(item);
+    if (!*total) {
+        /* A zero total becomes what's added to it */
+        *total = ival;
+        *currency = ival ? ((Amount *)item)->currency : NULL;
+        return 1;
+    }
+    if (ival) {
+        r = PyObject_RichCompareBool(*currency, ((Amount *)item)->currency, Py_EQ);
+        if (r == -1) {
+            return -1;
+        }
+        if (!r) {
+            PyErr_SetString(PyExc_ValueError, "Amounts of different currencies can't be added.");
+            return -1;
+        }
+        *total += ival;
+        return 0;
+    }
+    return 2; /* total unchanged */
+}
+
+static PyObject *
+amount_sum_amounts(PyObject *self, PyObject *args)
+{
+    /* Returns the sum of a sequence of amounts, the same as sum() would, without creating
+       intermediate amounts.
+    */
+    PyObject *amounts, *seq, *item, *result, *currency;
+    int64_t total;
+    Py_ssize_t i, len;
+    int r;
+    
+    if (!PyArg_ParseTuple(args, "O", &amounts)) {
+        return NULL;
+    }
+    seq = PySequence_Fast(amounts, "sum_amounts() needs an iterable");
+    if (seq == NULL) {
+        return NULL;
+    }
+    len = PySequence_Size(seq);
+    /* borrowed, NULL meaning that the result is a new amount of value total. */
+    result = NULL;
+    total = 0;
+    currency = NULL;
+    for (i = 0; i < len; i++) {
+        item = PySequence_GetItem(seq, i);
+        if (item == NULL) {
+            Py_DECREF(seq);
+            return NULL;
+        }
+        /* item is also referenced by seq, which outlives our loop. */
+        Py_DECREF(item);
+        r = add_to_total(item, &total, &currency);
+        if (r == -1) {
+            Py_DECREF(seq);
+            return NULL;
+        }
+        if (r == 1) {
+            result = item;
+        }
+        else if (r == 0) {
+            result = NULL;
+        }
+    }
+    if (result != NULL) {
+        Py_INCREF(result);
+    }
+    else if (len) {
+        result = create_amount(total, currency);
+    }
+    else {
+        result = PyLong_FromLong(0);
+    }
+    Py_DECREF(seq);
+    return result;
+}
+
+static PyObject *
+amount_running_totals(PyObject *self, PyObject *args)
+{
+    /* Returns the list of running totals of a sequence of amounts, starting from start. When
+       include is not None, amounts for which it's false are skipped.
+    */
+    PyObject *amounts, *start, *include, *seq, *incseq, *item, *current, *currency, *result;
+    int64_t total;
+    Py_ssize_t i, len;
+    int r, included;
+    
+    include = Py_None;
+    if (!PyArg_ParseTuple(args, "OO|O", &amounts, &start, &include)) {
+        return NULL;
+    }
+    if (!check_amount(start)) {
+        PyErr_SetString(PyExc_TypeError, "start has to be an amount or zero.");
+        return NULL;
+    }
+    seq = PySequence_Fast(amounts, "running_totals() needs an iterable");
+    if (seq == NULL) {
+        return NULL;
+    }
+    incseq = NULL;
+    if (include != Py_None) {
+        incseq = PySequence_Fast(include, "include has to be an iterable");
+        if (incseq == NULL) {
+            Py_DECREF(seq);
+            return NULL;
+        }
+    }
+    len = PySequence_Size(seq);
+    if (incseq != NULL && PySequence_Size(incseq) < len) {
+        PyErr_SetString(PyExc_ValueError, "include is shorter than amounts.");
+        goto error;
+    }
+    result = PyList_New(len);
+    if (result == NULL) {
+        goto error;
+    }
+    total = get_amount_ival(start);
+    currency = total ? ((Amount *)start)->currency : NULL;
+    current = start;
+    Py_INCREF(current);
+    for (i = 0; i < len; i++) {
+        if (incseq != NULL) {
+            item = PySequence_GetItem(incseq, i);
+            if (item == NULL) {
+                goto error_result;
+            }
+            included = PyObject_IsTrue(item);
+            Py_DECREF(item);
+            if (included == -1) {
+                goto error_result;
+            }
+        }
+        else {
+            included = 1;
+        }
+        if (included) {
+            item = PySequence_GetItem(seq, i);
+            if (item == NULL) {
+                goto error_result;
+            }
+            Py_DECREF(item); /* still referenced by seq */
+            r = add_to_total(item, &total, &currency);
+            if (r == -1) {
+                goto error_result;
+            }
+            if (r == 1) {
+                Py_DECREF(current);
+                current = item;
+                Py_INCREF(current);
+            }
+            else if (r == 0) {
+                Py_DECREF(current);
+                current = create_amount(total, currency);
+                if (current == NULL) {
+                    goto error_result;
+                }
+            }
+        }
+        /* PyList_SetItem steals a reference */
+        Py_INCREF(current);
+        PyList_SetItem(result, i, current);
+    }
+    Py_DECREF(current);
+    Py_DECREF(seq);
+    Py_XDECREF(incseq);
+    return result;
+
+error_result:
+    Py_XDECREF(current);
+    Py_DECREF(result);
+error:
+    Py_DECREF(seq);
+    Py_XDECREF(incseq);
+    return NULL;
+}
+
 static PyMethodDef module_methods[] = {
+    {"sum_amounts", amount_sum_amounts, METH_VARARGS, ""},
+    {"running_totals", amount_running_totals, METH_VARARGS, ""},
     {NULL}  /* Sentinel */
 };
 
@@ -4,6 +4,11 @@
 # which should be included with this package. The terms are also available at
 # http://www.gnu.org/licenses/gpl-3.0.html
 
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import timedelta
+from difflib import SequenceMatcher
+
 from core.plugin import ImportBindPlugin, EntryMatch
 
 class ReferenceBind(ImportBindPlugin):
@@ -39,3 +44,78 @@ class ReferenceBind(ImportBindPlugin):
 
         return matches
 
+
+
+class FuzzyBind(ImportBindPlugin):
+    """Matches imported entries with existing entries of the same amount and a close date.
+
+    Existing entries are indexed by amount and then by date so that each imported entry is only
+    compared with the few existing entries that could possibly match it. Among those, the closest
+    date and the most similar payee (or description) wins. Entries without a payee or description,
+    or with dissimilar ones, are never matched. Weights stay below those of :class:`ReferenceBind`
+    because references, when present, are a much better clue.
+    """
+    NAME = "Fuzzy Import Bind"
+    AUTHOR = "Virgil Dupras"
+
+    # Number of days an imported entry's date can be off from the existing entry's date.
+    DATE_WINDOW = 3
+    # Minimal similarity ratio (see difflib.SequenceMatcher) between payees or descriptions.
+    MIN_SIMILARITY = 0.6
+    MIN_WEIGHT = 0.5
+    MAX_WEIGHT = 0.9
+
+    @staticmethod
+    def _label(entry):
+        return (entry.payee or entry.description).lower()
+
+    def _weight(self, existing_entry, import_entry):
+        # Returns None if the entries are too dissimilar to be matched.
+        existing_label = self._label(existing_entry)
+        import_label = self._label(import_entry)
+        if not (existing_label and import_label):
+            return None
+        similarity = SequenceMatcher(None, existing_label, import_label).ratio()
+        if similarity < self.MIN_SIMILARITY:
+            return None
+        days = abs((existing_entry.date - import_entry.date).days)
+        date_score = 1 - days / (self.DATE_WINDOW + 1)
+        spread = self.MAX_WEIGHT - self.MIN_WEIGHT
+        return self.MIN_WEIGHT + spread * (date_score + similarity) / 2
+
+    def match_entries(self,
+                      target_account,
+                      document,
+                      import_document,
+                      existing_entries,
+                      imported_entries):
+        # {amount: ([date], [entry])}, sorted by date
+        amount2entries = defaultdict(lambda: ([], []))
+        for existing_entry in sorted(existing_entries, key=lambda e: e.date):
+            dates, entries = amount2entries[existing_entry.amount]
+            dates.append(existing_entry.date)
+            entries.append(existing_entry)
+        window = timedelta(days=self.DATE_WINDOW)
+        candidates = []
+        for import_entry in imported_entries:
+            if not import_entry.amount or import_entry.amount not in amount2entries:
+                continue
+            dates, entries = amount2entries[import_entry.amount]
+            low = bisect_left(dates, import_entry.date - window)
+            high = bisect_right(dates, import_entry.date + window)
+            for existing_entry in entries[low:high]:
+                weight = self._weight(existing_entry, import_entry)
+                if weight is not None:
+                    candidates.append((weight, existing_entry, import_entry))
+        # Each entry can only be matched once, so the best candidates go first.
+        candidates.sort(key=lambda c: c[0], reverse=True)
+        matched = set()
+        matches = []
+        for weight, existing_entry, import_entry in candidates:
+            if existing_entry in matched or import_entry in matched:
+                continue
+            matched.add(existing_entry)
+            matched.add(import_entry)
+            will_import = not existing_entry.reconciled
+            matches.append(EntryMatch(existing_entry, import_entry, will_import, weight))
+        return matches
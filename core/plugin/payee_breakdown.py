@@ -10,8 +10,8 @@ from itertools import groupby
 from operator import attrgetter
 
 from core.plugin import ReadOnlyTablePlugin, Column
-# Import convert_amount(), a utility function to convert amount from one currency to another.
-from core.model.amount import convert_amount
+# Import AmountArray, a utility class to convert and sum a lot of amounts efficiently.
+from core.model.amount import AmountArray
 
 class PayeeBreakdownPlugin(ReadOnlyTablePlugin):
     NAME = 'Payee Breakdown'
@@ -29,11 +29,10 @@ class PayeeBreakdownPlugin(ReadOnlyTablePlugin):
         # We fetch transactions from our document's "oven". We could fetch them directly from
         # document.transactions, but then we wouldn't have schedule spawns. The oven takes "raw"
         # transactions and schedules and "cooks" them into ready-to-display transactions and
-        # schedule spawns. It's better to fetch transactions there.
-        transactions = self.document.oven.transactions
-        # We don't want all transactions, only those in the current date range, so we filter
-        # them to only keep transactions with a date that fits in the range.
-        transactions = [t for t in transactions if t.date in date_range]
+        # schedule spawns. It's better to fetch transactions there. We don't want all
+        # transactions, only those in the current date range, so we ask the oven for them. Its
+        # transactions are sorted by date, so it can find them quickly.
+        transactions = self.document.oven.transactions_in_range(date_range)
         # Sort the transactions by payee so that we can group them.
         transactions.sort(key=attrgetter('payee'))
         # It's impossible to mix amount of different currencies together. However, it's possible
@@ -50,13 +49,15 @@ class PayeeBreakdownPlugin(ReadOnlyTablePlugin):
             # groupby() returns an iterator, but because we want to count the number of
             # transactions we have, we need to convert it to a list.
             subtransactions = list(subtransactions)
-            total_amount = 0
             count = len(subtransactions)
-            for txn in subtransactions:
-                # Convert the transactions's amount to the native currency.
-                native_amount = convert_amount(txn.amount, currency, txn.date)
-                # Add that amount to the running total
-                total_amount += native_amount
+            # Put all amounts in an AmountArray, which lets us work on a whole column of amounts at
+            # once instead of creating a new Amount instance at each addition.
+            amounts = AmountArray(txn.amount for txn in subtransactions)
+            # Convert the transactions's amounts to the native currency. Each amount is converted
+            # with the exchange rate at its transaction's date.
+            amounts = amounts.convert(currency, [txn.date for txn in subtransactions])
+            # Sum all these amounts together.
+            total_amount = amounts.sum()
             row = self.add_row()
             row.set_field('payee', payee)
             # When we set field values, we set strings. However, our table can be sorted by any
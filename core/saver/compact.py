@@ -0,0 +1,145 @@
+# Copyright 2016 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+"""Saves documents in moneyGuru's compact format.
+
+The compact format is a SQLite database with one table per kind of object. Dates are stored as
+ordinals and amounts as integers (shifted by their currency's exponent, see
+:attr:`.Amount.shifted_value`) with their currency code in another column. Loading and saving such
+a file involves none of the XML, date and amount parsing/formatting of the XML format.
+
+:mod:`core.loader.compact` loads these files back.
+"""
+
+import os
+import os.path as op
+import sqlite3 as sqlite
+
+from hscommon.util import ensure_folder
+
+FORMAT_VERSION = 1
+
+SCHEMA = """
+create table meta(name TEXT, value TEXT);
+create table properties(name TEXT, value TEXT);
+create table groups(name TEXT, type TEXT);
+create table accounts(
+    name TEXT, currency TEXT, type TEXT, group_name TEXT, reference TEXT, account_number TEXT,
+    inactive INTEGER, notes TEXT
+);
+create table transactions(
+    id INTEGER PRIMARY KEY, kind INTEGER, schedule_id INTEGER, recurrence_date INTEGER,
+    date INTEGER, position INTEGER, description TEXT, payee TEXT, checkno TEXT, notes TEXT,
+    mtime INTEGER
+);
+create table splits(
+    transaction_id INTEGER, account TEXT, amount INTEGER, currency TEXT, memo TEXT,
+    reference TEXT, reconciliation_date INTEGER
+);
+create table schedules(id INTEGER PRIMARY KEY, repeat_type TEXT, repeat_every INTEGER, stop_date INTEGER);
+create table budgets(
+    account TEXT, target TEXT, amount INTEGER, currency TEXT, repeat_type TEXT,
+    repeat_every INTEGER, start_date INTEGER, stop_date INTEGER, notes TEXT
+);
+"""
+
+class TransactionKind:
+    """Role of a row in the ``transactions`` table."""
+    Normal = 0
+    ScheduleRef = 1
+    ScheduleException = 2
+    ScheduleGlobalChange = 3
+    # An exception for which there's no transaction (a deleted spawn). Only the schedule and the
+    # recurrence date are set for this kind.
+    ScheduleDeletion = 4
+
+def date2int(date):
+    return date.toordinal() if date is not None else None
+
+def amount2columns(amount):
+    # Returns a (shifted_value, currency_code) tuple for ``amount``.
+    if isinstance(amount, int):
+        return (0, None)
+    return (amount.shifted_value, amount.currency.code)
+
+def save(filename, document_id, properties, accounts, groups, transactions, schedules, budgets):
+    """Saves a complete document in ``filename`` in the compact format.
+
+    Arguments are the same as for :func:`core.saver.native.save`.
+    """
+    txn_rows = []
+    split_rows = []
+
+    def add_transaction(txn, kind, schedule_id=None, recurrence_date=None):
+        txn_id = len(txn_rows) + 1
+        txn_rows.append((
+            txn_id, kind, schedule_id, date2int(recurrence_date), date2int(txn.date), txn.position,
+            txn.description, txn.payee, txn.checkno, txn.notes, int(txn.mtime),
+        ))
+        for split in txn.splits:
+            amount, currency = amount2columns(split.amount)
+            split_rows.append((
+                txn_id, split.account_name or None, amount, currency, split.memo, split.reference,
+                date2int(split.reconciliation_date),
+            ))
+
+    for txn in transactions:
+        add_transaction(txn, TransactionKind.Normal)
+    schedule_rows = []
+    for schedule_id, recurrence in enumerate((s for s in schedules if s.is_alive), start=1):
+        schedule_rows.append((
+            schedule_id, recurrence.repeat_type, recurrence.repeat_every, date2int(recurrence.stop_date)
+        ))
+        add_transaction(recurrence.ref, TransactionKind.ScheduleRef, schedule_id)
+        for date, exception in recurrence.date2exception.items():
+            if exception is None:
+                deletion_row = (len(txn_rows) + 1, TransactionKind.ScheduleDeletion, schedule_id, date2int(date))
+                txn_rows.append(deletion_row + (None, ) * 7)
+            else:
+                add_transaction(exception, TransactionKind.ScheduleException, schedule_id, date)
+        for date, change in recurrence.date2globalchange.items():
+            if change is not None:
+                add_transaction(change, TransactionKind.ScheduleGlobalChange, schedule_id, date)
+    budget_rows = []
+    for budget in budgets:
+        target_name = budget.target.name if budget.target is not None else None
+        amount, currency = amount2columns(budget.amount)
+        budget_rows.append((
+            budget.account.name, target_name, amount, currency, budget.repeat_type,
+            budget.repeat_every, date2int(budget.start_date), date2int(budget.stop_date), budget.notes,
+        ))
+    property_rows = [
+        (name, value.code if name == 'default_currency' else str(value))
+        for name, value in properties.items()
+    ]
+    account_rows = [
+        (a.name, a.currency.code, a.type, a.group.name if a.group else None, a.reference,
+         a.account_number, int(a.inactive), a.notes)
+        for a in accounts
+    ]
+    ensure_folder(op.dirname(filename))
+    # We write to a temporary file first so that a crash during the save doesn't leave us with a
+    # half-written document.
+    tmpfilename = filename + '.tmp'
+    if op.exists(tmpfilename):
+        os.remove(tmpfilename)
+    con = sqlite.connect(tmpfilename)
+    try:
+        con.executescript(SCHEMA)
+        con.executemany("insert into meta values(?, ?)", [
+            ('format_version', str(FORMAT_VERSION)), ('document_id', document_id)
+        ])
+        con.executemany("insert into properties values(?, ?)", property_rows)
+        con.executemany("insert into groups values(?, ?)", [(g.name, g.type) for g in groups])
+        con.executemany("insert into accounts values(?, ?, ?, ?, ?, ?, ?, ?)", account_rows)
+        con.executemany("insert into transactions values(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", txn_rows)
+        con.executemany("insert into splits values(?, ?, ?, ?, ?, ?, ?)", split_rows)
+        con.executemany("insert into schedules values(?, ?, ?, ?)", schedule_rows)
+        con.executemany("insert into budgets values(?, ?, ?, ?, ?, ?, ?, ?, ?)", budget_rows)
+        con.commit()
+    finally:
+        con.close()
+    os.replace(tmpfilename, filename)
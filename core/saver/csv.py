@@ -19,7 +19,7 @@ def save(filename, accounts, daterange=None):
     for account in accounts:
         entries = account.entries
         if daterange is not None:
-            entries = [e for e in entries if e.date in daterange]
+            entries = entries.entries_in_range(daterange)
         for entry in entries:
             date_str = format_date(entry.date, 'dd/MM/yyyy')
             transfer = ', '.join(a.name for a in entry.transfer)
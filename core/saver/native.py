@@ -4,49 +4,72 @@
 # which should be included with this package. The terms are also available at
 # http://www.gnu.org/licenses/gpl-3.0.html
 
-import sys
+import os
 import os.path as op
+import threading
 import xml.etree.cElementTree as ET
 
 from ..model.amount import format_amount
+from ..model.recurrence import Spawn
 from hscommon.util import remove_invalid_xml, ensure_folder
 
-def save(filename, document_id, properties, accounts, groups, transactions, schedules, budgets):
-    def date2str(date):
-        return date.strftime('%Y-%m-%d')
-
-    def handle_newlines(s):
-        # etree doesn't correctly save newlines. In fields that allow it, we have to escape them so
-        # that we can restore them during load.
-        # XXX It seems like newer version of etree do escape newlines. When we use Python 3.2, we
-        # can probably remove this.
-        if not s:
-            return s
-        return s.replace('\n', '\\n')
-
-    def setattrib(attribs, attribname, value):
-        if value:
-            attribs[attribname] = value
-
-    def write_transaction_element(parent_element, transaction):
-        transaction_element = ET.SubElement(parent_element, 'transaction')
-        attrib = transaction_element.attrib
-        attrib['date'] = date2str(transaction.date)
-        setattrib(attrib, 'description', transaction.description)
-        setattrib(attrib, 'payee', transaction.payee)
-        setattrib(attrib, 'checkno', transaction.checkno)
-        setattrib(attrib, 'notes', handle_newlines(transaction.notes))
-        attrib['mtime'] = str(int(transaction.mtime))
-        for split in transaction.splits:
-            split_element = ET.SubElement(transaction_element, 'split')
-            attrib = split_element.attrib
-            attrib['account'] = split.account_name
-            attrib['amount'] = format_amount(split.amount)
-            setattrib(attrib, 'memo', split.memo)
-            setattrib(attrib, 'reference', split.reference)
-            if split.reconciliation_date is not None:
-                attrib['reconciliation_date'] = date2str(split.reconciliation_date)
+FILE_TRAILER = '</moneyguru-file>'
+# A journal is compacted when it contains more records than this or than the number of
+# transactions in its base snapshot, whichever is the highest.
+JOURNAL_MIN_COMPACTION_COUNT = 1000
 
+def date2str(date):
+    return date.strftime('%Y-%m-%d')
+
+def handle_newlines(s):
+    # etree doesn't correctly save newlines. In fields that allow it, we have to escape them so
+    # that we can restore them during load.
+    # XXX It seems like newer version of etree do escape newlines. When we use Python 3.2, we
+    # can probably remove this.
+    if not s:
+        return s
+    return s.replace('\n', '\\n')
+
+def setattrib(attribs, attribname, value):
+    if value:
+        attribs[attribname] = value
+
+def write_transaction_element(parent_element, transaction, with_position=False):
+    transaction_element = ET.SubElement(parent_element, 'transaction')
+    attrib = transaction_element.attrib
+    attrib['date'] = date2str(transaction.date)
+    setattrib(attrib, 'description', transaction.description)
+    setattrib(attrib, 'payee', transaction.payee)
+    setattrib(attrib, 'checkno', transaction.checkno)
+    setattrib(attrib, 'notes', handle_newlines(transaction.notes))
+    attrib['mtime'] = str(int(transaction.mtime))
+    if with_position:
+        attrib['position'] = str(transaction.position)
+    for split in transaction.splits:
+        split_element = ET.SubElement(transaction_element, 'split')
+        attrib = split_element.attrib
+        attrib['account'] = split.account_name
+        attrib['amount'] = format_amount(split.amount)
+        setattrib(attrib, 'memo', split.memo)
+        setattrib(attrib, 'reference', split.reference)
+        if split.reconciliation_date is not None:
+            attrib['reconciliation_date'] = date2str(split.reconciliation_date)
+
+def remove_invalid_xml_attribs(element):
+    for elem in element.iter():
+        attrib = elem.attrib
+        for key, value in attrib.items():
+            attrib[key] = remove_invalid_xml(value)
+
+def save(
+        filename, document_id, properties, accounts, groups, transactions, schedules, budgets,
+        with_positions=False):
+    """Saves a complete document in ``filename``.
+
+    When ``with_positions`` is true, the position of each transaction is saved explicitly rather
+    than being implied by the order of transactions. This is needed for documents that will
+    receive :class:`Journal` records.
+    """
     root = ET.Element('moneyguru-file')
     root.attrib['document_id'] = document_id
     props_element = ET.SubElement(root, 'properties')
@@ -78,7 +101,7 @@ def save(filename, document_id, properties, accounts, groups, transactions, sche
         if account.notes:
             attrib['notes'] = handle_newlines(account.notes)
     for transaction in transactions:
-        write_transaction_element(root, transaction)
+        write_transaction_element(root, transaction, with_position=with_positions)
     # the functionality of the line below is untested because it's an optimisation
     scheduled = [s for s in schedules if s.is_alive]
     for recurrence in scheduled:
@@ -112,16 +135,142 @@ def save(filename, document_id, properties, accounts, groups, transactions, sche
         attrib['start_date'] = date2str(budget.start_date)
         if budget.stop_date is not None:
             attrib['stop_date'] = date2str(budget.stop_date)
-    for elem in root.getiterator():
-        attrib = elem.attrib
-        for key, value in attrib.items():
-            attrib[key] = remove_invalid_xml(value)
+    remove_invalid_xml_attribs(root)
     tree = ET.ElementTree(root)
     ensure_folder(op.dirname(filename))
-    fp = open(filename, 'wt', encoding='utf-8')
-    fp.write('<?xml version="1.0" encoding="utf-8"?>\n')
-    # This 'unicode' encoding thing is only available (and necessary) from Python 3.2
-    if sys.version_info[1] >= 2:
+    with open(filename, 'wt', encoding='utf-8') as fp:
+        fp.write('<?xml version="1.0" encoding="utf-8"?>\n')
         tree.write(fp, encoding='unicode')
-    else:
-        tree.write(fp)
+
+class Journal:
+    """Saves a document as a base snapshot followed by an append-only log of transaction changes.
+
+    The first save writes a complete document (with explicit transaction positions). After that,
+    as long as only transactions are added, changed or deleted, a save only appends records for
+    transactions that were touched since the last save, right before the closing tag of the
+    document (which stays valid XML). A changed transaction is recorded as the deletion of its old
+    record followed by a new record. Deletions reference transactions by their index among all
+    ``transaction`` elements at the root of the file.
+
+    Touched transactions are determined from undo :class:`.Action` instances passed to
+    :meth:`record`. Whenever something else than transactions is changed, or when the journal
+    grows too big, the next save compacts the journal by writing a new base snapshot.
+
+    :param filename: ``str``. Path of the document this journal saves to.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self._txn2index = {}
+        self._next_index = 0
+        self._touched = set()
+        # Guards _touched and _must_compact, which record() updates while save() reads them.
+        self._lock = threading.Lock()
+        self._accounts = None
+        self._record_count = 0
+        self._base_count = 0
+        self._file_size = None
+        self._must_compact = True
+
+    # --- Private
+    def _append(self, transactions, touched):
+        records = []
+        deleted = []
+        for txn in touched:
+            index = self._txn2index.pop(txn, None)
+            if index is not None:
+                deleted.append(index)
+        for index in sorted(deleted):
+            records.append(ET.Element('delete-transaction', index=str(index)))
+        present = set(transactions)
+        appended = sorted((t for t in touched if t in present), key=lambda t: (t.date, t.position))
+        parent = ET.Element('journal')
+        for txn in appended:
+            write_transaction_element(parent, txn, with_position=True)
+            self._txn2index[txn] = self._next_index
+            self._next_index += 1
+        records += list(parent)
+        if not records:
+            return
+        chunks = []
+        for element in records:
+            remove_invalid_xml_attribs(element)
+            chunks.append(ET.tostring(element, encoding='unicode'))
+        chunks.append(FILE_TRAILER)
+        data = '\n'.join(chunks).encode('utf-8')
+        trailer = FILE_TRAILER.encode('utf-8')
+        with open(self.filename, 'r+b') as fp:
+            fp.seek(self._file_size - len(trailer))
+            fp.write(data)
+            fp.truncate()
+        self._file_size = os.stat(self.filename).st_size
+        self._record_count += len(records)
+
+    # --- Public
+    def can_append(self, accounts):
+        """Returns whether the next :meth:`save` can append to the file rather than rewrite it."""
+        if self._must_compact or set(accounts) != self._accounts:
+            return False
+        if self._record_count > max(JOURNAL_MIN_COMPACTION_COUNT, self._base_count):
+            return False
+        # If the file was modified by someone else, we can't append to it.
+        try:
+            if os.stat(self.filename).st_size != self._file_size:
+                return False
+            with open(self.filename, 'rb') as fp:
+                trailer = FILE_TRAILER.encode('utf-8')
+                fp.seek(self._file_size - len(trailer))
+                return fp.read() == trailer
+        except OSError:
+            return False
+
+    def invalidate(self):
+        """Makes the next save write a complete snapshot.
+
+        Call this when something that isn't recorded through undo actions changes.
+        """
+        with self._lock:
+            self._must_compact = True
+            self._touched = set()
+
+    def record(self, action):
+        """Takes note of the objects touched by ``action`` (which has been recorded, undone or redone).
+        """
+        if action.added_accounts or action.changed_accounts or action.deleted_accounts \
+                or action.added_groups or action.changed_groups or action.deleted_groups \
+                or action.added_schedules or action.changed_schedules or action.deleted_schedules \
+                or action.added_budgets or action.changed_budgets or action.deleted_budgets \
+                or action.changed_splits:
+            self.invalidate()
+            return
+        touched = action.added_transactions | action.deleted_transactions | set(action.changed_transactions)
+        must_compact = any(isinstance(txn, Spawn) for txn in touched)
+        with self._lock:
+            if must_compact:
+                self._must_compact = True
+            if not self._must_compact:
+                self._touched |= touched
+
+    def save(self, document_id, properties, accounts, groups, transactions, schedules, budgets):
+        """Saves the document to :attr:`filename`, appending to it if possible.
+
+        Arguments are the same as for :func:`save`.
+        """
+        # What is recorded while we write goes in a new set and will be written by the next save.
+        with self._lock:
+            touched = self._touched
+            self._touched = set()
+            must_compact = self._must_compact
+            self._must_compact = False
+        if not must_compact and self.can_append(accounts):
+            self._append(transactions, touched)
+        else:
+            save(
+                self.filename, document_id, properties, accounts, groups, transactions, schedules,
+                budgets, with_positions=True
+            )
+            self._txn2index = {txn: index for index, txn in enumerate(transactions)}
+            self._next_index = len(self._txn2index)
+            self._accounts = set(accounts)
+            self._record_count = 0
+            self._base_count = len(self._txn2index)
+            self._file_size = os.stat(self.filename).st_size
@@ -25,7 +25,7 @@ def save(filename, accounts, daterange=None):
         lines.append('!Type:%s' % qif_account_type)
         entries = account.entries
         if daterange is not None:
-            entries = [e for e in entries if e.date in daterange]
+            entries = entries.entries_in_range(daterange)
         for entry in entries:
             lines.append('D%s' % format_date(entry.date, 'MM/dd/yyyy'))
             lines.append('T%s' % format_amount_for_qif(entry.amount))
@@ -15,6 +15,7 @@ from hscommon.testutil import eq_, log_calls
 from ..app import Application
 from ..model import currency
 from ..model.account import AccountType
+from ..model.amount import convert_amount
 from ..model.currency import Currency, USD, EUR, CAD
 from ..model.date import MonthRange
 from .base import ApplicationGUI, TestApp, with_app, compare_apps
@@ -223,6 +224,21 @@ def test_opposite_entry_balance():
     app.show_account()
     eq_(app.etable[0].balance, 'PLN %2.2f' % ((42 * 1.42) / 0.42))
 
+def test_entry_balances_are_sums_of_converted_amounts():
+    # Balances are exactly what we get by converting each amount and adding them together, down
+    # to their float value, which is what our graphs use.
+    app = app_entry_with_foreign_currency()
+    # The balance goes back to zero, then gets a converted amount which isn't rounded.
+    app.add_entry(date='2/10/2007', transfer='second', decrease='42 eur')
+    app.add_entry(date='3/10/2007', transfer='second', increase='12.34 eur')
+    app.add_entry(date='4/10/2007', transfer='second', increase='1.11')
+    for account in app.doc.accounts:
+        expected = 0
+        for entry in account.entries:
+            expected += convert_amount(entry.amount, account.currency, entry.date)
+            eq_(entry.balance, expected)
+            eq_(float(entry.balance), float(expected))
+
 class TestCaseCADAssetAndUSDIncome:
     def setup_method(self, method):
         app = TestApp()
@@ -6,6 +6,7 @@
 # which should be included with this package. The terms are also available at
 # http://www.gnu.org/licenses/gpl-3.0.html
 
+import threading
 from datetime import date
 
 from hscommon.testutil import eq_
@@ -437,3 +438,92 @@ def test_save_and_load_restores_all_txns_range(app):
 def test_transactions_are_shown(app):
     # When under All Transactions range, the range is big enough to contain all txns.
     eq_(app.ttable.row_count, 2)
+
+# --- Background cooking
+class FakeProgressWindowView:
+    def __init__(self):
+        self.shown = False
+
+    def show(self):
+        self.shown = True
+
+    def close(self):
+        self.shown = False
+
+    def set_progress(self, progress):
+        pass
+
+    def refresh(self):
+        pass
+
+def app_with_daily_schedule_and_progress_view():
+    app = TestApp()
+    app.add_account('checking')
+    app.add_schedule(account='checking', amount='1', repeat_type_index=0) # daily
+    view = FakeProgressWindowView()
+    progress = app.doc.cook_progress
+    progress.view = progress.jobdesc_textfield.view = progress.progressdesc_textfield.view = view
+    return app
+
+def wait_for_cooking(app):
+    app.doc.cook_progress.wait()
+    app.doc.cook_progress.pulse()
+
+@with_app(app_with_daily_schedule_and_progress_view)
+def test_far_date_range_is_cooked_in_background(app):
+    # When selecting a date range far ahead, we cook in the background. The date range is only
+    # changed, and notifications sent, once we're done.
+    far_range = YearRange(date(date.today().year + 5, 1, 1))
+    app.clear_gui_calls()
+    app.doc.date_range = far_range
+    assert app.doc.cook_progress.view.shown
+    eq_(app.doc.date_range, YearRange(date.today()))
+    app.drsel.view.check_gui_calls([])
+    wait_for_cooking(app)
+    assert not app.doc.cook_progress.view.shown
+    eq_(app.doc.date_range, far_range)
+    app.drsel.view.check_gui_calls(['refresh'])
+    eq_(len(app.doc.oven.transactions_in_range(far_range)), far_range.days)
+    app.show_tview()
+    eq_(app.ttable.row_count, far_range.days)
+
+@with_app(app_with_daily_schedule_and_progress_view)
+def test_near_date_range_is_cooked_synchronously(app):
+    # Navigating to a date range that is close to what we've already cooked doesn't involve any
+    # background cooking.
+    app.drsel.select_next_date_range()
+    assert not app.doc.cook_progress.view.shown
+    eq_(app.doc.date_range, YearRange(date.today()).next())
+
+@with_app(app_with_daily_schedule_and_progress_view)
+def test_background_cooking_cancelled_by_edit(app):
+    # When something is changed while we cook in the background, the background cooking is dropped
+    # and the date range stays the same.
+    app.doc.date_range = YearRange(date(date.today().year + 5, 1, 1))
+    app.add_txn(app.app.format_date(date.today()), description='foo', from_='checking', amount='2')
+    wait_for_cooking(app)
+    eq_(app.doc.date_range, YearRange(date.today()))
+    app.show_tview()
+    eq_(len([row for row in app.ttable.rows if row.description == 'foo']), 1)
+
+@with_app(app_with_daily_schedule_and_progress_view)
+def test_background_cooking_failure(app, monkeypatch):
+    # When cooking fails in the background, we cook again in the main thread and the date range
+    # change still happens.
+    compute_cook = app.doc.oven.compute_cook
+
+    def failing_compute_cook(cook, *args):
+        if threading.current_thread() is not threading.main_thread():
+            raise ValueError()
+        compute_cook(cook, *args)
+
+    monkeypatch.setattr(app.doc.oven, 'compute_cook', failing_compute_cook)
+    far_range = YearRange(date(date.today().year + 5, 1, 1))
+    app.doc.date_range = far_range
+    wait_for_cooking(app)
+    assert not app.doc.cook_progress.view.shown
+    eq_(app.doc.date_range, far_range)
+    eq_(len(app.doc.oven.transactions_in_range(far_range)), far_range.days)
+    app.drsel.select_prev_date_range()
+    eq_(app.doc.date_range, far_range.prev())
+
@@ -19,6 +19,7 @@ from core.model.transaction import Split
 from core.model.account import AccountType
 from core.model.amount import Amount
 from core.plugin import ImportActionPlugin, ImportBindPlugin, EntryMatch
+from core.plugin.base_import_bind import FuzzyBind
 
 # Legacy structure
 # This used to list the possible swap operations. Since the introduction of import plugins, this
@@ -128,8 +129,7 @@ def test_MMM_date_formats_are_supported(app):
 
 @with_app(TestApp)
 def test_fuzzy_matching_plugin(app):
-    # Verify that fuzzily matching entries on import can actually ever work (core plugins don't do
-    # that (yet) so that's why we can only verify this with a dummy plugin).
+    # Verify that fuzzily matching entries on import can actually ever work with a dummy plugin.
     # Here, our higest score (date+desc+payee are matched, the last entry) is bound to our existing
     # entry. The rest is unbound.
     app.set_plugins([ValueImportBind])
@@ -155,6 +155,57 @@ def test_fuzzy_matching_plugin(app):
         eq_(row.amount, amount)
         eq_(row.amount_import, amount_import)
 
+@with_app(TestApp)
+def test_core_fuzzy_bind_plugin(app):
+    # FuzzyBind matches entries with the same amount, a close date and a similar payee/description.
+    app.set_plugins([FuzzyBind])
+    TXNS = [
+        {'date': '20/06/2015', 'description': 'Grocery Store', 'amount': '42'},
+        {'date': '22/06/2015', 'description': 'Gas station', 'amount': '30'},
+    ]
+    app.fake_import('foo', TXNS, account_reference='foo')
+    app.iwin.import_selected_pane()
+    TXNS = [
+        {'date': '22/06/2015', 'description': 'GROCERY STORE #12', 'amount': '42'}, # close enough
+        {'date': '22/06/2015', 'description': 'Gas station', 'amount': '31'}, # different amount
+        {'date': '30/06/2015', 'description': 'Grocery Store', 'amount': '42'}, # too far
+    ]
+    app.fake_import('foo', TXNS, account_reference='foo')
+    EXPECTED = [
+        ('42.00', '42.00'),
+        ('30.00', ''),
+        ('', '31.00'),
+        ('', '42.00'),
+    ]
+    eq_([(row.amount, row.amount_import) for row in app.itable], EXPECTED)
+
+@with_app(TestApp)
+def test_bind_and_unbind_keep_other_matches(app):
+    # Binding and unbinding only touch the affected rows. The import status of other rows is kept.
+    TXNS = [
+        {'date': '20/06/2015', 'description': 'foo', 'amount': '1'},
+        {'date': '22/06/2015', 'description': 'bar', 'amount': '2'},
+    ]
+    app.fake_import('foo', TXNS, account_reference='foo')
+    app.iwin.import_selected_pane()
+    TXNS = [
+        {'date': '21/06/2015', 'description': 'baz', 'amount': '3'},
+        {'date': '23/06/2015', 'description': 'qux', 'amount': '4'},
+    ]
+    app.fake_import('foo', TXNS, account_reference='foo')
+    app.itable[3].will_import = False
+    eq_(len(app.itable), 4)
+    app.itable.bind(0, 1)
+    eq_([(row.amount, row.amount_import) for row in app.itable], [
+        ('1.00', '3.00'), ('2.00', ''), ('', '4.00'),
+    ])
+    assert not app.itable[2].will_import
+    app.itable.unbind(0)
+    eq_([(row.amount, row.amount_import) for row in app.itable], [
+        ('1.00', ''), ('', '3.00'), ('2.00', ''), ('', '4.00'),
+    ])
+    assert not app.itable[3].will_import
+
 
 # ---
 def app_import_checkbook_qif():
@@ -108,6 +108,51 @@ class TestAssetsAndLiabilitiesInDifferentAccounts:
         eq_(app.nw_graph_data(), expected)
         app.check_gui_calls(app.nwgraph_gui, ['refresh'])
 
+    @with_app(do_setup)
+    def test_balance_changes_same_as_daily_balances(self, app, monkeypatch):
+        # Once the CAD account is excluded, the graph is computed from entry dates only. The result
+        # is the same as when we compute the balance of every single day.
+        app.bsheet.selected = app.bsheet.liabilities[0]
+        app.bsheet.toggle_excluded()
+        expected = app.nw_graph_data()
+        monkeypatch.setattr(app.nwgraph, '_balance_changes', lambda date_range: None)
+        app.nwgraph._balance_changes_cache = {}
+        app.nwgraph.compute()
+        eq_(app.nw_graph_data(), expected)
+
+    @with_app(do_setup)
+    def test_balance_changes_with_foreign_account_same_as_daily_balances(self, app, monkeypatch):
+        # The balance of the CAD account changes with exchange rates. The graph is computed from its
+        # entry dates and the dates at which rates change, with the same result as when we compute
+        # the balance of every single day.
+        expected = app.nw_graph_data()
+        eq_(expected[-3:-1], [('15/07/2008', '86.96'), ('16/07/2008', '87.51')])
+        monkeypatch.setattr(app.nwgraph, '_balance_changes', lambda date_range: None)
+        app.nwgraph._balance_changes_cache = {}
+        app.nwgraph.compute()
+        eq_(app.nw_graph_data(), expected)
+
+    @with_app(do_setup)
+    def test_balance_changes_cache_invalidated_on_rate_change(self, app):
+        # Cached balance changes are recomputed when a rate changes, even without cooking.
+        USD.set_CAD_value(1.25, date(2008, 7, 20))
+        app.nwgraph.compute()
+        eq_(app.nw_graph_data()[-4:-1], [
+            ('20/07/2008', '87.51'),
+            ('21/07/2008', '86.00'), # 94 - 10 / 1.25 (the balance of the 20th)
+            ('22/07/2008', '87.51'),
+        ])
+
+    @with_app(do_setup)
+    def test_balance_changes_cache_invalidated_on_cook(self, app):
+        # Cached balance changes are recomputed when the document is cooked again.
+        app.bsheet.selected = app.bsheet.liabilities[0]
+        app.bsheet.toggle_excluded()
+        app.show_account('asset2')
+        app.add_entry('20/7/2008', increase='6')
+        app.show_nwview()
+        eq_(app.nw_graph_data()[-2:], [('21/07/2008', '100.00'), ('01/08/2008', '100.00')])
+
     @with_app(do_setup)
     def test_net_worth_graph(self, app):
         # One interesting thing about this graph is that on the 14th of july, the CAD value changes,
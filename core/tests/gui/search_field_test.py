@@ -239,3 +239,55 @@ def test_query_group(app):
     app.sfield.text = 'group:foo,mygRoup'
     eq_(app.ttable.row_count, 1)
     eq_(app.ttable[0].description, 'first')
+
+@with_app(app_grouped_and_ungrouped_txns)
+def test_query_group_after_rename(app):
+    # Renaming a group is reflected in the search results, even though renaming doesn't re-cook.
+    group = app.doc.groups[0]
+    app.doc.change_group(group, name='Renamed')
+    app.sfield.text = 'group:renamed'
+    eq_(app.ttable.row_count, 1)
+    app.sfield.text = 'group:mygroup'
+    eq_(app.ttable.row_count, 0)
+
+@with_app(app_grouped_and_ungrouped_txns)
+def test_query_account_after_rename(app):
+    account = app.doc.accounts.find('Ungrouped')
+    app.doc.change_accounts([account], name='Renamed')
+    app.sfield.text = 'account:renamed'
+    eq_(app.ttable.row_count, 1)
+    eq_(app.ttable[0].description, 'second')
+
+@with_app(app_grouped_and_ungrouped_txns)
+def test_query_after_undo(app):
+    # The search index follows the transactions when they're changed through undo.
+    app.ttable.select([0])
+    app.ttable.selected_row.description = 'changed'
+    app.ttable.save_edits()
+    app.sfield.text = 'changed'
+    eq_(app.ttable.row_count, 1)
+    app.doc.undo()
+    eq_(app.ttable.row_count, 0)
+    app.sfield.text = 'first'
+    eq_(app.ttable.row_count, 1)
+
+# --- Schedule
+def app_schedule():
+    app = TestApp()
+    app.drsel.select_month_range()
+    app.add_schedule(start_date='13/09/2008', description='scheduled', account='checking', amount='42',
+        repeat_type_index=1) # weekly
+    app.show_tview()
+    return app
+
+@with_app(app_schedule)
+def test_query_schedule_spawns(app):
+    # Spawns are found by the search, including the ones that are created as we cook further.
+    spawn_count = app.ttable.row_count
+    assert spawn_count >= 4
+    app.sfield.text = 'schedul'
+    eq_(app.ttable.row_count, spawn_count)
+    app.sfield.text = 'amount:42'
+    eq_(app.ttable.row_count, spawn_count)
+    app.drsel.select_next_date_range()
+    assert app.ttable.row_count >= 4
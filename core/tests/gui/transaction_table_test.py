@@ -14,7 +14,7 @@ from hscommon.testutil import eq_
 
 from ..base import TestApp, with_app, testdata
 from ...const import PaneType
-from ...gui.transaction_table import TransactionTable
+from ...gui.transaction_table import TransactionTable, TransactionTableRow
 from ...model.date import MonthRange, YearRange
 from ...model.account import AccountType
 from ...model.currency import USD
@@ -25,6 +25,25 @@ def app_tview_shown():
     app.show_tview()
     return app
 
+def test_rows_are_created_on_demand(monkeypatch):
+    # Rows are only created when they're accessed. Our totals don't need rows.
+    app = TestApp()
+    for i in range(10):
+        app.add_txn(description=str(i), amount='1')
+    app.show_tview()
+    loaded = []
+    original_load = TransactionTableRow.load
+    def load(row):
+        loaded.append(row)
+        original_load(row)
+    monkeypatch.setattr(TransactionTableRow, 'load', load)
+    app.ttable.refresh()
+    eq_(app.ttable.row_count, 10)
+    eq_(app.ttable.footer.amount, '10.00')
+    eq_(loaded, [])
+    eq_(app.ttable[2].description, '2')
+    eq_(len(loaded), 1)
+
 @with_app(app_tview_shown)
 def test_add_and_cancel(app):
     # Reverting after an add removes the transaction from the list.
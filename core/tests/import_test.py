@@ -110,6 +110,38 @@ def test_import_updates_undo_description(app):
     importall(app, testdata.filepath('qif', 'checkbook.qif'))
     app.mw.view.check_gui_calls_partial(['refresh_undo_actions'])
 
+@with_app(TestApp)
+def test_import_multiple_files(app):
+    # Files imported together are loaded in parallel and shown in the same import session.
+    filenames = [testdata.filepath('ofx', 'desjardins.ofx'), testdata.filepath('qif', 'checkbook.qif')]
+    app.mw.parse_files_for_import(filenames)
+    expected = ['815-30219-12345-EOP', '815-30219-11111-EOP', 'Account 1', 'Account 2']
+    eq_([pane.name for pane in app.iwin.panes], expected)
+    while app.iwin.panes:
+        app.iwin.import_selected_pane()
+    app.show_nwview()
+    eq_(app.bsheet.assets.children_count, 6)
+
+@with_app(TestApp)
+def test_import_multiple_files_with_invalid_file(app):
+    # Valid files are shown in the import window even if one of the files couldn't be imported.
+    filenames = [testdata.filepath('zerofile'), testdata.filepath('qif', 'checkbook.qif')]
+    with raises(FileFormatError):
+        app.mw.parse_files_for_import(filenames)
+    eq_(len(app.iwin.panes), 2)
+
+@with_app(TestApp)
+def test_import_multiple_csv_files(app):
+    # CSV files are configured one after the other.
+    filenames = [testdata.filepath('csv', 'fortis.csv'), testdata.filepath('csv', 'ambiguous_date.csv')]
+    app.mw.parse_files_for_import(filenames)
+    eq_(len(app.csvopt.lines), 19)
+    app.csvopt.set_column_field(1, CsvField.Date)
+    app.csvopt.set_column_field(3, CsvField.Amount)
+    app.csvopt.continue_import()
+    eq_(len(app.csvopt.lines), 1)
+    eq_(len(app.iwin.panes), 1)
+
 # ---
 def app_qif_import():
     # One account named 'Account 1' and then an parse_file_for_import() call for the 'checkbook.qif' test file.
@@ -5,13 +5,17 @@
 # http://www.gnu.org/licenses/gpl-3.0.html
 
 from datetime import date
+import sqlite3 as sqlite
 
+from pytest import raises
 from hscommon.testutil import eq_
 
 from ..document import ScheduleScope
+from ..exception import FileFormatError
 from ..model.account import AccountType
 from ..model.currency import Currency, CAD
 from ..model.date import MonthRange
+from ..loader import compact
 from .base import compare_apps, TestApp, with_app, testdata
 
 
@@ -36,6 +40,121 @@ def test_saved_file_starts_with_xml_header(tmpdir):
     contents = fp.read()
     assert contents.startswith('<?xml version="1.0" encoding="utf-8"?>\n')
 
+# --- Journaled save
+def app_journaled_save_with_three_txns(tmpdir):
+    app = TestApp()
+    app.app.journaled_save = True
+    app.add_accounts('one', 'two')
+    app.add_txn('01/01/2008', description='first', from_='one', to='two', amount='1')
+    app.add_txn('01/01/2008', description='second', from_='one', to='two', amount='2')
+    app.add_txn('02/01/2008', description='third', from_='two', to='one', amount='3')
+    app.filepath = str(tmpdir.join('foo.moneyguru'))
+    app.doc.save_to_xml(app.filepath)
+    return app
+
+def check_journaled_load(app):
+    newapp = TestApp()
+    newapp.doc.load_from_xml(app.filepath)
+    compare_apps(app.doc, newapp.doc)
+
+def test_journaled_save_appends_transaction_changes(tmpdir):
+    # When only transactions change, saving appends records to the existing file and loading that
+    # file gives us back the document as it is.
+    app = app_journaled_save_with_three_txns(tmpdir)
+    app.show_tview()
+    app.ttable[2].description = 'changed'
+    app.ttable.save_edits()
+    app.ttable.select([0])
+    app.ttable.delete()
+    app.add_txn('02/01/2008', description='fourth', from_='one', to='two', amount='4')
+    app.doc.save_to_xml(app.filepath)
+    with open(app.filepath, encoding='utf-8') as fp:
+        contents = fp.read()
+    assert '<delete-transaction index="0" />' in contents
+    assert contents.endswith('</moneyguru-file>')
+    check_journaled_load(app)
+
+def test_journaled_save_keeps_moved_positions(tmpdir):
+    # Positions of transactions are recorded in the journal, so moves survive a save/load.
+    app = app_journaled_save_with_three_txns(tmpdir)
+    app.show_tview()
+    app.ttable.move([1], 0)
+    app.doc.save_to_xml(app.filepath)
+    check_journaled_load(app)
+    eq_(app.ttable[0].description, 'second')
+
+def test_journaled_save_undo(tmpdir):
+    # Undone changes are journaled like any other change.
+    app = app_journaled_save_with_three_txns(tmpdir)
+    app.show_tview()
+    app.ttable.select([1])
+    app.ttable.delete()
+    app.doc.save_to_xml(app.filepath)
+    app.doc.undo()
+    app.doc.save_to_xml(app.filepath)
+    check_journaled_load(app)
+    eq_(app.ttable.row_count, 3)
+
+def test_journaled_save_compacts_on_account_change(tmpdir):
+    # When something else than transactions changes, a new complete snapshot is written.
+    app = app_journaled_save_with_three_txns(tmpdir)
+    app.show_tview()
+    app.ttable[0].description = 'changed'
+    app.ttable.save_edits()
+    app.doc.save_to_xml(app.filepath)
+    app.select_account('one')
+    app.bsheet.selected.name = 'renamed'
+    app.bsheet.save_edits()
+    app.doc.save_to_xml(app.filepath)
+    with open(app.filepath, encoding='utf-8') as fp:
+        assert 'delete-transaction' not in fp.read()
+    check_journaled_load(app)
+
+def test_journaled_autosave_appends_to_the_same_file(tmpdir):
+    # With journaled saves, autosaves keep appending to the same file rather than creating a new
+    # file each time.
+    app = app_journaled_save_with_three_txns(tmpdir)
+    cache_path = tmpdir.mkdir('cache')
+    app.app.cache_path = str(cache_path)
+    app.doc.must_autosave()
+    app.add_txn('03/01/2008', description='fourth', from_='one', to='two', amount='4')
+    app.doc.must_autosave()
+    app.add_txn('04/01/2008', description='fifth', from_='one', to='two', amount='5')
+    app.doc.must_autosave()
+    app.doc.select_next_date_range()
+    eq_(len(cache_path.listdir()), 1)
+    app.filepath = str(cache_path.listdir()[0])
+    check_journaled_load(app)
+
+def test_journaled_autosave_happens_in_main_thread(tmpdir):
+    # The autosave thread leaves journaled autosaves to the main thread, which performs them on its
+    # next notification.
+    app = app_journaled_save_with_three_txns(tmpdir)
+    cache_path = tmpdir.mkdir('cache')
+    app.app.cache_path = str(cache_path)
+    app.doc.must_autosave()
+    eq_(len(cache_path.listdir()), 0)
+    app.doc.select_next_date_range()
+    eq_(len(cache_path.listdir()), 1)
+
+def test_journal_keeps_changes_recorded_during_save(tmpdir):
+    # Changes recorded while a journal is being saved aren't lost: they're written by the next save.
+    app = app_journaled_save_with_three_txns(tmpdir)
+    journal = app.doc._journals[app.filepath]
+    app.show_tview()
+    original_append = journal._append
+    def append_and_edit(*args):
+        original_append(*args)
+        app.ttable[1].description = 'during save'
+        app.ttable.save_edits()
+    app.ttable[0].description = 'changed'
+    app.ttable.save_edits()
+    journal._append = append_and_edit
+    app.doc.save_to_xml(app.filepath)
+    journal._append = original_append
+    app.doc.save_to_xml(app.filepath)
+    check_journaled_load(app)
+
 # ---
 class TestLoadFile:
     # Loads 'simple.moneyguru', a file with 2 accounts and 2 entries in each. Select the first entry.
@@ -482,6 +601,103 @@ def test_save_load(tmpdir, monkeypatch):
     app = app_account_and_group()
     check(app)
 
+def test_save_load_compact(tmpdir, monkeypatch):
+    # Documents saved in the compact format are loaded back identically. load_from_xml() detects
+    # the format by itself.
+    def check(app):
+        filepath = str(tmpdir.join('foo.mgc'))
+        app.doc.save_to_compact(filepath)
+        assert not app.doc.is_dirty()
+        app.doc.close()
+        newapp = TestApp()
+        newapp.doc.load_from_xml(filepath)
+        newapp.doc.date_range = app.doc.date_range
+        newapp.doc._cook()
+        compare_apps(app.doc, newapp.doc)
+
+    # Apps are created one at a time because some of them patch today's date.
+    app_funcs = [
+        app_account_with_budget,
+        app_transaction_with_payee_and_checkno,
+        app_entry_with_blank_description,
+        app_account_in_group,
+        app_transaction_with_memos,
+        app_one_account_and_one_group,
+        app_one_account_in_one_group,
+        app_budget_with_all_fields_set,
+        app_account_with_apanel_attrs,
+        app_one_schedule_and_one_normal_txn,
+        lambda: app_schedule_with_global_change(monkeypatch),
+        lambda: app_schedule_with_local_deletion(monkeypatch),
+        app_schedule_made_from_txn,
+        app_account_and_group,
+        app_split_with_null_amount,
+    ]
+    for app_func in app_funcs:
+        check(app_func())
+
+def test_load_compact_with_unsupported_currency(tmpdir):
+    # Loading a compact document with amounts in an unknown currency raises FileFormatError.
+    XYZ = Currency.register('XYZ', 'Unsupported currency')
+    app = TestApp()
+    app.add_account('foo', XYZ)
+    app.show_account()
+    app.add_entry('01/01/2008', increase='42')
+    filepath = str(tmpdir.join('foo.mgc'))
+    app.doc.save_to_compact(filepath)
+    Currency.reset_currencies()
+    newapp = TestApp()
+    with raises(FileFormatError):
+        newapp.doc.load_from_xml(filepath)
+
+def test_load_compact_not_a_moneyguru_file(tmpdir):
+    # A SQLite database that isn't a moneyGuru document is refused.
+    filepath = str(tmpdir.join('foo.db'))
+    con = sqlite.connect(filepath)
+    con.execute("create table foo(bar TEXT)")
+    con.commit()
+    con.close()
+    app = TestApp()
+    with raises(FileFormatError):
+        app.doc.load_from_xml(filepath)
+
+def test_save_keeps_compact_format(tmpdir):
+    # A document loaded from a compact file is saved back in the compact format, even through
+    # save_to_xml(), which is what the GUI calls. We don't convert the user's file behind their back.
+    app = TestApp()
+    app.add_account('foo')
+    filepath = str(tmpdir.join('foo.mgc'))
+    app.doc.save_to_compact(filepath)
+    app.doc.close()
+    app = TestApp()
+    app.doc.load_from_xml(filepath)
+    app.add_account('bar')
+    app.doc.save_to_xml(filepath)
+    assert not app.doc.is_dirty()
+    assert compact.is_compact_file(filepath)
+    newapp = TestApp()
+    newapp.doc.load_from_xml(filepath)
+    eq_(newapp.account_names(), ['bar', 'foo'])
+
+def test_autosave_of_compact_document_is_xml(tmpdir):
+    # Autosaves don't follow the document's format.
+    app = TestApp()
+    app.add_account('foo')
+    app.doc.save_to_compact(str(tmpdir.join('foo.mgc')))
+    filepath = str(tmpdir.join('autosave.moneyguru'))
+    app.doc.save_to_xml(filepath, autosave=True)
+    assert not compact.is_compact_file(filepath)
+
+def test_save_after_clearing_compact_document_is_xml(tmpdir):
+    # Once the compact document is cleared, we're back to a new document, saved in XML.
+    app = TestApp()
+    app.add_account('foo')
+    app.doc.save_to_compact(str(tmpdir.join('foo.mgc')))
+    app.doc.clear()
+    filepath = str(tmpdir.join('foo.moneyguru'))
+    app.doc.save_to_xml(filepath)
+    assert not compact.is_compact_file(filepath)
+
 def test_save_load_qif(tmpdir):
     def check(app):
         filepath = str(tmpdir.join('foo.qif'))
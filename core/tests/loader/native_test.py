@@ -40,6 +40,28 @@ def test_parse_minimal(loader):
     except FileFormatError:
         assert False
 
+def test_parse_truncated_file(loader):
+    # The document is read as it's parsed, but a file that is cut in the middle is still refused.
+    content = b'<moneyguru-file><account name="foo" /><transaction date="2008-01-01"'
+    with raises(FileFormatError):
+        loader._parse(BytesIO(content))
+
+def test_only_root_transactions_are_transactions(loader):
+    # Transactions inside recurrences aren't loaded as normal transactions, whatever the order of
+    # the elements in the document.
+    content = b"""<moneyguru-file>
+    <recurrence type="daily" every="1">
+        <transaction date="2008-01-01" description="ref"><split account="foo" amount="USD 1.00" /></transaction>
+    </recurrence>
+    <transaction date="2008-01-02" description="txn"><split account="foo" amount="USD 2.00" /></transaction>
+    <account name="foo" currency="USD" type="asset" />
+    </moneyguru-file>"""
+    loader._parse(BytesIO(content))
+    loader.load()
+    eq_(len(loader.accounts), 1)
+    eq_([t.description for t in loader.transactions], ['txn'])
+    eq_(loader.schedules[0].ref.description, 'ref')
+
 def test_wrong_date(loader):
     # these used to raise FileFormatError, but now, we just want to make sure that there is no
     # crash.
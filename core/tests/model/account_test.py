@@ -8,10 +8,10 @@ from datetime import date
 
 from hscommon.testutil import eq_
 
-from ...model.account import Account, Group, AccountList, AccountType
+from ...model.account import Account, Group, AccountList, AccountType, GroupList
 from ...model.amount import Amount
 from ...model.currency import USD, CAD
-from ...model.date import MonthRange
+from ...model.date import DateRange, MonthRange
 from ...model.oven import Oven
 from ...model.transaction import Transaction
 from ...model.transaction_list import TransactionList
@@ -53,6 +53,66 @@ class TestGroupComparison:
         assert zoo1 != zoo3
 
 
+class TestAccountListFind:
+    def setup_method(self, method):
+        self.accounts = AccountList(USD)
+        self.checking = Account('Checking', USD, AccountType.Asset)
+        self.checking.account_number = '1000'
+        self.savings = Account('Savings', USD, AccountType.Asset)
+        self.savings.reference = 'ref'
+        self.accounts.add(self.checking)
+        self.accounts.add(self.savings)
+
+    def test_find(self):
+        assert self.accounts.find(' checKING ') is self.checking
+        assert self.accounts.find('1000 - Whatever') is self.checking
+        assert self.accounts.find('100') is None
+        assert self.accounts.find_reference('ref') is self.savings
+
+    def test_first_match_wins(self):
+        # When an account matches by number and another by name, the first one in the list wins.
+        other = Account('1000 stuff', USD, AccountType.Asset)
+        self.accounts.add(other)
+        assert self.accounts.find('1000 stuff') is self.checking
+
+    def test_rename(self):
+        self.accounts.set_account_name(self.checking, 'Foo')
+        assert self.accounts.find('checking') is None
+        assert self.accounts.find('foo') is self.checking
+
+    def test_reindex(self):
+        self.checking.account_number = '2000'
+        self.savings.reference = 'other'
+        self.accounts.reindex()
+        assert self.accounts.find('1000') is None
+        assert self.accounts.find('2000') is self.checking
+        assert self.accounts.find_reference('ref') is None
+        assert self.accounts.find_reference('other') is self.savings
+
+    def test_remove(self):
+        self.accounts.remove(self.checking)
+        assert self.accounts.find('checking') is None
+        self.accounts.add(self.checking)
+        assert self.accounts.find('checking') is self.checking
+        self.accounts.clear()
+        assert self.accounts.find('savings') is None
+
+
+def test_group_list_find():
+    groups = GroupList()
+    asset_group = Group('Foo', AccountType.Asset)
+    liability_group = Group('foo', AccountType.Liability)
+    groups.append(asset_group)
+    groups.append(liability_group)
+    assert groups.find('FOO', AccountType.Asset) is asset_group
+    assert groups.find('foo', AccountType.Liability) is liability_group
+    groups.set_group_name(asset_group, 'Bar')
+    assert groups.find('foo', AccountType.Asset) is None
+    assert groups.find('bar', AccountType.Asset) is asset_group
+    groups.remove(asset_group)
+    assert groups.find('bar', AccountType.Asset) is None
+
+
 class TestOneAccount:
     def setup_method(self, method):
         USD.set_CAD_value(1.1, date(2007, 12, 31))
@@ -69,8 +129,9 @@ class TestOneAccount:
             Transaction(date(2008, 1, 3), account=self.account, amount=Amount(70, CAD)),
             Transaction(date(2008, 1, 31), account=self.account, amount=Amount(2, USD)),
         ])
-        oven = Oven(accounts, transactions, [], [])
-        oven.cook(date.min, date.max)
+        self.transactions = transactions
+        self.oven = Oven(accounts, transactions, [], [])
+        self.oven.cook(date.min, date.max)
 
     def test_balance(self):
         eq_(self.account.entries.balance(date(2007, 12, 31)), Amount(20, USD))
@@ -86,3 +147,27 @@ class TestOneAccount:
         # Each entry is converted using the entry's day rate.
         eq_(self.account.entries.cash_flow(range, CAD), Amount(201.40, CAD))
 
+    def test_cash_flow_partial_range(self):
+        # Only entries within the range are counted, including those at the range's bounds.
+        entries = self.account.entries
+        eq_(entries.cash_flow(DateRange(date(2008, 1, 1), date(2008, 1, 2))), Amount(150, USD))
+        eq_(entries.cash_flow(DateRange(date(2008, 1, 4), date(2008, 1, 30))), 0)
+        eq_(entries.cash_flow(DateRange(date(2007, 1, 1), date(2007, 12, 30))), 0)
+
+    def test_cash_flow_after_recook(self):
+        # When entries are re-created from a date, cash flows computed before are discarded.
+        range = MonthRange(date(2008, 1, 1))
+        self.account.entries.cash_flow(range, CAD)
+        self.transactions[2].splits[0].amount = Amount(60, USD)
+        self.transactions[2].splits[1].amount = Amount(-60, USD)
+        self.oven.cook(date(2008, 1, 2), date.max)
+        eq_(self.account.entries.cash_flow(range), Amount(262, USD))
+        eq_(self.account.entries.cash_flow(range, CAD), Amount(209.40, CAD))
+
+    def test_last_entry(self):
+        # last_entry() returns the last entry that isn't after the specified date.
+        entries = self.account.entries
+        eq_(entries.last_entry(date(2008, 1, 2)).amount, Amount(50, USD))
+        eq_(entries.last_entry(date(2008, 1, 15)).amount, Amount(70, CAD))
+        assert entries.last_entry(date(2007, 12, 30)) is None
+
@@ -6,11 +6,15 @@
 # which should be included with this package. The terms are also available at
 # http://www.gnu.org/licenses/gpl-3.0.html
 
+from datetime import date
+
 from pytest import raises
 from hscommon.testutil import eq_
 
 from ...model.currency import Currency, CAD, EUR, USD
-from ...model.amount import format_amount, parse_amount, Amount, UnsupportedCurrencyError
+from ...model.amount import (
+    format_amount, parse_amount, convert_amount, Amount, AmountArray, UnsupportedCurrencyError
+)
 
 
 # --- Amount
@@ -396,3 +400,92 @@ def test_format_zero():
     eq_(format_amount(Amount(0, USD), default_currency=CAD), '0.00')
     eq_(format_amount(0, default_currency=CAD, zero_currency=EUR), 'EUR 0.00')
     eq_(format_amount(0, default_currency=EUR, zero_currency=EUR), '0.00')
+
+# --- AmountArray
+def test_amount_array_sum():
+    # Summing an AmountArray gives the same result as summing amounts.
+    amounts = AmountArray([Amount(1.11, CAD), 0, Amount(2.22, CAD), Amount(-0.33, CAD)])
+    eq_(len(amounts), 4)
+    eq_(amounts[1], 0)
+    eq_(amounts[2], Amount(2.22, CAD))
+    eq_(amounts.sum(), Amount(3, CAD))
+    eq_(AmountArray().sum(), 0)
+
+def test_amount_array_sum_zero_amounts():
+    # Zero amounts of another currency can be added, like with normal amounts.
+    amounts = AmountArray([Amount(0, USD), Amount(1, CAD), Amount(0, EUR)])
+    eq_(amounts.sum(), Amount(1, CAD))
+    eq_(AmountArray([Amount(0, USD)]).sum().currency, USD)
+
+def test_amount_array_sum_mixed_currencies():
+    # Like with amounts, summing non-zero amounts of different currencies raises ValueError.
+    amounts = AmountArray([Amount(1, CAD), Amount(1, USD)])
+    with raises(ValueError):
+        amounts.sum()
+
+def test_amount_array_cumsum():
+    # cumsum() returns running totals. When the total doesn't change, the same object is re-used.
+    amounts = AmountArray([Amount(1, CAD), 0, Amount(2, CAD), Amount(3, CAD)])
+    result = amounts.cumsum(start=Amount(10, CAD))
+    eq_(result, [Amount(11, CAD), Amount(11, CAD), Amount(13, CAD), Amount(16, CAD)])
+    assert result[0] is result[1]
+
+def test_amount_array_cumsum_include():
+    # When `include` is specified, only amounts for which it's true are added to the total.
+    amounts = AmountArray([Amount(1, CAD), Amount(2, CAD), Amount(3, CAD)])
+    result = amounts.cumsum(include=[True, False, True])
+    eq_(result, [Amount(1, CAD), Amount(1, CAD), Amount(4, CAD)])
+
+def test_amount_array_cumsum_zero_total():
+    # When the running total is zero, it takes the currency of the next amount, like with amounts.
+    amounts = AmountArray([Amount(1, CAD), Amount(-1, CAD), Amount(2, USD)])
+    result = amounts.cumsum()
+    eq_(result[1], Amount(0, CAD))
+    eq_(result[1].currency, CAD)
+    eq_(result[2], Amount(2, USD))
+    with raises(ValueError):
+        AmountArray([Amount(1, CAD), Amount(2, USD)]).cumsum()
+
+def test_amount_array_convert():
+    # Foreign amounts are converted with the rate of their own date.
+    USD.set_CAD_value(1.5, date(2008, 1, 1))
+    USD.set_CAD_value(2, date(2008, 1, 2))
+    amounts = AmountArray([Amount(1, USD), Amount(1, CAD), Amount(1, USD), 0])
+    dates = [date(2008, 1, 1), date(2008, 1, 1), date(2008, 1, 2), date(2008, 1, 2)]
+    converted = amounts.convert(CAD, dates)
+    eq_(converted.sum(), Amount(4.5, CAD))
+    eq_(amounts.convert(USD, dates).sum(), Amount(2.67, USD))
+
+def test_amount_array_results_are_those_of_amount_arithmetic():
+    # When Amount arithmetic gives back one of the amounts it adds, so do we. A converted amount
+    # keeps its unrounded value, and that value ends up in our graphs.
+    USD.set_CAD_value(1.2345, date(2008, 1, 1))
+    amounts = [Amount(1, CAD), Amount(-1, CAD), Amount(0, USD), Amount(1.23, USD), 0]
+    dates = [date(2008, 1, 1)] * len(amounts)
+    converted = [convert_amount(a, CAD, d) for a, d in zip(amounts, dates)]
+    expected = []
+    total = 0
+    for amount in converted:
+        total += amount
+        expected.append(total)
+    array = AmountArray(amounts).convert(CAD, dates)
+    result = array.cumsum()
+    eq_(result, expected)
+    eq_([float(a) for a in result], [float(a) for a in expected])
+    assert result[3] is array[3]
+    eq_(float(array.sum()), float(sum(converted)))
+
+
+def test_amount_array_sum_back_to_zero():
+    # When the sum goes back to zero, it becomes the next amount added to it, like with amounts.
+    amounts = [Amount(1, CAD), Amount(-1, CAD), Amount(2, USD), 0]
+    result = AmountArray(amounts).sum()
+    assert result is amounts[2]
+    eq_(AmountArray([Amount(1, CAD), Amount(-1, CAD)]).sum(), Amount(0, CAD))
+
+def test_amount_array_only_holds_amounts():
+    # Like with amounts, only amounts and zero can be summed.
+    with raises(TypeError):
+        AmountArray([Amount(1, CAD), 2]).sum()
+    with raises(TypeError):
+        AmountArray([Amount(1, CAD), 2]).cumsum()
@@ -25,10 +25,14 @@ def setup_module(module):
     BAR = Currency.register('BAR', 'Currency with stop date', stop_date=date(2010, 1, 12), latest_rate=2)
 
 def teardown_module(module):
-    # We must unset our test currencies or else we might mess up with other tests.
-    from ...model import currency
-    import imp
-    imp.reload(currency)
+    # We must unset our test currencies or else we might mess up with other tests. We don't reload
+    # the currency module because currencies imported by other units would then be instances of a
+    # stale class, which, among other things, can't be pickled.
+    for test_currency in [FOO, BAR]:
+        Currency.all.remove(test_currency)
+        del Currency.by_code[test_currency.code]
+        del Currency.by_name[test_currency.name]
+    Currency.set_rates_db(None)
 
 def teardown_function(function):
     Currency.set_rates_db(None)
@@ -148,6 +152,36 @@ def test_seek_rate_before():
     setup_two_daily_rate()
     eq_(USD.value_in(CAD, date(2008, 4, 19)), 1/0.996115)
 
+def test_set_rate_between_two_rates():
+    # When setting a rate between two rates after a get, dates after the new rate use it, but
+    # dates before it still use the previous rate.
+    setup_two_daily_rate()
+    eq_(USD.value_in(CAD, date(2008, 4, 21)), 1/0.996115) # values will be cached
+    eq_(USD.value_in(CAD, date(2008, 4, 23)), 1/0.996115)
+    eq_(USD.value_in(CAD, date(2008, 4, 26)), 1/0.997115)
+    USD.set_CAD_value(42, date(2008, 4, 22))
+    eq_(USD.value_in(CAD, date(2008, 4, 21)), 1/0.996115)
+    eq_(USD.value_in(CAD, date(2008, 4, 23)), 42)
+    eq_(USD.value_in(CAD, date(2008, 4, 26)), 1/0.997115)
+
+def test_set_rate_before_first_rate():
+    # Dates before the first rate seek forward, so setting an earlier rate affects them.
+    setup_two_daily_rate()
+    eq_(USD.value_in(CAD, date(2008, 4, 10)), 1/0.996115) # value will be cached
+    USD.set_CAD_value(42, date(2008, 4, 15))
+    eq_(USD.value_in(CAD, date(2008, 4, 10)), 42)
+    eq_(USD.value_in(CAD, date(2008, 4, 16)), 42)
+
+def test_rates_are_loaded_once():
+    # Once a currency's rates are loaded, lookups don't hit the database anymore.
+    db = RatesDB()
+    db.set_CAD_value(date(2008, 4, 20), 'USD', 2)
+    db.set_CAD_value(date(2008, 4, 25), 'USD', 3)
+    eq_(db.get_rate(date(2008, 4, 22), 'USD', 'CAD'), 2)
+    db.con = None # any query would crash
+    eq_(db.get_rate(date(2008, 4, 19), 'USD', 'CAD'), 2)
+    eq_(db.get_rate(date(2008, 4, 26), 'USD', 'CAD'), 3)
+
 # --- Rates of multiple currencies
 def setup_rates_of_multiple_currencies():
     USD.set_CAD_value(1/0.996115, date(2008, 4, 20))
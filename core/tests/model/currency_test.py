@@ -14,7 +14,8 @@ from hscommon.testutil import jointhreads, eq_
 
 from ...model.amount import convert_amount
 from ...model.amount import Amount
-from ...model.currency import Currency, USD, CAD, RateProviderUnavailable, RatesDB
+from ...model.currency import Currency, USD, CAD, EUR, RateProviderUnavailable, RatesDB
+from ...model.date import DateRange
 from ...plugin import yahoo_currency_provider, boc_currency_provider
 
 def slow_down(func):
@@ -65,6 +66,32 @@ def test_seek_rate():
     eq_(convert_amount(amount, CAD, date(2008, 5, 21)), expected)
     eq_(convert_amount(amount, CAD, date(2008, 5, 19)), expected)
 
+def test_snapshot():
+    # A snapshot gives the same rates as its DB, but only for its currencies. Rates set afterwards
+    # don't affect it.
+    db, _ = set_ratedb_for_tests()
+    USD.set_CAD_value(0.98, date(2008, 5, 20))
+    USD.set_CAD_value(0.99, date(2008, 5, 25))
+    snapshot = db.snapshot(['USD', 'CAD'])
+    for day in [19, 20, 22, 25, 26]:
+        eq_(snapshot.get_rate(date(2008, 5, day), 'USD', 'CAD'), db.get_rate(date(2008, 5, day), 'USD', 'CAD'))
+    USD.set_CAD_value(0.5, date(2008, 5, 22))
+    eq_(snapshot.get_rate(date(2008, 5, 22), 'USD', 'CAD'), 0.98)
+    eq_(convert_amount(Amount(1, USD), CAD, date(2008, 5, 22), snapshot), Amount(0.98, CAD))
+    with raises(KeyError):
+        snapshot.get_rate(date(2008, 5, 22), 'EUR', 'CAD')
+    # Start/stop dates of currencies are still handled by Currency.
+    eq_(EUR.value_in(CAD, date(1990, 1, 1), snapshot), EUR.start_rate)
+
+def test_rate_change_dates():
+    # A currency's value can only change at dates for which we have a rate or at its start date.
+    set_ratedb_for_tests()
+    USD.set_CAD_value(0.98, date(2008, 5, 20))
+    USD.set_CAD_value(0.99, date(2008, 5, 25))
+    eq_(USD.rate_change_dates(DateRange(date(2008, 5, 21), date(2008, 5, 31))), [date(2008, 5, 25)])
+    eq_(CAD.rate_change_dates(DateRange(date(2008, 5, 1), date(2008, 5, 31))), [])
+    eq_(EUR.rate_change_dates(DateRange(date(1998, 12, 1), date(1999, 1, 31))), [EUR.start_date])
+
 # ---
 def test_ask_for_rates_in_the_past():
     # If a rate is asked for a date lower than the lowest fetched date, fetch that range.
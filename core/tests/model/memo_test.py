@@ -0,0 +1,39 @@
+# Copyright 2016 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+from hscommon.testutil import eq_
+
+from ...model.account import AccountList
+from ...model.budget import BudgetList
+from ...model.currency import USD
+from ...model.memo import CookMemo
+from ...model.oven import Oven
+from ...model.transaction_list import TransactionList
+
+class TestCookMemo:
+    def setup_method(self, method):
+        self.oven = Oven(AccountList(USD), TransactionList(), [], BudgetList())
+        self.memo = CookMemo(self.oven)
+        self.calls = []
+
+    def compute(self):
+        self.calls.append(None)
+        return len(self.calls)
+
+    def test_value_is_computed_once(self):
+        eq_(self.memo.get('foo', self.compute), 1)
+        eq_(self.memo.get('foo', self.compute), 1)
+        eq_(self.memo.get('bar', self.compute), 2)
+
+    def test_cook_invalidates(self):
+        self.memo.get('foo', self.compute)
+        self.oven.cook()
+        eq_(self.memo.get('foo', self.compute), 2)
+
+    def test_clear(self):
+        self.memo.get('foo', self.compute)
+        self.memo.clear()
+        eq_(self.memo.get('foo', self.compute), 2)
@@ -0,0 +1,279 @@
+# Copyright 2016 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+import os.path as op
+import threading
+from datetime import date, timedelta
+
+from hscommon.testutil import eq_
+
+from ...model.account import Account, AccountList, AccountType
+from ...model.amount import Amount
+from ...model.budget import Budget, BudgetList, BudgetSpawn
+from ...model.currency import Currency, RatesDB, CAD, EUR, USD
+from ...model.date import DateRange
+from ...model.oven import Oven
+from ...model.recurrence import Recurrence, RepeatType
+from ...model.transaction import Transaction
+from ...model.transaction_list import TransactionList
+
+class TestDirtyAccounts:
+    def setup_method(self, method):
+        self.accounts = AccountList(USD)
+        self.checking = Account('Checking', USD, AccountType.Asset)
+        self.savings = Account('Savings', USD, AccountType.Asset)
+        self.expense = Account('Expense', USD, AccountType.Expense)
+        for account in [self.checking, self.savings, self.expense]:
+            self.accounts.add(account)
+        self.transactions = TransactionList([
+            Transaction(date(2014, 1, 1), account=self.checking, amount=Amount(10, USD)),
+            Transaction(date(2014, 1, 2), account=self.savings, amount=Amount(20, USD)),
+            Transaction(date(2014, 1, 3), account=self.checking, amount=Amount(30, USD)),
+            Transaction(date(2014, 1, 4), account=self.savings, amount=Amount(40, USD)),
+        ])
+        self.schedules = []
+        self.budgets = BudgetList()
+        self.oven = Oven(self.accounts, self.transactions, self.schedules, self.budgets)
+        self.oven.cook()
+
+    def test_clean_accounts_are_left_intact(self):
+        # When cooking with dirty accounts, entries of other accounts are not re-created.
+        savings_entries = list(self.savings.entries)
+        txn = self.transactions[2]
+        txn.splits[0].amount = Amount(31, USD)
+        txn.splits[1].amount = Amount(-31, USD)
+        self.oven.cook(from_date=txn.date, dirty_accounts=txn.affected_accounts())
+        eq_(self.checking.entries.balance(), Amount(41, USD))
+        eq_(len(self.savings.entries), 2)
+        for old, new in zip(savings_entries, self.savings.entries):
+            assert old is new
+
+    def test_entries_are_reused(self):
+        # When recooking, entries of splits that were already cooked are updated in place. Only new
+        # splits get new entries.
+        checking_entries = list(self.checking.entries)
+        txn = self.transactions[0]
+        txn.splits[0].amount = Amount(11, USD)
+        txn.splits[1].amount = Amount(-11, USD)
+        newtxn = Transaction(date(2014, 1, 5), account=self.checking, amount=Amount(5, USD))
+        self.transactions.add(newtxn)
+        self.oven.cook(from_date=txn.date, dirty_accounts={self.checking})
+        eq_(len(self.checking.entries), 3)
+        for old, new in zip(checking_entries, self.checking.entries):
+            assert old is new
+        eq_([e.amount for e in self.checking.entries], [Amount(11, USD), Amount(30, USD), Amount(5, USD)])
+        eq_([e.balance for e in self.checking.entries], [Amount(11, USD), Amount(41, USD), Amount(46, USD)])
+        assert self.checking.entries[2].split is newtxn.splits[0]
+
+    def test_reassigned_split(self):
+        # When both the previous and new accounts of a split are dirty, the result is the same as
+        # with a full cook.
+        txn = self.transactions[0]
+        txn.splits[0].account = self.savings
+        self.oven.cook(from_date=txn.date, dirty_accounts={self.checking, self.savings})
+        eq_(self.checking.entries.balance(), Amount(30, USD))
+        eq_(self.savings.entries.balance(), Amount(70, USD))
+        eq_(len(self.savings.entries), 3)
+        eq_([e.balance for e in self.savings.entries], [Amount(10, USD), Amount(30, USD), Amount(70, USD)])
+
+    def test_respawned_recurrence_accounts_are_dirty(self):
+        # When a recurrence re-creates its spawns, the accounts it affects are dirty, even if they
+        # weren't passed in the dirty accounts.
+        ref = Transaction(date(2014, 1, 5), account=self.savings, amount=Amount(1, USD))
+        schedule = Recurrence(ref, RepeatType.Daily, 1)
+        self.schedules.append(schedule)
+        self.oven.cook(until_date=date(2014, 1, 7))
+        schedule.reset_spawn_cache()
+        self.oven.cook(from_date=date(2014, 1, 1), until_date=date(2014, 1, 7), dirty_accounts=set())
+        spawns = [e.transaction for e in self.savings.entries][2:]
+        eq_(len(spawns), 3)
+        for spawn in spawns:
+            assert spawn in self.oven.transactions
+
+    def test_compute_cook_leaves_recurrences_intact(self):
+        # Computing a cook, which can happen in another thread, doesn't touch recurrences' spawn
+        # caches nor the positions of cooked spawns. Both are updated when the cook is applied.
+        ref = Transaction(date(2014, 1, 5), account=self.savings, amount=Amount(1, USD))
+        schedule = Recurrence(ref, RepeatType.Daily, 1)
+        self.schedules.append(schedule)
+        self.oven.cook(until_date=date(2014, 1, 7))
+        cached = dict(schedule.date2instances)
+        positions = [spawn.position for spawn in cached.values()]
+        self.transactions.add(Transaction(date(2014, 1, 1), account=self.checking, amount=Amount(1, USD)))
+        cook = self.oven.prepare_cook(date(2014, 1, 1), date(2014, 1, 10))
+        self.oven.compute_cook(cook)
+        eq_(schedule.date2instances, cached)
+        eq_([spawn.position for spawn in cached.values()], positions)
+        assert self.oven.apply_cook(cook)
+        eq_(len(schedule.date2instances), 6)
+        for old in cached.values():
+            assert schedule.date2instances[old.recurrence_date] is old
+        eq_(sorted(spawn.position for spawn in schedule.date2instances.values()), list(range(5, 11)))
+
+    def test_cook_is_stale_when_spawn_cache_is_reset(self):
+        # If a recurrence's spawn cache is reset while a cook is computed, the cook isn't applied.
+        ref = Transaction(date(2014, 1, 5), account=self.savings, amount=Amount(1, USD))
+        schedule = Recurrence(ref, RepeatType.Daily, 1)
+        self.schedules.append(schedule)
+        cook = self.oven.prepare_cook(date(2014, 1, 1), date(2014, 1, 10))
+        self.oven.compute_cook(cook)
+        schedule.reset_spawn_cache()
+        assert not self.oven.apply_cook(cook)
+        eq_(schedule.date2instances, {})
+
+    def test_budget_target_is_dirty(self):
+        # The target of a budget for a dirty account is also dirty because its spawns' amounts
+        # depend on the transactions of the budget's account.
+        start = date.today() + timedelta(days=1)
+        budget = Budget(self.expense, self.checking, Amount(100, USD), start)
+        self.budgets.append(budget)
+        self.oven.cook(until_date=start + timedelta(days=20))
+        txn = Transaction(start, account=self.expense, amount=Amount(25, USD))
+        txn.splits[1].account = self.savings
+        self.transactions.add(txn)
+        self.oven.cook(
+            from_date=start, until_date=start + timedelta(days=20),
+            dirty_accounts=txn.affected_accounts()
+        )
+        eq_(self.checking.entries.balance_with_budget(), Amount(-35, USD))
+
+def test_compute_cook_in_another_thread(monkeypatch, tmpdir):
+    # Our rates DB can only be used from the main thread. When we compute a cook in another thread,
+    # amounts are converted with the rates we need, which were loaded when the cook was prepared.
+    path = str(tmpdir.join('rates.db'))
+    rates_db = RatesDB(path, False)
+    monkeypatch.setattr(Currency, 'rates_db', rates_db)
+    for day, (usd, eur) in enumerate([(1.1, 1.4), (1.2, 1.5), (1.3, 1.6)], start=1):
+        USD.set_CAD_value(usd, date(2014, 1, day))
+        EUR.set_CAD_value(eur, date(2014, 1, day))
+    # Nothing is loaded yet.
+    rates_db.clear_cache()
+    accounts = AccountList(USD)
+    checking = Account('Checking', USD, AccountType.Asset)
+    savings = Account('Savings', EUR, AccountType.Asset)
+    expense = Account('Expense', CAD, AccountType.Expense)
+    for account in [checking, savings, expense]:
+        accounts.add(account)
+    transactions = TransactionList()
+    for day, (account, amount) in enumerate([
+            (checking, Amount(10, EUR)), (savings, Amount(20, USD)), (checking, Amount(30.33, CAD))], start=1):
+        txn = Transaction(date(2014, 1, day), account=account, amount=amount)
+        txn.splits[1].account = expense
+        transactions.add(txn)
+    ref = Transaction(date(2014, 1, 2), account=savings, amount=Amount(12.34, CAD))
+    ref.splits[1].account = expense
+    schedules = [Recurrence(ref, RepeatType.Daily, 1)]
+    budgets = BudgetList()
+    budgets.append(Budget(expense, checking, Amount(100, EUR), date.today() + timedelta(days=1)))
+    oven = Oven(accounts, transactions, schedules, budgets)
+    until_date = date.today() + timedelta(days=60)
+    cook = oven.prepare_cook(until_date=until_date)
+    errors = []
+
+    def compute():
+        try:
+            oven.compute_cook(cook)
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=compute)
+    thread.start()
+    thread.join()
+    eq_(errors, [])
+    assert oven.apply_cook(cook)
+    balances = {a: [e.balance for e in a.entries] for a in [checking, savings, expense]}
+    assert op.exists(path)
+    oven.cook(until_date=until_date)
+    for account in [checking, savings, expense]:
+        eq_([e.balance for e in account.entries], balances[account])
+    eq_(checking.entries[0].balance, Amount(10 * 1.4 / 1.1, USD))
+
+class TestTransactionsInRange:
+    def setup_method(self, method):
+        self.accounts = AccountList(USD)
+        self.checking = Account('Checking', USD, AccountType.Asset)
+        self.accounts.add(self.checking)
+        self.transactions = TransactionList([
+            Transaction(date(2014, 1, day), account=self.checking, amount=Amount(day, USD))
+            for day in [1, 2, 2, 5, 9]
+        ])
+        self.oven = Oven(self.accounts, self.transactions, [], BudgetList())
+        self.oven.cook()
+
+    def check_range(self, start, end):
+        date_range = DateRange(start, end)
+        expected = [t for t in self.oven.transactions if t.date in date_range]
+        eq_(self.oven.transactions_in_range(date_range), expected)
+        expected = [e for e in self.checking.entries if e.date in date_range]
+        eq_(self.checking.entries.entries_in_range(date_range), expected)
+
+    def test_ranges(self):
+        self.check_range(date(2014, 1, 2), date(2014, 1, 5))
+        self.check_range(date(2014, 1, 3), date(2014, 1, 4))
+        self.check_range(date(2013, 1, 1), date(2015, 1, 1))
+        self.check_range(date(2014, 1, 9), date(2014, 1, 9))
+        self.check_range(date(2015, 1, 1), date(2015, 1, 2))
+
+    def test_after_partial_cook(self):
+        # The ranges stay correct after a cook that re-uses cooked transactions.
+        txn = self.transactions[1]
+        txn.date = date(2014, 1, 7)
+        self.oven.cook(from_date=date(2014, 1, 2))
+        eq_(len(self.oven.transactions_in_range(DateRange(date(2014, 1, 2), date(2014, 1, 2)))), 1)
+        self.check_range(date(2014, 1, 2), date(2014, 1, 7))
+        self.check_range(date(2014, 1, 1), date(2014, 1, 1))
+
+    def test_cash_flows(self):
+        # Grouped cash flows are the same as cash flows computed range by range.
+        date_ranges = [
+            DateRange(date(2013, 12, 1), date(2013, 12, 31)),
+            DateRange(date(2014, 1, 1), date(2014, 1, 1)),
+            DateRange(date(2014, 1, 2), date(2014, 1, 4)),
+            DateRange(date(2014, 1, 5), date(2014, 1, 4)), # empty range
+            DateRange(date(2014, 1, 5), date(2014, 1, 20)),
+        ]
+        expected = [self.checking.entries.cash_flow(r) for r in date_ranges]
+        eq_(self.checking.entries.cash_flows(date_ranges), expected)
+        eq_(expected[1:], [Amount(1, USD), Amount(4, USD), 0, Amount(14, USD)])
+
+class TestBudgetSpawns:
+    def setup_method(self, method):
+        self.accounts = AccountList(USD)
+        self.checking = Account('Checking', USD, AccountType.Asset)
+        self.expense = Account('Expense', USD, AccountType.Expense)
+        for account in [self.checking, self.expense]:
+            self.accounts.add(account)
+        self.start = date.today() + timedelta(days=1)
+        self.transactions = TransactionList()
+        self.budgets = BudgetList()
+        self.oven = Oven(self.accounts, self.transactions, [], self.budgets)
+
+    def add_txn(self, days, amount):
+        txn = Transaction(self.start + timedelta(days=days), account=self.expense, amount=Amount(amount, USD))
+        txn.splits[1].account = self.checking
+        self.transactions.add(txn)
+
+    def budget_amounts(self):
+        spawns = [t for t in self.oven.transactions if isinstance(t, BudgetSpawn)]
+        return [spawn.amount_for_account(self.expense, USD) for spawn in spawns]
+
+    def test_transactions_are_counted_in_their_period(self):
+        # Each budget spawn is reduced by the transactions in its own period only.
+        self.budgets.append(Budget(self.expense, self.checking, Amount(100, USD), self.start, RepeatType.Weekly))
+        self.add_txn(8, 30)
+        self.add_txn(1, 10)
+        self.add_txn(13, 5)
+        self.add_txn(15, 200)
+        self.oven.cook(until_date=self.start + timedelta(days=27))
+        eq_(self.budget_amounts(), [Amount(90, USD), Amount(65, USD), Amount(100, USD)])
+
+    def test_overlapping_budgets_consume_transactions_once(self):
+        # When two budgets share an account, a transaction only reduces the first budget's spawn.
+        for amount in [100, 50]:
+            self.budgets.append(Budget(self.expense, self.checking, Amount(amount, USD), self.start))
+        self.add_txn(2, 30)
+        self.oven.cook(until_date=self.start + timedelta(days=20))
+        eq_(sorted(self.budget_amounts()), [Amount(50, USD), Amount(70, USD)])
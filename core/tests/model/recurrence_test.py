@@ -0,0 +1,71 @@
+# Copyright 2016 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+from datetime import date, timedelta
+
+from hscommon.testutil import eq_
+
+from ...model import recurrence
+from ...model.recurrence import Recurrence, RepeatType, DateCounter, get_date_sequence
+from ...model.transaction import Transaction
+
+def test_date_sequence_is_shared():
+    sequence = get_date_sequence(date(2014, 1, 31), RepeatType.Monthly, 1)
+    end_index = sequence.index_after(date(2014, 6, 30))
+    expected = list(DateCounter(date(2014, 1, 31), RepeatType.Monthly, 1, date(2014, 6, 30)))
+    eq_(sequence.dates[:end_index], expected)
+    assert get_date_sequence(date(2014, 1, 31), RepeatType.Monthly, 1) is sequence
+
+def test_date_sequence_cache_evicts_least_recently_used(monkeypatch):
+    # When the cache is full, only the least recently used sequence is forgotten.
+    monkeypatch.setattr(recurrence, 'DATE_SEQUENCE_CACHE_SIZE', 3)
+    monkeypatch.setattr(recurrence, '_date_sequences', type(recurrence._date_sequences)())
+    first, second, third = [get_date_sequence(date(2014, 1, day), RepeatType.Daily, 1) for day in (1, 2, 3)]
+    assert get_date_sequence(date(2014, 1, 1), RepeatType.Daily, 1) is first
+    get_date_sequence(date(2014, 1, 4), RepeatType.Daily, 1)
+    assert get_date_sequence(date(2014, 1, 1), RepeatType.Daily, 1) is first
+    assert get_date_sequence(date(2014, 1, 3), RepeatType.Daily, 1) is third
+    assert get_date_sequence(date(2014, 1, 2), RepeatType.Daily, 1) is not second
+
+class TestGetSpawnsFromDate:
+    def setup_method(self, method):
+        ref = Transaction(date(2014, 1, 1), description='foo')
+        self.schedule = Recurrence(ref, RepeatType.Weekly, 1)
+        self.end = date(2014, 6, 1)
+
+    def check_from_date(self, from_date):
+        # Spawns returned with a from_date are the ones (the same instances) that are returned
+        # without it, and all spawns happening from from_date are there.
+        all_spawns = self.schedule.get_spawns(self.end)
+        spawns = self.schedule.get_spawns(self.end, from_date=from_date)
+        assert all(spawn in all_spawns for spawn in spawns)
+        eq_([s for s in all_spawns if s.date >= from_date], [s for s in spawns if s.date >= from_date])
+        return spawns
+
+    def test_simple(self):
+        spawns = self.check_from_date(date(2014, 5, 1))
+        eq_(spawns[0].date, date(2014, 5, 7))
+        eq_(len(spawns), 4)
+
+    def test_global_change_before_from_date(self):
+        # A global change before from_date still applies to spawns after it.
+        spawn = self.schedule.get_spawns(self.end)[2]
+        spawn.date += timedelta(days=2)
+        spawn.description = 'changed'
+        self.schedule.change_globally(spawn)
+        spawns = self.check_from_date(date(2014, 5, 1))
+        eq_(spawns[0].description, 'changed')
+        eq_(spawns[0].date, date(2014, 5, 2))
+
+    def test_exception_moved_after_from_date(self):
+        spawn = self.schedule.get_spawns(self.end)[2]
+        spawn.date = date(2014, 5, 20)
+        self.schedule.date2exception[spawn.recurrence_date] = spawn
+        spawns = self.check_from_date(date(2014, 5, 1))
+        assert spawn in spawns
+
+    def test_from_date_after_end(self):
+        eq_(self.check_from_date(date(2015, 1, 1)), [])
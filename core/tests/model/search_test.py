@@ -0,0 +1,85 @@
+# Copyright 2016 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+from datetime import date
+
+from hscommon.testutil import eq_
+
+from ...model.account import Account, AccountType
+from ...model.amount import Amount
+from ...model.currency import USD
+from ...model.search import SearchIndex, TextIndex
+from ...model.transaction import Transaction
+
+def test_text_index_containing():
+    index = TextIndex()
+    index.add('foobar', 1)
+    index.add('barbaz', 2)
+    index.add('foo', 3)
+    eq_(index.containing('bar'), {1, 2})
+    eq_(index.containing('oba'), {1})
+    eq_(index.containing('fo'), {1, 3})
+    eq_(index.containing(''), {1, 2, 3})
+    eq_(index.containing('nope'), set())
+    index.remove('foobar', 1)
+    eq_(index.containing('bar'), {2})
+    eq_(index.containing('oba'), set())
+
+def test_text_index_shared_value():
+    # A value is only removed from the trigram index when no transaction has it anymore.
+    index = TextIndex()
+    index.add('foobar', 1)
+    index.add('foobar', 2)
+    index.remove('foobar', 1)
+    eq_(index.containing('bar'), {2})
+    eq_(index.equal_to('foobar'), {2})
+
+class TestSearchIndex:
+    def setup_method(self, method):
+        self.checking = Account('Checking', USD, AccountType.Asset)
+        self.expense = Account('Expense', USD, AccountType.Expense)
+        self.txns = [
+            Transaction(
+                date(2014, 1, 1), description='Grocery', payee='Store', checkno='42',
+                account=self.checking, amount=Amount(10, USD)
+            ),
+            Transaction(
+                date(2014, 1, 2), description='Rent', payee='Landlord',
+                account=self.expense, amount=Amount(-20, USD)
+            ),
+        ]
+        self.txns[1].splits[0].memo = 'January rent'
+        self.index = SearchIndex()
+        self.index.add(self.txns)
+
+    def check_same_as_matches(self, query):
+        expected = {t for t in self.txns if t.matches(query)}
+        eq_(self.index.matching(query), expected)
+
+    def test_matching_is_same_as_matches(self):
+        self.check_same_as_matches({'description': 'ocer'})
+        self.check_same_as_matches({'payee': 'lord', 'description': 'ocer'})
+        self.check_same_as_matches({'checkno': '42'})
+        self.check_same_as_matches({'checkno': '4'})
+        self.check_same_as_matches({'memo': 'january'})
+        self.check_same_as_matches({'amount': Amount(20, USD)})
+        self.check_same_as_matches({'account': {'checking', 'foo'}})
+
+    def test_removed_with_indexed_values(self):
+        # When a transaction changes, it's removed using the values it had when it was indexed.
+        txn = self.txns[0]
+        txn.description = 'Something else'
+        self.index.remove([txn])
+        eq_(self.index.matching({'description': 'grocery'}), set())
+        eq_(self.index.matching({'account': {'checking'}}), set())
+        eq_(len(self.index), 1)
+
+    def test_add_twice_reindexes(self):
+        txn = self.txns[0]
+        txn.description = 'Something else'
+        self.index.add([txn])
+        eq_(self.index.matching({'description': 'grocery'}), set())
+        eq_(self.index.matching({'description': 'else'}), {txn})
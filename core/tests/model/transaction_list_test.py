@@ -0,0 +1,93 @@
+# Copyright 2016 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+from datetime import date
+from operator import attrgetter
+
+from hscommon.testutil import eq_
+
+from ...model.transaction import Transaction
+from ...model.transaction_list import TransactionList
+
+D1 = date(2014, 1, 1)
+D2 = date(2014, 1, 2)
+
+def test_add_positions():
+    # Added transactions are placed after the other transactions of the same date.
+    txns = TransactionList()
+    t1, t2, t3 = Transaction(D1), Transaction(D1), Transaction(D2)
+    txns.extend([t1, t2, t3])
+    eq_([t.position for t in [t1, t2, t3]], [0, 1, 0])
+    eq_(txns.transactions_at_date(D1), {t1, t2})
+    assert t3 in txns
+    txns.remove(t1)
+    assert t1 not in txns
+    eq_(txns.transactions_at_date(D1), {t2})
+
+def test_extend_keep_position():
+    txns = TransactionList()
+    t1, t2 = Transaction(D1), Transaction(D1)
+    t1.position = 5
+    t2.position = 3
+    txns.extend([t1, t2], keep_position=True)
+    eq_([t.position for t in [t1, t2]], [5, 3])
+
+def test_date_changed_in_place():
+    # When a transaction's date is changed directly, it stops being at its old date right away and
+    # it's at its new date after the list is sorted.
+    t1, t2 = Transaction(D1), Transaction(D2)
+    txns = TransactionList([t1, t2])
+    t1.date = D2
+    eq_(txns.transactions_at_date(D1), set())
+    txns.sort(key=attrgetter('date', 'position'))
+    eq_(txns.transactions_at_date(D2), {t1, t2})
+    t3 = Transaction(D2)
+    txns.add(t3)
+    eq_(t3.position, 1)
+
+def test_move_last_after_date_change():
+    t1, t2, t3 = Transaction(D1), Transaction(D2), Transaction(D2)
+    txns = TransactionList()
+    txns.extend([t1, t2, t3])
+    t1.date = D2
+    t1.position = 0
+    txns.move_last(t1)
+    eq_(t1.position, 2)
+    eq_(txns.transactions_at_date(D2), {t1, t2, t3})
+
+def create_txn(description, payee='', mtime=0):
+    txn = Transaction(D1, description, payee)
+    txn.mtime = mtime
+    return txn
+
+def test_completion_index_is_updated_incrementally():
+    # Once built, the completion index follows added, removed and changed transactions.
+    t1, t2, t3 = create_txn('foo', mtime=1), create_txn('bar', mtime=2), create_txn('foo', mtime=3)
+    txns = TransactionList([t1, t2])
+    eq_(txns.descriptions, ['bar', 'foo'])
+    txns.add(t3)
+    eq_(txns.descriptions, ['foo', 'bar'])
+    txns.remove(t3)
+    eq_(txns.descriptions, ['bar', 'foo'])
+    t1.description = 'baz'
+    t1.mtime = 4
+    txns.clear_cache([t1])
+    eq_(txns.descriptions, ['baz', 'bar'])
+
+def test_completions():
+    # Completions are values starting with a prefix, in reverse mtime order. Case and accents are
+    # ignored.
+    txns = TransactionList([
+        create_txn('Bazooka', 'payée', mtime=1), create_txn('bar', mtime=3),
+        create_txn('foo', 'paris', mtime=2),
+    ])
+    eq_(txns.completions('description', 'ba'), ['bar', 'Bazooka'])
+    eq_(txns.completions('description', 'BAZ'), ['Bazooka'])
+    eq_(txns.completions('description', 'bz'), [])
+    eq_(txns.completions('payee', 'pa'), ['paris', 'payée'])
+    eq_(txns.completions('payee', 'paye'), ['payée'])
+    txns.add(create_txn('bazar', mtime=4))
+    eq_(txns.completions('description', 'ba'), ['bazar', 'bar', 'Bazooka'])
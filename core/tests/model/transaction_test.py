@@ -0,0 +1,62 @@
+# Copyright 2016 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+import pickle
+from copy import copy
+from datetime import date
+
+from hscommon.testutil import eq_
+
+from ...model.account import Account, AccountType
+from ...model.amount import Amount
+from ...model.budget import BudgetSpawn
+from ...model.currency import USD
+from ...model.entry import Entry
+from ...model.recurrence import Recurrence, RepeatType
+from ...model.transaction import Transaction
+
+def create_txn():
+    checking = Account('Checking', USD, AccountType.Asset)
+    txn = Transaction(date(2014, 1, 1), 'desc', 'payee', '42', account=checking, amount=Amount(10, USD))
+    txn.notes = 'notes'
+    txn.splits[0].memo = 'memo'
+    txn.splits[0].reconciliation_date = date(2014, 1, 2)
+    return txn
+
+def test_model_objects_are_slotted():
+    # Transactions, splits, entries and spawns don't have a __dict__. Documents have a lot of them.
+    txn = create_txn()
+    split = txn.splits[0]
+    entry = Entry(split, split.amount, split.amount, 0, split.amount)
+    spawn = Recurrence(txn, RepeatType.Daily, 1).get_spawns(date(2014, 1, 1))[0]
+    budget_spawn = BudgetSpawn(None, txn, date(2014, 1, 1))
+    for obj in [txn, split, entry, spawn, budget_spawn]:
+        assert not hasattr(obj, '__dict__')
+
+def test_pickle():
+    # Slotted transactions can still be pickled.
+    txn = pickle.loads(pickle.dumps(create_txn()))
+    eq_((txn.date, txn.description, txn.payee, txn.checkno, txn.notes), (
+        date(2014, 1, 1), 'desc', 'payee', '42', 'notes'
+    ))
+    eq_(len(txn.splits), 2)
+    split = txn.splits[0]
+    assert split.transaction is txn
+    eq_(split.account.name, 'Checking')
+    eq_(split.amount, Amount(10, USD))
+    eq_((split.memo, split.reconciliation_date), ('memo', date(2014, 1, 2)))
+
+def test_copy_split():
+    # copy() and copy_from() copy all attributes of a split.
+    txn = create_txn()
+    split = txn.splits[0]
+    copied = copy(split)
+    eq_((copied.account, copied.amount, copied.memo), (split.account, split.amount, 'memo'))
+    other = txn.splits[1]
+    other.copy_from(split)
+    eq_((other.account, other.amount, other.reconciliation_date), (
+        split.account, split.amount, date(2014, 1, 2)
+    ))
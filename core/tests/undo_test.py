@@ -787,3 +787,43 @@ def test_delete_account_with_budget(app, checkstate):
 def test_delete_budget(app, checkstate):
     app.btable.delete()
     checkstate()
+
+@with_app(app_two_txns_in_two_accounts)
+def test_undo_successive_changes(app):
+    # Actions are reduced to what they actually changed once the next action is recorded. Changing
+    # transactions and accounts back and forth can still be undone and redone step by step.
+    states = [copydoc(app.doc)]
+    account = app.doc.accounts.find('first')
+    for description, amount in [('foo', '43'), ('foo', '42'), ('description', '44')]:
+        app.etable[1].description = description
+        app.etable[1].increase = amount
+        app.etable.save_edits()
+        states.append(copydoc(app.doc))
+    for name in ['renamed', 'first']:
+        app.doc.change_accounts([account], name=name)
+        states.append(copydoc(app.doc))
+    for state in reversed(states[:-1]):
+        app.doc.undo()
+        compare_apps(state, app.doc)
+    for state in states[1:]:
+        app.doc.redo()
+        compare_apps(state, app.doc)
+
+@with_app(app_two_txns_in_two_accounts)
+def test_forget_old_actions(app, tmpdir):
+    # When we go over the undo memory budget, the oldest actions are forgotten. Undoing all the
+    # actions we still have brings us back to the save point if it was on a forgotten action.
+    app.doc._undoer.max_actions = 2
+    app.etable[1].description = 'foo'
+    app.etable.save_edits()
+    app.doc.save_to_xml(str(tmpdir.join('foo.moneyguru')))
+    for description in ['bar', 'baz']:
+        app.etable[1].description = description
+        app.etable.save_edits()
+    app.doc.undo()
+    app.doc.undo()
+    assert not app.doc.can_undo()
+    assert not app.doc.is_dirty()
+    eq_(app.etable[1].description, 'foo')
+    app.doc.redo()
+    assert app.doc.is_dirty()
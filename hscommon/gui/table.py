@@ -11,6 +11,68 @@ from collections import MutableSequence, namedtuple
 from .base import GUIObject
 from .selectable_list import Selectable
 
+class VirtualRows(MutableSequence):
+    """Sequence of rows which are only created when they're accessed.
+
+    Holds a list of model ``items`` and creates the :class:`Row` for an item, with
+    ``row_factory(item)``, the first time it's accessed. Rows that are inserted directly (header,
+    footer, rows being added) have no item.
+
+    Used by :meth:`Table.set_virtual_rows`.
+    """
+    def __init__(self, items, row_factory):
+        self._items = list(items)
+        self._rows = [None] * len(self._items)
+        self._row_factory = row_factory
+
+    def __delitem__(self, key):
+        del self._items[key]
+        del self._rows[key]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self[index] for index in range(*key.indices(len(self)))]
+        row = self._rows[key]
+        if row is None:
+            row = self._rows[key] = self._row_factory(self._items[key])
+        return row
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            value = list(value)
+            self._items[key] = [None] * len(value)
+        else:
+            self._items[key] = None
+        self._rows[key] = value
+
+    def index(self, row, *args):
+        # Rows that haven't been created yet can't be ``row``, no need to create them.
+        return self._rows.index(row, *args)
+
+    def insert(self, index, row):
+        self._items.insert(index, None)
+        self._rows.insert(index, row)
+
+    def item(self, index):
+        """Returns the model item of the row at ``index``, ``None`` if it doesn't have one."""
+        return self._items[index]
+
+    def sort(self, key=None, reverse=False):
+        """Sorts rows in place, like ``list.sort()``.
+
+        Sort keys come from rows, so all rows are created.
+        """
+        rows = self[:]
+        if key is None:
+            key = lambda row: row
+        order = sorted(range(len(rows)), key=lambda index: key(rows[index]), reverse=reverse)
+        self._items = [self._items[index] for index in order]
+        self._rows = [rows[index] for index in order]
+
+
 # We used to directly subclass list, but it caused problems at some point with deepcopy
 class Table(MutableSequence, Selectable):
     """Sortable and selectable sequence of :class:`Row`.
@@ -57,6 +119,9 @@ class Table(MutableSequence, Selectable):
         else:
             self._rows.append(item)
 
+    def index(self, row, *args):
+        return self._rows.index(row, *args)
+
     def insert(self, index, item):
         """Inserts ``item`` at ``index`` in the table.
 
@@ -81,6 +146,25 @@ class Table(MutableSequence, Selectable):
         self._rows.remove(row)
         self._check_selection_range()
 
+    def set_virtual_rows(self, items, row_factory):
+        """Replaces the rows of the table with rows created on demand from ``items``.
+
+        Rows are only created, with ``row_factory(item)``, when they're accessed. This way, when our
+        view only displays a few rows of a big table, we only create those rows. Header and footer
+        are kept.
+
+        Things like iterating over the table or sorting it create all rows. To avoid that, look at
+        :meth:`virtual_item` instead of rows whenever possible.
+
+        :param items: list of model items, one for each row.
+        :param row_factory: callable creating the :class:`Row` for a model item.
+        """
+        self._rows = VirtualRows(items, row_factory)
+        if self._header is not None:
+            self._rows.insert(0, self._header)
+        if self._footer is not None:
+            self._rows.append(self._footer)
+
     def sort_by(self, column_name, desc=False):
         """Sort table by ``column_name``.
 
@@ -101,6 +185,16 @@ class Table(MutableSequence, Selectable):
         if self._footer is not None:
             self._rows.append(self._footer)
 
+    def virtual_item(self, index):
+        """Returns the model item of the row at ``index`` without creating the row.
+
+        ``None`` if the table isn't in virtual mode (see :meth:`set_virtual_rows`) or if the row at
+        ``index`` wasn't created from a model item (header, footer, etc.).
+        """
+        if isinstance(self._rows, VirtualRows):
+            return self._rows.item(index)
+        return None
+
     #--- Properties
     @property
     def footer(self):
@@ -23,6 +23,7 @@ class ThreadedJobPerformer:
     self._run_threaded(self.some_work_func, (arg1, arg2, j))
     """
     _job_running = False
+    _thread = None
     last_error = None
     
     #--- Protected
@@ -68,5 +69,12 @@ class ThreadedJobPerformer:
         if self._job_running:
             raise JobInProgressError()
         args = (target, ) + args
-        Thread(target=self._async_run, args=args).start()
+        self._thread = Thread(target=self._async_run, args=args)
+        self._thread.start()
+    
+    def wait(self):
+        """Blocks until the job started with run_threaded() is finished, if there's one.
+        """
+        if self._thread is not None:
+            self._thread.join()
     
@@ -310,4 +310,64 @@ def test_sort_table_with_header():
     # Sorting a table with a header keeps it at the top
     table, header = table_with_header()
     table.sort_by('index', desc=True)
-    assert table[0] is header
\ No newline at end of file
+    assert table[0] is header
+#--- Virtual rows
+def virtual_table(indexes):
+    table = Table()
+    created = []
+    def create_row(index):
+        created.append(index)
+        return TestRow(table, index)
+    table.set_virtual_rows(indexes, create_row)
+    return table, created
+
+def test_virtual_rows_are_created_on_access():
+    table, created = virtual_table(range(10))
+    eq_(len(table), 10)
+    eq_(created, [])
+    eq_(table.virtual_item(3), 3)
+    eq_(table[3].index, 3)
+    eq_(table[-1].index, 9)
+    eq_(created, [3, 9])
+    # Rows are created only once
+    assert table[3] is table[3]
+    eq_(created, [3, 9])
+
+def test_virtual_rows_keep_header_and_footer():
+    table, created = virtual_table(range(3))
+    header = TestRow(table, -1)
+    footer = TestRow(table, 42)
+    table.header = header
+    table.footer = footer
+    table.set_virtual_rows(range(5), lambda index: TestRow(table, index))
+    eq_(len(table), 7)
+    eq_(table.row_count, 5)
+    assert table[0] is header
+    assert table[-1] is footer
+    eq_(table.virtual_item(0), None)
+    eq_(table.virtual_item(1), 0)
+
+def test_virtual_rows_index_doesnt_create_rows():
+    table, created = virtual_table(range(10))
+    row = table[5]
+    table.selected_row = row
+    eq_(table.selected_index, 5)
+    eq_(created, [5])
+    table.remove(row)
+    eq_(len(table), 9)
+    eq_(table.virtual_item(5), 6)
+
+def test_sort_virtual_rows():
+    table, created = virtual_table(range(5))
+    table.sort_by('index', desc=True)
+    eq_([row.index for row in table], [4, 3, 2, 1, 0])
+    eq_(table.virtual_item(0), 4)
+
+def test_virtual_rows_insert():
+    # Rows inserted directly in a virtual table don't have a virtual item.
+    table, created = virtual_table(range(3))
+    row = TestRow(table, 42)
+    table.insert(1, row)
+    assert table[1] is row
+    eq_(table.virtual_item(1), None)
+    eq_(table.virtual_item(2), 1)
@@ -13,6 +13,7 @@ from PyQt5.QtCore import pyqtSignal, Qt, QObject, QFile
 from PyQt5.QtWidgets import QFileDialog, QMessageBox, QApplication
 
 from hscommon.trans import trget
+from qtlib.progress_window import ProgressWindow
 from core.exception import FileFormatError
 from core.document import Document as DocumentModel, ScheduleScope
 
@@ -27,6 +28,7 @@ class Document(QObject):
         self.documentPath = None
         self.model = DocumentModel(app=app.model)
         self.model.view = self
+        self.cookProgressWindow = ProgressWindow(None, self.model.cook_progress)
 
     # --- Public
     def close(self):
@@ -598,9 +598,9 @@ class MainWindow(QMainWindow):
         QDesktopServices.openUrl(url)
 
     def importDocument(self):
-        title = tr("Select a document to import")
+        title = tr("Select documents to import")
         filters = tr("Supported files (*.moneyguru *.ofx *.qfx *.qif *.csv *.txt)")
-        docpath, filetype = QFileDialog.getOpenFileName(self.app.mainWindow, title, '', filters)
+        docpaths, filetype = QFileDialog.getOpenFileNames(self.app.mainWindow, title, '', filters)
         # There's a strange glitch under GNOME where, right after the dialog is gone, the main
         # window isn't the active window, but it will become active if we give it enough time. If we
         # start showing the import window before that happens, we'll end up with an import window
@@ -610,9 +610,9 @@ class MainWindow(QMainWindow):
             if self.app.mainWindow.isActiveWindow():
                 break
             QApplication.processEvents()
-        if docpath:
+        if docpaths:
             try:
-                self.model.parse_file_for_import(docpath)
+                self.model.parse_files_for_import(docpaths)
             except FileFormatError as e:
                 QMessageBox.warning(self.app.mainWindow, tr("Cannot import file"), str(e))
 